@@ -1 +1,131 @@
+import time
+import logging
+import contextvars
+from collections import Counter
+from contextlib import ExitStack
+
+import redis
+from django.conf import settings
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
+
+from .route_stats import record_request
+
+logger = logging.getLogger(__name__)
+
+# 单个请求的查询数超过此值时记录警告
+MONITOR_QUERY_BUDGET = getattr(settings, 'MONITOR_QUERY_BUDGET', 50)
+# 相同 SQL 重复执行达到此次数视为 N+1
+MONITOR_DUPLICATE_THRESHOLD = getattr(settings, 'MONITOR_DUPLICATE_THRESHOLD', 3)
+
+_current_stats = contextvars.ContextVar('request_monitor_stats', default=None)
+
+
+class RequestStats:
+    """单个请求的 SQL / Redis 统计"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.signatures = Counter()
+        self.redis_count = 0
+        self.redis_ms = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.monotonic() - started) * 1000
+            self.query_count += 1
+            # 参数以占位符表示，同一 SQL 即为同一签名
+            self.signatures[sql] += 1
+
+    def duplicates(self):
+        """重复次数达到阈值的 SQL 签名（由多到少）"""
+        return [
+            (sql, count) for sql, count in self.signatures.most_common()
+            if count >= MONITOR_DUPLICATE_THRESHOLD
+        ]
+
+    @property
+    def total_ms(self):
+        return (time.monotonic() - self.started) * 1000
+
+
+def _counted(func):
+    def wrapper(*args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return func(*args, **kwargs)
+        started = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.redis_ms += (time.monotonic() - started) * 1000
+            stats.redis_count += 1
+    wrapper._request_monitor = True
+    return wrapper
+
+
+def _install_redis_hook():
+    """统计 Redis 调用（单条命令与 pipeline 执行各算一次）"""
+    for cls, name in ((redis.Redis, 'execute_command'), (redis.client.Pipeline, 'execute')):
+        func = getattr(cls, name)
+        if not getattr(func, '_request_monitor', False):
+            setattr(cls, name, _counted(func))
+
+
+class RequestMonitorMiddleware(MiddlewareMixin):
+    """
+    请求监控：记录 SQL 查询数、数据库耗时、重复查询（N+1）、Redis 调用数与总耗时，
+    以 Server-Timing 等响应头输出，并按路由汇总到 Redis（见 route_stats）
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        _install_redis_hook()
+
+    def __call__(self, request):
+        if not getattr(settings, 'MONITOR_ENABLED', True):
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(stats.record_query))
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+
+        total_ms = stats.total_ms
+        duplicates = stats.duplicates()
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.db_ms:.1f};desc="{stats.query_count} queries"',
+            f'redis;dur={stats.redis_ms:.1f};desc="{stats.redis_count} calls"',
+            f'total;dur={total_ms:.1f}',
+        ])
+        response['X-Query-Count'] = str(stats.query_count)
+        response['X-Duplicate-Queries'] = str(len(duplicates))
+
+        route = self.get_route(request)
+        if stats.query_count > MONITOR_QUERY_BUDGET or duplicates:
+            logger.warning(
+                f"{route} 查询数 {stats.query_count}（预算 {MONITOR_QUERY_BUDGET}），"
+                f"重复查询 {len(duplicates)} 组: {[(sql[:120], count) for sql, count in duplicates[:3]]}"
+            )
+
+        record_request(route, total_ms, stats.query_count, stats.db_ms, stats.redis_count, bool(duplicates))
+        return response
+
+    def get_route(self, request):
+        """以 URL 路由模式（而非实际路径）区分端点"""
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            # 未匹配的路径（404）合并计算，避免路由数量无限增长
+            return f'{request.method} <unmatched>'
+        return f'{request.method} /{match.route}'
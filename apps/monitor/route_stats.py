@@ -0,0 +1,107 @@
+"""
+按路由汇总的请求统计（Redis）
+- monitor:routes                  已记录的路由
+- monitor:route:{route}           次数、总耗时、总查询数、最大查询数、数据库耗时、Redis 调用数、N+1 次数
+- monitor:route_latency:{route}   最近的耗时样本（计算 p95）
+"""
+import logging
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 创建Redis连接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+ROUTES_KEY = 'monitor:routes'
+ROUTE_KEY = 'monitor:route:{route}'
+ROUTE_LATENCY_KEY = 'monitor:route_latency:{route}'
+# 每个路由保留的耗时样本数
+LATENCY_SAMPLES = 500
+
+
+def record_request(route, total_ms, query_count, db_ms, redis_count, has_duplicates):
+    """记录一次请求（Redis 不可用时跳过，不影响请求）"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.sadd(ROUTES_KEY, route)
+        key = ROUTE_KEY.format(route=route)
+        pipe.hincrby(key, 'count', 1)
+        pipe.hincrbyfloat(key, 'total_ms', round(total_ms, 3))
+        pipe.hincrby(key, 'queries', query_count)
+        pipe.hincrbyfloat(key, 'db_ms', round(db_ms, 3))
+        pipe.hincrby(key, 'redis_calls', redis_count)
+        if has_duplicates:
+            pipe.hincrby(key, 'n_plus_one', 1)
+        latency_key = ROUTE_LATENCY_KEY.format(route=route)
+        pipe.lpush(latency_key, round(total_ms, 1))
+        pipe.ltrim(latency_key, 0, LATENCY_SAMPLES - 1)
+        pipe.execute()
+        _update_max(key, 'max_queries', query_count)
+    except Exception as e:
+        logger.debug(f"记录路由统计失败: {str(e)}")
+
+
+def _update_max(key, field, value):
+    current = redis_client.hget(key, field)
+    if current is None or int(current) < value:
+        redis_client.hset(key, field, value)
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return 0
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def get_route_stats(order_by='p95_ms', limit=20):
+    """
+    各路由的统计，按 order_by 由大到小排序
+
+    Args:
+        order_by: p95_ms、avg_ms、avg_queries、max_queries、n_plus_one 或 count
+    """
+    routes = sorted(member.decode() for member in redis_client.smembers(ROUTES_KEY))
+    if not routes:
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for route in routes:
+        pipe.hgetall(ROUTE_KEY.format(route=route))
+        pipe.lrange(ROUTE_LATENCY_KEY.format(route=route), 0, -1)
+    results = pipe.execute()
+
+    stats = []
+    for index, route in enumerate(routes):
+        data = {k.decode(): float(v) for k, v in results[index * 2].items()}
+        samples = [float(v) for v in results[index * 2 + 1]]
+        count = int(data.get('count', 0))
+        if not count:
+            continue
+        stats.append({
+            'route': route,
+            'count': count,
+            'avg_ms': round(data.get('total_ms', 0) / count, 1),
+            'p95_ms': _percentile(samples, 95),
+            'avg_queries': round(data.get('queries', 0) / count, 1),
+            'max_queries': int(data.get('max_queries', 0)),
+            'avg_db_ms': round(data.get('db_ms', 0) / count, 1),
+            'avg_redis_calls': round(data.get('redis_calls', 0) / count, 1),
+            'n_plus_one': int(data.get('n_plus_one', 0)),
+        })
+
+    stats.sort(key=lambda item: item.get(order_by, 0), reverse=True)
+    return stats[:limit]
+
+
+def reset_route_stats():
+    """清除所有路由统计"""
+    routes = [member.decode() for member in redis_client.smembers(ROUTES_KEY)]
+    keys = [ROUTES_KEY]
+    for route in routes:
+        keys.append(ROUTE_KEY.format(route=route))
+        keys.append(ROUTE_LATENCY_KEY.format(route=route))
+    redis_client.delete(*keys)
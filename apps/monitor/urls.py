@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework import routers
-from .views import ServerInfoView, LogView, LogDetailView
+from .views import ServerInfoView, LogView, LogDetailView, RouteStatsView
 
 
 urlpatterns = [
     path('log/', LogView.as_view()),
     path('log/<str:name>/', LogDetailView.as_view()),
     path('server/', ServerInfoView.as_view()),
+    path('routes/', RouteStatsView.as_view()),
 ]
@@ -9,6 +9,8 @@ import os
 from rest_framework import serializers, status
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from apps.system.permission import RbacPermission
+from .route_stats import get_route_stats, reset_route_stats
 # Create your views here.
 
 class ServerInfoView(APIView):
@@ -90,4 +92,41 @@ class LogDetailView(APIView):
                 data = f.read()
             return Response(data)
         except:
-            return Response('未找到', status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response('未找到', status=status.HTTP_404_NOT_FOUND)
+
+class RouteStatsView(APIView):
+    """
+    各路由的请求统计（由 RequestMonitorMiddleware 记录）
+    清除统计需具备 routestats_delete 权限（或管理员）
+    """
+    permission_classes = [IsAuthenticated, RbacPermission]
+    perms_map = {'get': '*', 'delete': 'routestats_delete'}
+    order_fields = ['p95_ms', 'avg_ms', 'avg_queries', 'max_queries', 'n_plus_one', 'count']
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('order', openapi.IN_QUERY, description='排序字段', type=openapi.TYPE_STRING),
+        openapi.Parameter('limit', openapi.IN_QUERY, description='条数', type=openapi.TYPE_INTEGER)
+    ])
+    def get(self, request, *args, **kwargs):
+        """
+        查看耗时或查询数最高的路由
+        :query order p95_ms|avg_ms|avg_queries|max_queries|n_plus_one|count
+        :query limit
+        """
+        order = request.GET.get('order', 'p95_ms')
+        if order not in self.order_fields:
+            return Response(f'不支持的排序字段: {order}', status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.GET.get('limit', 20))
+        except ValueError:
+            return Response('limit 必须是整数', status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response('limit 必须大于 0', status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_route_stats(order, limit))
+
+    def delete(self, request, *args, **kwargs):
+        """
+        清除路由统计
+        """
+        reset_route_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.11 on 2026-10-15 06:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_organization_closure(apps, schema_editor):
+    from apps.system.org_closure import rebuild_closure
+
+    rebuild_closure(
+        apps.get_model('system', 'Organization'),
+        apps.get_model('system', 'OrganizationClosure')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0014_alter_user_position_alter_user_roles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0, verbose_name='層數')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='system.organization', verbose_name='上級')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='system.organization', verbose_name='下級')),
+            ],
+            options={
+                'verbose_name': '群組階層',
+                'verbose_name_plural': '群組階層',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='org_closure_descendant_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_organization_closure, migrations.RunPython.noop),
+    ]
@@ -72,6 +72,36 @@ class Organization(SoftModel):
     def __str__(self):
         return self.name
 
+    def get_descendant_ids(self, include_self=True):
+        """所有下級群組ID（由 OrganizationClosure 取得並快取）"""
+        from .org_closure import get_descendant_ids
+        return get_descendant_ids(self.id, include_self)
+
+    def get_ancestor_ids(self, include_self=True):
+        """所有上級群組ID（由 OrganizationClosure 取得並快取）"""
+        from .org_closure import get_ancestor_ids
+        return get_ancestor_ids(self.id, include_self)
+
+
+class OrganizationClosure(models.Model):
+    """
+    群組階層閉包表
+    每對（上級, 下級）一筆，含自身（depth=0），由群組的 signal 維護
+    """
+    ancestor = models.ForeignKey(Organization, on_delete=models.CASCADE,
+                                 related_name='descendant_links', verbose_name='上級')
+    descendant = models.ForeignKey(Organization, on_delete=models.CASCADE,
+                                   related_name='ancestor_links', verbose_name='下級')
+    depth = models.PositiveIntegerField('層數', default=0)
+
+    class Meta:
+        verbose_name = '群組階層'
+        verbose_name_plural = verbose_name
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='org_closure_descendant_idx'),
+        ]
+
 
 class Role(SoftModel):
     """
@@ -0,0 +1,132 @@
+"""
+群組階層閉包表維護與查詢
+上下級查詢改為 OrganizationClosure 的單一索引查詢，結果依群組快取，
+群組結構異動時以版本號使快取失效。
+已軟刪除的群組不納入閉包表（與逐層查詢 Organization.objects 的結果一致）。
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+# 快取存活時間（秒）
+ORG_CLOSURE_CACHE_TTL = 60*60
+ORG_CLOSURE_VERSION_KEY = 'org_closure__version'
+
+
+def _get_version():
+    version = cache.get(ORG_CLOSURE_VERSION_KEY)
+    if version is None:
+        cache.add(ORG_CLOSURE_VERSION_KEY, 1, None)
+        version = cache.get(ORG_CLOSURE_VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """結構異動提交後使所有上下級快取失效"""
+    try:
+        cache.incr(ORG_CLOSURE_VERSION_KEY)
+    except ValueError:
+        cache.set(ORG_CLOSURE_VERSION_KEY, 2, None)
+
+
+def build_closure_rows(nodes):
+    """
+    由 (id, parent_id) 計算閉包表的所有 (ancestor_id, descendant_id, depth)
+    父群組不在 nodes 中的群組視為最上層
+    """
+    parents = dict(nodes)
+    rows = []
+    for node_id in parents:
+        depth = 0
+        current = node_id
+        seen = set()
+        while current is not None and current in parents and current not in seen:
+            seen.add(current)
+            rows.append((current, node_id, depth))
+            current = parents[current]
+            depth += 1
+    return rows
+
+
+def rebuild_closure(organization_model=None, closure_model=None):
+    """
+    重建整個閉包表（群組數量不多，結構異動時使用）
+    可傳入 migration 的歷史模型；快取版本由呼叫端處理
+    """
+    if organization_model is None:
+        from .models import Organization as organization_model
+    if closure_model is None:
+        from .models import OrganizationClosure as closure_model
+
+    nodes = organization_model.objects.filter(is_deleted=False).values_list('id', 'parent_id')
+    rows = build_closure_rows(nodes)
+    with transaction.atomic():
+        closure_model.objects.all().delete()
+        closure_model.objects.bulk_create([
+            closure_model(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+            for ancestor_id, descendant_id, depth in rows
+        ], batch_size=1000)
+
+
+def sync_organization(organization, created=False):
+    """
+    群組儲存後同步閉包表
+    新增群組只插入自身與上級的關聯，變更上級或軟刪除時重建
+    """
+    from .models import OrganizationClosure
+
+    if created and not organization.is_deleted:
+        links = [OrganizationClosure(ancestor_id=organization.id, descendant_id=organization.id, depth=0)]
+        if organization.parent_id:
+            for ancestor_id, depth in OrganizationClosure.objects.filter(
+                descendant_id=organization.parent_id
+            ).values_list('ancestor_id', 'depth'):
+                links.append(OrganizationClosure(
+                    ancestor_id=ancestor_id, descendant_id=organization.id, depth=depth + 1
+                ))
+        OrganizationClosure.objects.bulk_create(links)
+        transaction.on_commit(bump_version)
+        return
+
+    links = dict(
+        OrganizationClosure.objects.filter(descendant_id=organization.id, depth__lte=1)
+        .values_list('depth', 'ancestor_id')
+    )
+    in_tree = 0 in links
+    if in_tree == (not organization.is_deleted) and links.get(1) == organization.parent_id:
+        return
+    rebuild_closure()
+    transaction.on_commit(bump_version)
+
+
+def remove_organization():
+    """群組刪除後重建閉包表（下級群組的上級已被清空）"""
+    rebuild_closure()
+    transaction.on_commit(bump_version)
+
+
+def get_descendant_ids(organization_id, include_self=True):
+    """群組的所有下級ID（依版本快取）"""
+    from .models import OrganizationClosure
+
+    key = f'org_closure__v{_get_version()}__descendants_{organization_id}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(OrganizationClosure.objects.filter(ancestor_id=organization_id).values_list('descendant_id', flat=True))
+        cache.set(key, ids, ORG_CLOSURE_CACHE_TTL)
+    if include_self:
+        return ids
+    return [i for i in ids if i != organization_id]
+
+
+def get_ancestor_ids(organization_id, include_self=True):
+    """群組的所有上級ID（依版本快取）"""
+    from .models import OrganizationClosure
+
+    key = f'org_closure__v{_get_version()}__ancestors_{organization_id}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(OrganizationClosure.objects.filter(descendant_id=organization_id).values_list('ancestor_id', flat=True))
+        cache.set(key, ids, ORG_CLOSURE_CACHE_TTL)
+    if include_self:
+        return ids
+    return [i for i in ids if i != organization_id]
@@ -0,0 +1,74 @@
+"""
+群組統計
+以兩次查詢（群組樹、依群組彙總的使用者數量）在記憶體中累加各群組子樹的使用者數量，
+結果快取至使用者所屬群組或群組結構異動為止。
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+ORG_USER_COUNT_KEY = 'org_stats__user_counts'
+# 快取存活時間（秒）
+ORG_USER_COUNT_TTL = 60*60
+
+
+def compute_org_user_counts():
+    """
+    計算每個群組（包含其子群組）的使用者數量
+
+    Returns:
+        list: [{'id', 'name', 'parent_id', 'user_count'}]，依群組ID排序
+    """
+    from .models import Organization, User
+
+    organizations = list(Organization.objects.order_by('pk').values('id', 'name', 'parent_id'))
+    direct_counts = dict(
+        User.objects.filter(dept__isnull=False).values('dept_id').annotate(count=Count('id')).values_list('dept_id', 'count')
+    )
+
+    children = {}
+    for org in organizations:
+        children.setdefault(org['parent_id'], []).append(org['id'])
+
+    # 由下往上累加子樹數量（以迭代走訪避免遞迴深度限制）
+    totals = {}
+    for org in organizations:
+        if org['id'] in totals:
+            continue
+        stack = [(org['id'], False)]
+        visiting = set()
+        while stack:
+            org_id, expanded = stack.pop()
+            if expanded:
+                totals[org_id] = direct_counts.get(org_id, 0) + sum(
+                    totals.get(child_id, 0) for child_id in children.get(org_id, [])
+                )
+                continue
+            if org_id in totals or org_id in visiting:
+                continue
+            visiting.add(org_id)
+            stack.append((org_id, True))
+            for child_id in children.get(org_id, []):
+                stack.append((child_id, False))
+
+    return [
+        {
+            'id': org['id'],
+            'name': org['name'],
+            'parent_id': org['parent_id'],
+            'user_count': totals.get(org['id'], 0),
+        }
+        for org in organizations
+    ]
+
+
+def get_org_user_counts():
+    """每個群組（包含其子群組）的使用者數量（快取）"""
+    results = cache.get(ORG_USER_COUNT_KEY)
+    if results is None:
+        results = compute_org_user_counts()
+        cache.set(ORG_USER_COUNT_KEY, results, ORG_USER_COUNT_TTL)
+    return results
+
+
+def invalidate_org_user_counts():
+    cache.delete(ORG_USER_COUNT_KEY)
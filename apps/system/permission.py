@@ -1,24 +1,86 @@
 from django.core.cache import cache
 from rest_framework.permissions import BasePermission
 from utils.queryset import get_child_queryset2
-from .models import Organization, Permission
+from .models import Organization, Role
 from django.db.models import Q
 
+# 權限快取存活時間（秒）
+PERMS_CACHE_TTL = 60*60
+# 角色權限版本，角色或權限異動時遞增，使所有角色與用戶的權限快取失效
+ROLE_VERSION_KEY = 'perms__role_version'
+
+
+def get_role_version():
+    version = cache.get(ROLE_VERSION_KEY)
+    if version is None:
+        cache.add(ROLE_VERSION_KEY, 1, None)
+        version = cache.get(ROLE_VERSION_KEY, 1)
+    return version
+
+
+def bump_role_version():
+    """角色權限異動後呼叫，所有權限快取隨版本失效"""
+    try:
+        cache.incr(ROLE_VERSION_KEY)
+    except ValueError:
+        cache.set(ROLE_VERSION_KEY, 2, None)
+
+
+def _role_perms_key(role_id, version):
+    return f'perms__role_{role_id}__v{version}'
+
+
+def _user_perms_key(user, version):
+    return f'{user.username}__perms__v{version}'
+
+
+def invalidate_user_perms(users):
+    """清除用戶的權限快取（用戶角色異動時）"""
+    version = get_role_version()
+    cache.delete_many([_user_perms_key(user, version) for user in users])
+
+
+def get_role_perms(role_ids, version):
+    """
+    取得各角色的權限代號，先讀角色快取，未命中的角色以一次查詢取得
+    """
+    keys = {role_id: _role_perms_key(role_id, version) for role_id in role_ids}
+    cached = cache.get_many(list(keys.values()))
+
+    result = {role_id: cached[key] for role_id, key in keys.items() if key in cached}
+    missing = [role_id for role_id in role_ids if role_id not in result]
+    if missing:
+        for role_id in missing:
+            result[role_id] = []
+        rows = Role.perms.through.objects.filter(
+            role_id__in=missing, permission__is_deleted=False, permission__method__isnull=False
+        ).values_list('role_id', 'permission__method')
+        for role_id, method in rows:
+            result[role_id].append(method)
+        cache.set_many({keys[role_id]: result[role_id] for role_id in missing}, PERMS_CACHE_TTL)
+    return result
+
+
 def get_permission_list(user):
     """
     获取权限列表,可用redis存取
+    用戶權限由各角色的權限快取組成，角色權限異動時以版本號失效
     """
     if user.is_superuser:
-        perms_list = ['admin']
-    else:
-        perms = Permission.objects.none()
-        roles = user.roles.all()
-        if roles:
-            for i in roles:
-                perms = perms | i.perms.all()
-        perms_list = perms.values_list('method', flat=True)
-        perms_list = list(set(perms_list))
-    cache.set(user.username + '__perms', perms_list, 60*60)
+        return ['admin']
+
+    version = get_role_version()
+    key = _user_perms_key(user, version)
+    perms_list = cache.get(key)
+    if perms_list is not None:
+        return perms_list
+
+    role_ids = list(user.roles.values_list('id', flat=True))
+    perms_set = set()
+    for perms in get_role_perms(role_ids, version).values():
+        perms_set.update(perms)
+    perms_list = list(perms_set)
+    cache.set(key, perms_list, PERMS_CACHE_TTL)
     return perms_list
 
 
@@ -37,8 +99,6 @@ class RbacPermission(BasePermission):
         if not request.user:
             perms = ['visitor'] # 如果没有经过认证,视为游客
         else:
-            perms = cache.get(request.user.username + '__perms')
-        if not perms:
             perms = get_permission_list(request.user)
         if perms:
             if 'admin' in perms:
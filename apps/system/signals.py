@@ -1,12 +1,57 @@
-from django.db.models.signals import m2m_changed
-from .models import Role, Permission, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from .models import Role, Permission, User, Organization
 from django.dispatch import receiver
-from django.core.cache import cache
-from .permission import get_permission_list
+from .permission import bump_role_version, invalidate_user_perms
+from .org_closure import sync_organization, remove_organization
+from .org_stats import invalidate_org_user_counts
 
-# 变更用户角色时动态更新权限或者前端刷新
+# 变更用户角色时，事务提交后动态更新权限或者前端刷新
 @receiver(m2m_changed, sender=User.roles.through)
-def update_perms_cache_user(sender, instance, action, **kwargs):
-    if action in ['post_remove', 'post_add']:
-        if cache.get(instance.username+'__perms', None):
-            get_permission_list(instance)
\ No newline at end of file
+def update_perms_cache_user(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_remove', 'post_add', 'post_clear']:
+        return
+    if not reverse:
+        transaction.on_commit(lambda: invalidate_user_perms([instance]))
+    elif pk_set:
+        # 由角色端異動用戶
+        user_ids = list(pk_set)
+        transaction.on_commit(
+            lambda: invalidate_user_perms(User.objects.filter(pk__in=user_ids).only('username'))
+        )
+    else:
+        transaction.on_commit(bump_role_version)
+
+# 变更角色权限、角色或权限本身时，事务提交后以版本号使所有权限快取失效
+@receiver(m2m_changed, sender=Role.perms.through)
+def update_perms_cache_role(sender, action, **kwargs):
+    if action in ['post_remove', 'post_add', 'post_clear']:
+        transaction.on_commit(bump_role_version)
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def update_perms_cache_change(sender, **kwargs):
+    transaction.on_commit(bump_role_version)
+
+# 群組結構异动时维护阶层闭包表
+@receiver(post_save, sender=Organization)
+def update_org_closure(sender, instance, created, **kwargs):
+    sync_organization(instance, created)
+    transaction.on_commit(invalidate_org_user_counts)
+
+@receiver(post_delete, sender=Organization)
+def remove_org_closure(sender, instance, **kwargs):
+    remove_organization()
+    transaction.on_commit(invalidate_org_user_counts)
+
+# 用户所属群组变更时，事务提交后清除群组人数统计（登录只更新 last_login 时略过）
+@receiver(post_save, sender=User)
+def update_org_user_counts(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'dept' in update_fields:
+        transaction.on_commit(invalidate_org_user_counts)
+
+@receiver(post_delete, sender=User)
+def remove_org_user_counts(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_org_user_counts)
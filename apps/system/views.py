@@ -29,6 +29,7 @@ from .mixins import CreateUpdateModelAMixin, OptimizationMixin
 from .models import (Dict, DictType, File, Organization, Permission, Position,
                      Role, User, VerificationCode)
 from .permission import RbacPermission, get_permission_list
+from .org_stats import get_org_user_counts
 from .permission_data import RbacFilterSet
 from .serializers import (DictSerializer, DictTypeSerializer, FileSerializer,
                           OrganizationSerializer, PermissionSerializer,
@@ -287,30 +288,7 @@ class OrganizationViewSet(ModelViewSet):
         """
         返回每個群組（包含其子群組）的使用者數量
         """
-        organizations = Organization.objects.all()  # 取得所有群組資料
-        results = []
-
-        def get_recursive_user_count(org):
-            """遞迴計算某個群組及其所有子群組的使用者數量"""
-            # 計算直接屬於該群組的使用者數量
-            user_count = User.objects.filter(dept=org).count()
-            # 查找該群組的所有子群組
-            sub_orgs = Organization.objects.filter(parent=org)
-            # 遞迴計算所有子群組的使用者數量
-            for sub_org in sub_orgs:
-                user_count += get_recursive_user_count(sub_org)
-            return user_count
-
-        # 遍歷所有群組並計算每個群組的使用者數量
-        for org in organizations:
-            results.append({
-                "id": org.id,
-                "name": org.name,
-                "parent_id": org.parent_id,
-                "user_count": get_recursive_user_count(org),
-            })
-
-        return Response(results)
+        return Response(get_org_user_counts())
 
     @action(detail=True, methods=['get'], url_path='users')
     def get_org_users(self, request, pk=None):
@@ -319,12 +297,11 @@ class OrganizationViewSet(ModelViewSet):
         """
         try:
             org = self.get_object()
-            results = []
-            
-            def get_recursive_users(org):
-                # 取得直接屬於該群組的使用者
-                users = User.objects.filter(dept=org).values(
-                    'id', 
+
+            # 該群組及其所有子群組的使用者（閉包表一次查詢）
+            users = list(
+                User.objects.filter(dept_id__in=org.get_descendant_ids()).order_by('dept_id', 'id').values(
+                    'id',
                     'username',
                     'name',
                     'email',
@@ -332,29 +309,12 @@ class OrganizationViewSet(ModelViewSet):
                     'dept_id',
                     'dept__name'  # 包含部門名稱
                 )
-                user_list = list(users)
-                
-                # 取得子群組的使用者
-                sub_orgs = Organization.objects.filter(parent=org)
-                for sub_org in sub_orgs:
-                    user_list.extend(get_recursive_users(sub_org))
-                
-                return user_list
-            
-            users = get_recursive_users(org)
-            
-            # 依據使用者 ID 去重
-            seen_ids = set()
-            unique_users = []
-            for user in users:
-                if user['id'] not in seen_ids:
-                    seen_ids.add(user['id'])
-                    unique_users.append(user)
+            )
             
             return Response({
                 'org_id': org.id,
                 'org_name': org.name,
-                'users': unique_users
+                'users': users
             })
             
         except Exception as e:
@@ -0,0 +1,33 @@
+# management/commands/backfill_audit_events.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from simple_history.models import registered_models
+from ...services.audit_timeline import backfill_events, AUDITED_MODELS
+
+class Command(BaseCommand):
+    help = 'Import existing simple_history records of the audited models into the audit timeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Only import records from the last N days')
+        parser.add_argument('--model', type=str, default=None, help='Only import the given model (e.g. Order or v1.Order)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Records per batch')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.now() - timezone.timedelta(days=options['days'])
+
+        total = 0
+        for model in registered_models.values():
+            history = getattr(model, 'history', None)
+            if history is None or model._meta.label not in AUDITED_MODELS:
+                continue
+            if options['model'] and options['model'].lower() not in (model._meta.model_name, model._meta.label_lower):
+                continue
+
+            created = backfill_events(history.model, since=since, chunk_size=options['chunk_size'])
+            total += created
+            if created:
+                self.stdout.write(f"{model._meta.label}: {created} events")
+
+        self.stdout.write(self.style.SUCCESS(f"Successfully imported {total} audit events"))
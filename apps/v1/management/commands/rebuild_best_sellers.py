@@ -0,0 +1,10 @@
+# management/commands/rebuild_best_sellers.py
+from django.core.management.base import BaseCommand
+from ...services.best_sellers import rebuild_best_sellers
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis best-seller rankings from paid orders'
+
+    def handle(self, *args, **options):
+        count = rebuild_best_sellers()
+        self.stdout.write(self.style.SUCCESS(f"Successfully rebuilt {count} best-seller rankings"))
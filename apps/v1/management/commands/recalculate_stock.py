@@ -1,12 +1,33 @@
 # management/commands/recalculate_stock.py
 from django.core.management.base import BaseCommand
-from ...utils import recalculate_all_activity_product_stock
+from ...services.stock_projection import recalculate_all_stock
 
 class Command(BaseCommand):
     help = 'Recalculate stock for all activity products based on component availability'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only show the differences without updating')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per bulk_update batch')
+
     def handle(self, *args, **options):
-        updated_count = recalculate_all_activity_product_stock()
+        result = recalculate_all_stock(dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+
+        if options['dry_run']:
+            for change in result['changes']:
+                self.stdout.write(
+                    f"{change['activity_name']} - {change['product_name']}: {change['old_stock']} -> {change['new_stock']}"
+                )
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Dry run: {len(result['changes'])} of {result['checked']} activity products would be updated "
+                    f"({result['duration_ms']}ms)"
+                )
+            )
+            return
+
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully updated stock for {updated_count} activity products')
-        )
\ No newline at end of file
+            self.style.SUCCESS(
+                f"Successfully updated stock for {result['updated']} activity products "
+                f"(checked {result['checked']}, {result['duration_ms']}ms)"
+            )
+        )
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.v1.services.order_deadline import release_due_orders
+
+
+class Command(BaseCommand):
+    help = "每秒取出已到付款期限的訂單並釋放預留庫存"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help='輪詢間隔（秒）')
+        parser.add_argument('--limit', type=int, default=500, help='每次最多處理的訂單數')
+        parser.add_argument('--once', action='store_true', help='只執行一次後結束')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        limit = options['limit']
+
+        self.stdout.write(f"⏱️ 訂單付款期限排程啟動（每 {interval} 秒）")
+        while True:
+            try:
+                stats = release_due_orders(limit=limit)
+                if stats and stats['orders']:
+                    self.stdout.write(
+                        f"已逾期訂單 {stats['orders']} 筆，釋放預留 {stats['reservations']} 筆，"
+                        f"耗時 {stats['duration_ms']}ms"
+                    )
+            except Exception as e:
+                self.stderr.write(f"處理到期訂單失敗: {str(e)}")
+
+            if options['once']:
+                break
+            time.sleep(interval)
@@ -1,25 +1,27 @@
 from django.core.management.base import BaseCommand
-from apps.v1.models import ActivityProduct
+from apps.v1.services.stock_projection import recalculate_all_stock
 
 class Command(BaseCommand):
     help = "更新所有活動商品的庫存"
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只列出差異，不更新資料庫')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批 bulk_update 筆數')
+
+    def handle(self, *args, **options):
         self.stdout.write("🔄 計算並更新活動商品庫存...")
         
-        # 取得所有活動商品
-        activity_products = ActivityProduct.objects.all()
-        updated_count = 0
+        # 以單一彙總查詢計算所有商品庫存，差異以 bulk_update 分批寫入
+        result = recalculate_all_stock(dry_run=options['dry_run'], chunk_size=options['chunk_size'])
         
-        for ap in activity_products:
-            # 計算可用庫存
-            calculated_stock = ap.calculate_available_stock()
-            
-            # 更新庫存值
-            if ap.stock != calculated_stock:
-                old_stock = ap.stock
-                ActivityProduct.objects.filter(id=ap.id).update(stock=calculated_stock)
-                updated_count += 1
-                self.stdout.write(f"商品: {ap.product.product_name} - 舊庫存: {old_stock}, 新庫存: {calculated_stock}")
+        for change in result['changes']:
+            self.stdout.write(f"商品: {change['product_name']} - 舊庫存: {change['old_stock']}, 新庫存: {change['new_stock']}")
         
-        self.stdout.write(self.style.SUCCESS(f"✅ 已更新 {updated_count} 個活動商品的庫存"))
\ No newline at end of file
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"🔍 試算：{len(result['changes'])} 個活動商品需要更新（共檢查 {result['checked']} 個，耗時 {result['duration_ms']}ms）"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ 已更新 {result['updated']} 個活動商品的庫存（共檢查 {result['checked']} 個，耗時 {result['duration_ms']}ms）"
+            ))
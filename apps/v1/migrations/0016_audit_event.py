@@ -0,0 +1,37 @@
+# Generated by Django 4.2.11 on 2026-10-15 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('v1', '0015_customerservicerequest_historicalfaq_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(help_text='app_label.ModelName', max_length=100, verbose_name='模型')),
+                ('object_id', models.CharField(max_length=64, verbose_name='物件ID')),
+                ('history_id', models.CharField(blank=True, max_length=64, null=True, verbose_name='歷史紀錄ID')),
+                ('event_type', models.CharField(choices=[('+', '新增'), ('~', '修改'), ('-', '刪除')], max_length=1, verbose_name='事件類型')),
+                ('event_time', models.DateTimeField(verbose_name='發生時間')),
+                ('changed_fields', models.JSONField(blank=True, default=list, verbose_name='異動欄位')),
+                ('change_reason', models.CharField(blank=True, max_length=100, null=True, verbose_name='異動原因')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='操作者')),
+            ],
+            options={
+                'verbose_name': '操作時間軸',
+                'verbose_name_plural': '操作時間軸',
+                'db_table': 'v1_audit_event',
+                'ordering': ['-event_time', '-id'],
+                'indexes': [models.Index(fields=['event_time', 'id'], name='audit_event_time_idx'), models.Index(fields=['model_name', 'event_time', 'id'], name='audit_event_model_idx'), models.Index(fields=['user', 'event_time', 'id'], name='audit_event_user_idx'), models.Index(fields=['model_name', 'object_id'], name='audit_event_object_idx')],
+            },
+        ),
+    ]
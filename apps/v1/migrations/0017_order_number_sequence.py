@@ -0,0 +1,26 @@
+# Generated by Django 4.2.11 on 2026-10-15 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1', '0016_audit_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='日期')),
+                ('last_value', models.BigIntegerField(default=0, verbose_name='已配置的最大序號')),
+            ],
+            options={
+                'verbose_name': '訂單編號序號',
+                'verbose_name_plural': '訂單編號序號',
+                'db_table': 'v1_wms_order_number_sequence',
+            },
+        ),
+    ]
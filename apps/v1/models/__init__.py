@@ -21,6 +21,7 @@ from .ecommerce import (
     ShipmentItem,
     OrderInventoryLog,    # 新增
     OrderConfiguration,   # 新增
+    OrderNumberSequence,
 )
 
 # Import all models from promotion.py
@@ -40,6 +41,8 @@ from .customer import (
     FAQ
 )
 
+from .audit import AuditEvent
+
 
 
 # For convenience, provide all models in a flat list
@@ -75,5 +78,7 @@ __all__ = [
     'CustomerServiceConfig',
     'CustomerServiceRequest',
     'CustomerServiceMessage',
-    'FAQ'
+    'FAQ',
+
+    'AuditEvent'
 ]
\ No newline at end of file
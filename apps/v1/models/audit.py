@@ -0,0 +1,53 @@
+from django.db import models
+from django.conf import settings
+from django.dispatch import receiver
+from simple_history.signals import post_create_historical_record
+
+
+class AuditEvent(models.Model):
+    """
+    操作時間軸事件（僅新增不修改）
+    由 simple_history 建立歷史紀錄時同步寫入，供跨模型的操作紀錄查詢
+    """
+    EVENT_TYPE_CHOICES = [
+        ('+', '新增'),
+        ('~', '修改'),
+        ('-', '刪除'),
+    ]
+
+    model_name = models.CharField("模型", max_length=100, help_text="app_label.ModelName")
+    object_id = models.CharField("物件ID", max_length=64)
+    history_id = models.CharField("歷史紀錄ID", max_length=64, null=True, blank=True)
+    event_type = models.CharField("事件類型", max_length=1, choices=EVENT_TYPE_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name="操作者", on_delete=models.SET_NULL,
+                             null=True, blank=True, db_constraint=False, related_name='+')
+    event_time = models.DateTimeField("發生時間")
+    changed_fields = models.JSONField("異動欄位", default=list, blank=True)
+    change_reason = models.CharField("異動原因", max_length=100, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "操作時間軸"
+        verbose_name_plural = "操作時間軸"
+        db_table = "v1_audit_event"
+        ordering = ['-event_time', '-id']
+        indexes = [
+            models.Index(fields=['event_time', 'id'], name='audit_event_time_idx'),
+            models.Index(fields=['model_name', 'event_time', 'id'], name='audit_event_model_idx'),
+            models.Index(fields=['user', 'event_time', 'id'], name='audit_event_user_idx'),
+            models.Index(fields=['model_name', 'object_id'], name='audit_event_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name}#{self.object_id} {self.get_event_type_display()}"
+
+
+# Signal handler feeding the audit timeline
+@receiver(post_create_historical_record)
+def record_audit_event(sender, history_instance, **kwargs):
+    """
+    Append an audit timeline event for historical records of the audited models.
+    """
+    # Import here to avoid circular imports
+    from ..services.audit_timeline import record_history_event
+
+    record_history_event(history_instance)
@@ -202,6 +202,20 @@ class OrderConfiguration(BaseModel):
         return f"訂單設定(付款超時:{self.payment_timeout_minutes}分鐘)"
 
 
+
+class OrderNumberSequence(models.Model):
+    """訂單編號序號（Redis 不可用時以區塊方式配置的每日序號）"""
+    day = models.DateField("日期", unique=True)
+    last_value = models.BigIntegerField("已配置的最大序號", default=0)
+
+    class Meta:
+        verbose_name = "訂單編號序號"
+        verbose_name_plural = "訂單編號序號"
+        db_table = "v1_wms_order_number_sequence"
+
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
+
 class ShipmentItem(BaseModel):
     """出貨明細表 - 包含實際出貨的品號與批號資訊"""
     order_item = models.ForeignKey(OrderItem, verbose_name="訂單項目", on_delete=models.CASCADE, related_name="shipment_items")
@@ -242,4 +256,64 @@ class OrderInventoryLog(BaseModel):
         db_table = "v1_wms_order_inventory_log"
         
     def __str__(self):
-        return f"{self.order.order_number} - {self.get_operation_display()} {self.quantity}"
\ No newline at end of file
+        return f"{self.order.order_number} - {self.get_operation_display()} {self.quantity}"
+
+
+# Signal handlers to maintain the dashboard rollup
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+
+@receiver(pre_save, sender=Order)
+def capture_dashboard_rollup_previous(sender, instance, update_fields=None, **kwargs):
+    """
+    Before an order is saved, load its stored values
+    so the dashboard rollup can be adjusted by the difference.
+    """
+    # Import here to avoid circular imports
+    from ..services.dashboard_rollup import capture_previous
+
+    capture_previous(instance, update_fields)
+
+
+@receiver(pre_save, sender=Product)
+def capture_previous_product(sender, instance, update_fields=None, **kwargs):
+    """
+    Before a product is saved, load its stored values in one query
+    for both the dashboard rollup and the promotion index gift check.
+    """
+    # Import here to avoid circular imports
+    from ..services.dashboard_rollup import TRACKED_MODELS, capture_previous
+    from ..services.promotion_engine import GIFT_PRODUCT_FIELDS, gift_product_changed
+
+    fields = {*TRACKED_MODELS['v1.Product'][0], *GIFT_PRODUCT_FIELDS}
+    stored = None
+    if not instance._state.adding and (update_fields is None or set(update_fields) & fields):
+        stored = Product._base_manager.filter(pk=instance.pk).values(*fields).first()
+    capture_previous(instance, update_fields, stored)
+    instance._promotion_gift_changed = gift_product_changed(instance, update_fields, stored)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+def update_dashboard_rollup_on_save(sender, instance, **kwargs):
+    """
+    When a product or order is saved (including order status transitions),
+    adjust the dashboard rollup counters after commit.
+    """
+    # Import here to avoid circular imports
+    from ..services.dashboard_rollup import record_saved
+
+    record_saved(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def update_dashboard_rollup_on_delete(sender, instance, **kwargs):
+    """
+    When a product or order is hard-deleted, remove it from the dashboard rollup.
+    """
+    # Import here to avoid circular imports
+    from ..services.dashboard_rollup import record_deleted
+
+    record_deleted(instance)
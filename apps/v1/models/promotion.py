@@ -4,6 +4,7 @@ import django.utils.timezone as timezone
 from utils.model import SoftModel, BaseModel
 from simple_history.models import HistoricalRecords
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
@@ -76,44 +77,13 @@ class ActivityProduct(BaseModel):
     def calculate_available_stock(self):
         """
         Calculate available stock based on the product's component batches.
-        Returns the maximum number of products that can be produced.
+        Returns the maximum number of products that can be produced,
+        limited by each component's available batch stock (stock + active - reserved).
         """
         # Import here to avoid circular imports
-        from .warehouse import ProductItemRelation
+        from ..services.stock_projection import compute_buildable_units
         
-        # Get the product for this activity product
-        product = self.product
-        
-        # Get all related item relations for this product
-        item_relations = ProductItemRelation.objects.filter(product=product)
-        
-        if not item_relations.exists():
-            # If no components are defined, return 0 or some default value
-            return 0
-        
-        # Calculate how many products can be produced based on each component
-        max_products_per_component = []
-        
-        for relation in item_relations:
-            # For each component, check how many products can be made
-            if relation.quantity <= 0:
-                # If quantity required is 0 or negative, this doesn't limit production
-                continue
-                
-            batch = relation.batch
-            if not batch:
-                # If no specific batch is assigned, return 0 or handle differently
-                return 0
-                
-            # Calculate how many products can be made from this batch
-            if batch.quantity > 0:
-                max_products = batch.quantity // relation.quantity
-                max_products_per_component.append(max_products)
-        
-        # The available stock is limited by the component with the lowest availability
-        if max_products_per_component:
-            return min(max_products_per_component)
-        return 0
+        return compute_buildable_units([self.product_id])[self.product_id]
     
     def update_stock(self):
         """Update the stock field based on calculated availability"""
@@ -254,4 +224,69 @@ class UserActivityLog(BaseModel):
         unique_together = ('user', 'activity')
 
     def __str__(self):
-        return f"{self.user} - {self.activity.name}"
\ No newline at end of file
+        return f"{self.user} - {self.activity.name}"
+
+# Signal handlers to invalidate the promotion engine index
+@receiver(post_save, sender=PromotionRule)
+@receiver(post_delete, sender=PromotionRule)
+@receiver(post_save, sender=PromotionRuleRelation)
+@receiver(post_delete, sender=PromotionRuleRelation)
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+@receiver(post_save, sender=ActivityProduct)
+@receiver(post_delete, sender=ActivityProduct)
+def invalidate_promotion_index_on_change(sender, instance, **kwargs):
+    """
+    When promotion rules, their relations or activities change,
+    bump the promotion engine version after commit so every process rebuilds its index.
+    """
+    # Import here to avoid circular imports
+    from ..services.promotion_engine import invalidate_promotion_index
+
+    transaction.on_commit(invalidate_promotion_index)
+
+
+@receiver(post_save, sender='v1.Product')
+def invalidate_promotion_index_on_gift_product_change(sender, instance, **kwargs):
+    """
+    When a gift product's name or image changes,
+    bump the promotion engine version after commit.
+    """
+    # Import here to avoid circular imports
+    from ..services.promotion_engine import invalidate_promotion_index
+
+    # _promotion_gift_changed is set by capture_previous_product (models/ecommerce.py)
+    if instance.__dict__.pop('_promotion_gift_changed', False):
+        transaction.on_commit(invalidate_promotion_index)
+
+
+@receiver(post_save, sender=ActivityProduct)
+@receiver(post_delete, sender=ActivityProduct)
+@receiver(post_save, sender='v1.ProductDefaultPrice')
+@receiver(post_delete, sender='v1.ProductDefaultPrice')
+def invalidate_catalog_price_on_product_change(sender, instance, **kwargs):
+    """
+    When an activity product or a default price changes,
+    drop the cached catalog price of that product once the transaction commits.
+    """
+    # Import here to avoid circular imports
+    from ..services.catalog_pricing import invalidate_catalog_prices
+
+    product_ids = [instance.product_id]
+    transaction.on_commit(lambda: invalidate_catalog_prices(product_ids))
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def invalidate_catalog_price_on_activity_change(sender, instance, **kwargs):
+    """
+    When an activity changes (name or period),
+    drop the cached catalog prices of every product in it once the transaction commits.
+    """
+    # Import here to avoid circular imports
+    from ..services.catalog_pricing import invalidate_catalog_prices
+
+    product_ids = list(
+        ActivityProduct.objects.filter(activity_id=instance.id).values_list('product_id', flat=True)
+    )
+    transaction.on_commit(lambda: invalidate_catalog_prices(product_ids))
@@ -161,46 +161,129 @@ class ProductItemRelation(BaseModel):
 
 
 # Signal handlers to update stock calculations
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=Batch)
 def update_product_stock_on_batch_change(sender, instance, **kwargs):
     """
-    When a batch is updated, update the stock for all activity products
-    that use this batch through product item relations.
+    When a batch is updated, mark every product that uses this batch
+    so its activity product stock is recalculated after commit.
     """
     # Import here to avoid circular imports
-    from .promotion import ActivityProduct
+    from ..services.stock_projection import mark_batches_dirty
     
-    # Find all products using this batch
-    relations = ProductItemRelation.objects.filter(batch=instance)
-    
-    # Get unique products
-    affected_products = set(relation.product for relation in relations)
-    
-    # Update all activity products for these products
-    for product in affected_products:
-        activity_products = ActivityProduct.objects.filter(product=product)
-        for ap in activity_products:
-            ap.update_stock()
+    mark_batches_dirty([instance.id])
 
 @receiver(post_save, sender=ProductItemRelation)
 @receiver(post_delete, sender=ProductItemRelation)
 def update_product_stock_on_relation_change(sender, instance, **kwargs):
     """
     When a product-item relation is changed or deleted,
-    update the stock for all related activity products.
+    mark the product so its activity product stock is recalculated after commit.
     """
     # Import here to avoid circular imports
-    from .promotion import ActivityProduct
-    
-    # Get the affected product
-    product = instance.product
+    from ..services.stock_projection import mark_products_dirty
     
-    # Update all activity products for this product
-    activity_products = ActivityProduct.objects.filter(product=product)
-    for ap in activity_products:
-        ap.update_stock()
+    mark_products_dirty([instance.product_id])
+
+
+@receiver(pre_save, sender=Batch)
+def capture_previous_batch(sender, instance, update_fields=None, **kwargs):
+    """
+    批號儲存前以一次查詢取得資料庫中的原值，
+    供儲存後計算 Redis 可預留數量計數器的差額與儀表板庫存統計的差異。
+    """
+    # Import here to avoid circular imports
+    from ..services.inventory_reservation import reservable_quantity
+    from ..services.dashboard_rollup import TRACKED_MODELS, capture_previous
+
+    fields = {'quantity', 'reserved_stock', *TRACKED_MODELS['v1.Batch'][0]}
+    stored = None
+    if not instance._state.adding and (update_fields is None or set(update_fields) & fields):
+        stored = Batch._base_manager.filter(pk=instance.pk).values(*fields).first()
+    instance._inventory_previous = (
+        reservable_quantity(stored['quantity'], stored['reserved_stock']) if stored else None
+    )
+    capture_previous(instance, update_fields, stored)
+
+
+@receiver(post_save, sender=Batch)
+def adjust_inventory_counter_on_batch_save(sender, instance, **kwargs):
+    """
+    批號經由 save() 異動時（後台調整、取消），
+    於交易提交後以差額更新 Redis 可預留數量計數器（不清除，避免重新載入時重複計入未提交的預留）。
+    """
+    # Import here to avoid circular imports
+    from django.db import transaction
+    from ..services.inventory_reservation import reservable_quantity, adjust_inventory_counters
+
+    previous = instance.__dict__.pop('_inventory_previous', None)
+    if previous is None:
+        return
+    batch_id = instance.id
+    delta = reservable_quantity(instance.quantity, instance.reserved_stock) - previous
+    if delta:
+        transaction.on_commit(lambda: adjust_inventory_counters({batch_id: delta}))
+
+
+@receiver(post_delete, sender=Batch)
+def reset_inventory_counter_on_batch_delete(sender, instance, **kwargs):
+    """
+    批號刪除後，於交易提交後清除 Redis 可預留數量計數器。
+    """
+    # Import here to avoid circular imports
+    from django.db import transaction
+    from ..services.inventory_reservation import reset_inventory_counters
+
+    batch_id = instance.id
+    transaction.on_commit(lambda: reset_inventory_counters([batch_id]))
+
 
+@receiver(post_save, sender=Batch)
+def update_dashboard_rollup_on_batch_save(sender, instance, **kwargs):
+    """
+    When a batch is saved, adjust the dashboard stock rollup after commit.
+    """
+    # Import here to avoid circular imports
+    from ..services.dashboard_rollup import record_saved
+
+    record_saved(instance)
+
+
+@receiver(post_delete, sender=Batch)
+def update_dashboard_rollup_on_batch_delete(sender, instance, **kwargs):
+    """
+    When a batch is hard-deleted, remove it from the dashboard stock rollup.
+    """
+    # Import here to avoid circular imports
+    from ..services.dashboard_rollup import record_deleted
+
+    record_deleted(instance)
+
+
+@receiver(post_save, sender=MaterialCategory)
+@receiver(post_delete, sender=MaterialCategory)
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_material_category_tree_on_change(sender, instance, **kwargs):
+    """
+    When a material category or an item changes, drop the cached
+    material category tree (structure and item counts).
+    """
+    # Import here to avoid circular imports
+    from ..services.category_tree import invalidate_material_category_tree
+
+    invalidate_material_category_tree()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree_on_change(sender, instance, **kwargs):
+    """
+    When a product category changes, drop the cached category tree.
+    """
+    # Import here to avoid circular imports
+    from ..services.category_tree import invalidate_category_tree
 
+    invalidate_category_tree()
@@ -41,6 +41,7 @@ from .promotion import (
     UserActivityLogSerializer,
     HistoricalRecordSerializer,
     GiftProductBriefSerializer,
+    AuditEventSerializer,
 )
 
 from .customer import(
@@ -99,6 +100,7 @@ __all__ = [
     'UserActivityLogSerializer',
     'HistoricalRecordSerializer',
     'GiftProductBriefSerializer',
+    'AuditEventSerializer',
 
 
     'CustomerServiceConfigSerializer',
@@ -11,8 +11,9 @@ from ..models.ecommerce import (
     OrderItem,
     ShipmentItem
 )
-from ..models.promotion import Activity, ActivityProduct, PromotionRuleRelation
-from django.db import models
+from ..models.promotion import Activity, ActivityProduct
+from ..services.cart_summary import CartPricingContext
+from ..services.catalog_pricing import resolve_catalog_prices
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -169,99 +170,37 @@ class CartItemSerializer(serializers.ModelSerializer):
     def get_activityName(self, obj):
         return obj.activity.name if obj.activity else ""
 
+    def get_pricing(self, obj):
+        """
+        取得購物車計價上下文
+        優先使用 view 透過 context['cart_pricing'] 傳入的物件；
+        未傳入時以整份列表建立一次並存回 context，避免逐筆查詢
+        """
+        pricing = self.context.get('cart_pricing')
+        if pricing is None or not pricing.covers(obj):
+            parent = self.parent
+            items = parent.instance if isinstance(parent, serializers.ListSerializer) else [obj]
+            pricing = CartPricingContext(items)
+            self.context['cart_pricing'] = pricing
+        return pricing
+
     def get_applicable_rule(self, obj):
-        return PromotionRuleRelation.objects.filter(
-            is_active=True
-        ).filter(
-            models.Q(product=obj.product) |
-            models.Q(activity_product__product=obj.product, activity_product__activity=obj.activity) |
-            models.Q(activity=obj.activity)
-        ).order_by('-priority').first()
+        return self.get_pricing(obj).applicable_rule(obj)
 
     def get_price(self, obj):
-        rule_rel = self.get_applicable_rule(obj)
-        
-        # 如果有活動ID，嘗試獲取活動商品價格
-        original_price = 0
-        if obj.activity:
-            try:
-                # 從活動商品表中獲取價格
-                activity_product = ActivityProduct.objects.filter(
-                    activity=obj.activity,
-                    product=obj.product
-                ).first()
-                if activity_product:
-                    original_price = activity_product.price
-            except Exception as e:
-                print(f"Error getting activity price: {e}")
-        
-        # 如果沒有活動價格，嘗試獲取默認價格
-        if original_price == 0 and hasattr(obj.product, 'default_price') and obj.product.default_price:
-            try:
-                original_price = obj.product.default_price.price
-            except Exception:
-                original_price = 0
-        
-        # 應用優惠規則
-        if rule_rel and rule_rel.promotion_rule.rule_type == 'buy_discount':
-            rule = rule_rel.promotion_rule
-            if rule.threshold_quantity and obj.quantity >= rule.threshold_quantity:
-                return float(original_price * (1 - rule.discount_rate))
-        
-        return float(original_price)
+        return float(self.get_pricing(obj).line(obj).price)
 
     def get_original_price(self, obj):
-        if obj.activity:
-            try:
-                activity_product = ActivityProduct.objects.filter(
-                    activity=obj.activity,
-                    product=obj.product
-                ).first()
-                if activity_product:
-                    return float(activity_product.original_price)
-            except Exception:
-                pass
-        
-        # 如果沒有活動原價，嘗試獲取默認價格
-        try:
-            if hasattr(obj.product, 'default_price') and obj.product.default_price:
-                return float(obj.product.default_price.price)
-            return 0
-        except Exception:
-            return 0
+        return float(self.get_pricing(obj).original_price(obj))
 
     def get_gift_quantity(self, obj):
-        rule_rel = self.get_applicable_rule(obj)
-        if rule_rel and rule_rel.promotion_rule.rule_type == 'buy_gift':
-            rule = rule_rel.promotion_rule
-            if rule.threshold_quantity and obj.quantity >= rule.threshold_quantity:
-                return (obj.quantity // rule.threshold_quantity) * (rule.gift_quantity or 0)
-        return 0
+        return self.get_pricing(obj).line(obj).gift_count
 
     def get_gifts(self, obj):
-        rule_rel = self.get_applicable_rule(obj)
-        rule = rule_rel.promotion_rule if rule_rel else None
-        gift_product = rule.gift_product if rule and rule.rule_type == 'buy_gift' else None
-
-        if gift_product and rule.threshold_quantity and obj.quantity >= rule.threshold_quantity:
-            return [{
-                "product_id": gift_product.id,
-                "name": gift_product.product_name,
-                "imageUrl": gift_product.main_image_url
-            }]
-        return []
-
+        return self.get_pricing(obj).gifts(obj)
 
     def get_promotion_label(self, obj):
-        rule_rel = self.get_applicable_rule(obj)
-        rule = rule_rel.promotion_rule if rule_rel else None
-        if not rule:
-            return ""
-        if rule.rule_type == 'buy_discount' and rule.discount_rate:
-            return f"{int(rule.discount_rate * 10)}折"
-        elif rule.rule_type == 'buy_gift':
-            return f"買{rule.threshold_quantity}送{rule.gift_quantity}"
-        return ""
+        return self.get_pricing(obj).promotion_label(obj)
 
 
 class CartItemCreateSerializer(serializers.Serializer):
@@ -383,26 +322,31 @@ class ProductWithPricingSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'product_name', 'main_image_url', 'price', 'original_price', 'is_promotion', 'activity_name']
     
+    def get_pricing(self, obj):
+        """
+        取得商品售價資訊
+        以整頁商品一次解析（含快取），結果存於 context['catalog_pricing']
+        """
+        pricing = self.context.setdefault('catalog_pricing', {})
+        if obj.id not in pricing:
+            parent = self.parent
+            products = parent.instance if isinstance(parent, serializers.ListSerializer) else [obj]
+            pricing.update(resolve_catalog_prices([product.id for product in products]))
+        return pricing[obj.id]
+
     def get_price(self, obj):
         # 活動價格優先，否則回傳常態價格
-        activity_product = obj.activities.filter(activity__end_date__gte=timezone.now()).first()
-        if activity_product:
-            return activity_product.price
-        return getattr(obj.default_price, "price", 0)
+        return self.get_pricing(obj)['price']
 
     def get_original_price(self, obj):
-        activity_product = obj.activities.filter(activity__end_date__gte=timezone.now()).first()
-        if activity_product:
-            return activity_product.original_price
-        return getattr(obj.default_price, "price", 0)
+        return self.get_pricing(obj)['original_price']
 
     def get_is_promotion(self, obj):
-        return obj.activities.filter(activity__end_date__gte=timezone.now()).exists()
+        return self.get_pricing(obj)['is_promotion']
 
     def get_activity_name(self, obj):
-        activity_product = obj.activities.filter(activity__end_date__gte=timezone.now()).first()
-        return activity_product.activity.name if activity_product else None
-        
+        return self.get_pricing(obj)['activity_name']
+
 class OrderInventoryLogSerializer(serializers.ModelSerializer):
     batch_number = serializers.CharField(source='batch.batch_number', read_only=True)
     operation_display = serializers.CharField(source='get_operation_display', read_only=True)
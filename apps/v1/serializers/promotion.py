@@ -8,6 +8,7 @@ from ..models.promotion import (
 )
 
 from ..models.ecommerce import Product
+from ..models.audit import AuditEvent
 
 class GiftProductBriefSerializer(serializers.ModelSerializer):
     """贈品簡要資料序列化"""
@@ -192,6 +193,10 @@ class HistoricalRecordSerializer(serializers.Serializer):
         }.get(obj.history_type, obj.history_type)
     
     def get_changes(self, obj):
+        # 由 history_diff.compute_page_changes 預先計算整頁差異
+        page_changes = self.context.get('history_changes')
+        if page_changes is not None and obj.pk in page_changes:
+            return page_changes[obj.pk]
         try:
             # diff_against 需依賴 simple_history 的擴展方法
             diff = obj.diff_against(obj.prev_record)
@@ -204,4 +209,18 @@ class HistoricalRecordSerializer(serializers.Serializer):
             }
         except Exception as e:
             # 若無法比較（如第一筆、已刪除對象），回傳空字典
-            return {}
\ No newline at end of file
+            return {}
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    """操作時間軸事件序列化器"""
+    event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
+    user_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuditEvent
+        fields = ['id', 'model_name', 'object_id', 'event_type', 'event_type_display',
+                  'user', 'user_name', 'event_time', 'changed_fields', 'change_reason']
+
+    def get_user_name(self, obj):
+        return obj.user.username if obj.user else None
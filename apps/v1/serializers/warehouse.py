@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from utils.tree import TreeChildrenMixin
 from ..models.warehouse import (
     InventoryReservation,
     MaterialCategory, 
@@ -16,18 +17,13 @@ class MaterialCategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class MaterialCategoryTreeSerializer(serializers.ModelSerializer):
+class MaterialCategoryTreeSerializer(TreeChildrenMixin, serializers.ModelSerializer):
     """物料類別樹狀結構序列化器"""
     children = serializers.SerializerMethodField()
     
     class Meta:
         model = MaterialCategory
         fields = ['id', 'name', 'description', 'item_count', 'children']
-    
-    def get_children(self, obj):
-        children = MaterialCategory.objects.filter(parent=obj)
-        serializer = MaterialCategoryTreeSerializer(children, many=True)
-        return serializer.data
 
 
 class MaterialCategoryItemCountSerializer(serializers.Serializer):
@@ -45,19 +41,13 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class CategoryTreeSerializer(serializers.ModelSerializer):
+class CategoryTreeSerializer(TreeChildrenMixin, serializers.ModelSerializer):
     """包含子類別的樹狀結構序列化器"""
     children = serializers.SerializerMethodField()
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'product_count', 'create_time', 'update_time', 'children']
-    
-    def get_children(self, obj):
-        """獲取子類別並遞歸序列化"""
-        children = Category.objects.filter(parent=obj)
-        serializer = CategoryTreeSerializer(children, many=True)
-        return serializer.data
 
 
 class ItemSerializer(serializers.ModelSerializer):
@@ -0,0 +1,193 @@
+# services/audit_timeline.py
+"""
+操作時間軸
+AUDITED_MODELS 的 simple_history 歷史紀錄寫入單一的 AuditEvent 資料表（模型、物件ID、
+操作者、事件類型、時間、異動欄位），查詢時只需掃描一張有索引的資料表，
+不必逐一查詢各模型的 Historical* 表再於記憶體排序。
+
+- 單筆儲存由 post_create_historical_record signal 於交易提交後寫入（record_history_event），
+  其他模型的歷史紀錄不寫入，也不計算異動欄位
+- bulk_history_create / bulk_create_with_history 不會發送 signal，
+  批次寫入的流程需自行呼叫 record_history_events / record_object_events
+"""
+import logging
+
+from django.apps import apps
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# 寫入時間軸的模型（原操作紀錄查詢涵蓋的模型，以及下單、逾期流程批次寫入的預留與庫存日誌）
+AUDITED_MODELS = frozenset([
+    'v1.Item', 'v1.Product', 'v1.Batch', 'v1.Activity', 'v1.Order', 'v1.OrderItem',
+    'v1.Banner', 'v1.Cart', 'v1.PromotionRule', 'v1.UserActivityLog',
+    'v1.MaterialCategory', 'v1.Category', 'v1.InventoryReservation', 'v1.OrderInventoryLog',
+])
+
+
+def _build_event(history_instance, changed_fields=None):
+    from ..models import AuditEvent
+
+    instance_model = history_instance.instance_type
+    pk_name = instance_model._meta.pk.attname
+    return AuditEvent(
+        model_name=instance_model._meta.label,
+        object_id=str(getattr(history_instance, pk_name)),
+        history_id=str(history_instance.pk) if history_instance.pk is not None else None,
+        event_type=history_instance.history_type,
+        user_id=history_instance.history_user_id,
+        event_time=history_instance.history_date,
+        changed_fields=list(changed_fields or []),
+        change_reason=(history_instance.history_change_reason or None),
+    )
+
+
+def get_changed_fields(history_instance):
+    """與前一筆歷史紀錄比較，回傳異動的欄位名稱"""
+    if history_instance.history_type != '~':
+        return []
+    try:
+        prev_record = history_instance.prev_record
+        if prev_record is None:
+            return []
+        return sorted(history_instance.diff_against(prev_record).changed_fields)
+    except Exception as e:
+        logger.warning(f"計算異動欄位失敗: {str(e)}")
+        return []
+
+
+def record_history_event(history_instance):
+    """
+    為單筆歷史紀錄寫入時間軸事件
+    僅限 AUDITED_MODELS；異動欄位的比較與寫入在交易提交後進行，不佔用寫入交易的時間
+    """
+    if history_instance.instance_type._meta.label not in AUDITED_MODELS:
+        return
+    transaction.on_commit(
+        lambda: _build_event(history_instance, get_changed_fields(history_instance)).save()
+    )
+
+
+def _resolve_history_ids(history_instances):
+    """
+    補上批次建立的歷史紀錄主鍵
+    bulk_create 在 MySQL 不回傳主鍵，以（物件ID, 歷史時間）查回 history_id，
+    否則事件沒有 history_id，backfill_events 會重複匯入
+    """
+    missing = [history_instance for history_instance in history_instances if history_instance.pk is None]
+    if not missing:
+        return history_instances
+
+    history_model = type(missing[0])
+    pk_name = history_model.instance_type._meta.pk.attname
+    rows = history_model.objects.filter(**{
+        f'{pk_name}__in': {getattr(history_instance, pk_name) for history_instance in missing},
+        'history_date__in': {history_instance.history_date for history_instance in missing},
+    }).values_list(pk_name, 'history_date', 'history_id')
+    history_ids = {(object_id, history_date): history_id for object_id, history_date, history_id in rows}
+    for history_instance in missing:
+        history_instance.pk = history_ids.get((getattr(history_instance, pk_name), history_instance.history_date))
+    return history_instances
+
+
+def record_history_events(history_instances, changed_fields=None):
+    """
+    為批次建立的歷史紀錄寫入時間軸事件
+
+    Args:
+        history_instances: bulk_history_create 的回傳值
+        changed_fields: 本次批次更新異動的欄位（呼叫端已知，不逐筆比較）
+    """
+    from ..models import AuditEvent
+
+    events = [
+        _build_event(history_instance, changed_fields)
+        for history_instance in _resolve_history_ids(list(history_instances or []))
+    ]
+    if events:
+        AuditEvent.objects.bulk_create(events)
+
+
+def record_object_events(model, objs):
+    """
+    為 bulk_create_with_history 建立的物件寫入時間軸事件
+    以其新增的歷史紀錄建立事件（含 history_id、操作者與時間），與 backfill_events 一致
+    """
+    pks = [obj.pk for obj in objs]
+    if not pks:
+        return
+    record_history_events(model.history.filter(
+        **{f'{model._meta.pk.attname}__in': pks}, history_type='+'
+    ).order_by('history_id'))
+
+
+def resolve_model_labels(model):
+    """
+    將模型名稱（不分大小寫，可為 Order 或 v1.Order）轉為事件儲存的 app_label.ModelName
+    以精確比對使用索引；不同 app 的同名模型會全部納入
+    """
+    lowered = model.lower()
+    labels = [
+        model_cls._meta.label
+        for model_cls in apps.get_models()
+        if lowered in (model_cls._meta.model_name, model_cls._meta.label_lower)
+    ]
+    return labels or [model]
+
+
+def timeline_queryset(model=None, user_id=None, object_id=None, since=None, until=None):
+    """
+    依條件過濾的時間軸查詢（新到舊）
+
+    Args:
+        model: 模型名稱（不分大小寫，可含 app_label）
+        user_id: 操作者ID
+        object_id: 物件ID（需搭配 model）
+        since / until: 時間範圍
+    """
+    from ..models import AuditEvent
+
+    queryset = AuditEvent.objects.select_related('user')
+    if model:
+        queryset = queryset.filter(model_name__in=resolve_model_labels(model))
+        if object_id:
+            queryset = queryset.filter(object_id=str(object_id))
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+    if since:
+        queryset = queryset.filter(event_time__gte=since)
+    if until:
+        queryset = queryset.filter(event_time__lt=until)
+    return queryset.order_by('-event_time', '-id')
+
+
+def backfill_events(history_model, since=None, chunk_size=1000):
+    """
+    將既有的歷史紀錄匯入時間軸（已匯入的紀錄略過）
+
+    Returns:
+        int: 新增的事件數量
+    """
+    from ..models import AuditEvent
+
+    model_name = history_model.instance_type._meta.label
+    queryset = history_model.objects.order_by('pk')
+    if since:
+        queryset = queryset.filter(history_date__gte=since)
+
+    created = 0
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(pk__gt=last_id)
+        records = list(chunk[:chunk_size])
+        if not records:
+            break
+        last_id = records[-1].pk
+
+        existing = set(AuditEvent.objects.filter(
+            model_name=model_name, history_id__in=[str(record.pk) for record in records]
+        ).values_list('history_id', flat=True))
+        events = [_build_event(record) for record in records if str(record.pk) not in existing]
+        AuditEvent.objects.bulk_create(events)
+        created += len(events)
+    return created
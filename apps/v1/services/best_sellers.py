@@ -0,0 +1,252 @@
+# services/best_sellers.py
+"""
+熱銷排行
+以 Redis sorted set 保存商品銷售數量（score），訂單付款時累加、已付款訂單取消時扣回，
+讀取時以單一查詢補上商品資料。統計不含贈品，日期以訂單付款時間為準。
+
+- best_sellers:all                  全期
+- best_sellers:day:{日期}            每日（保留 DAY_RETENTION_DAYS 天）
+- best_sellers:week:{年-W週}         每週（ISO 週，保留 WEEK_RETENTION_WEEKS 週）
+- best_sellers:activity:{活動ID}     各活動全期
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .dashboard_rollup import local_day_bucket
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+ALL_KEY = 'best_sellers:all'
+DAY_KEY = 'best_sellers:day:{date}'
+WEEK_KEY = 'best_sellers:week:{week}'
+ACTIVITY_KEY = 'best_sellers:activity:{activity_id}'
+# 排行已由資料庫重建的標記（不存在時讀取前先重建）
+BUILT_KEY = 'best_sellers:built'
+REBUILD_LOCK_KEY = 'best_sellers_rebuild_lock'
+REBUILD_LOCK_TIMEOUT = 60 * 5
+
+DAY_RETENTION_DAYS = 8
+WEEK_RETENTION_WEEKS = 5
+# 計入排行的訂單狀態（已付款之後的狀態）
+COUNTED_STATUSES = ('paid', 'shipped', 'completed')
+PERIODS = ('all', 'day', 'week')
+# 單次讀取的最大筆數
+MAX_LIMIT = 20
+
+
+def _week_label(day):
+    year, week, _ = day.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def _period_keys(day, activity_id=None):
+    """單筆銷售要累加的 (key, 存活秒數)"""
+    keys = [
+        (ALL_KEY, None),
+        (DAY_KEY.format(date=day.isoformat()), DAY_RETENTION_DAYS * 24 * 60 * 60),
+        (WEEK_KEY.format(week=_week_label(day)), WEEK_RETENTION_WEEKS * 7 * 24 * 60 * 60),
+    ]
+    if activity_id:
+        keys.append((ACTIVITY_KEY.format(activity_id=activity_id), None))
+    return keys
+
+
+def _order_day(order):
+    return timezone.localdate(order.paid_at or order.create_time)
+
+
+def _apply_sales(day, items, sign):
+    """
+    累加 / 扣回銷售數量（Redis 不可用時略過，由 rebuild_best_sellers 校正）
+
+    Args:
+        items: [(商品ID, 活動ID, 數量)]
+    """
+    if not items:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        touched = {}
+        for product_id, activity_id, quantity in items:
+            for key, ttl in _period_keys(day, activity_id):
+                pipe.zincrby(key, sign * quantity, product_id)
+                touched[key] = ttl
+        for key, ttl in touched.items():
+            if sign < 0:
+                pipe.zremrangebyscore(key, '-inf', 0)
+            if ttl:
+                pipe.expire(key, ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"更新熱銷排行失敗: {str(e)}")
+
+
+def _order_items(order):
+    from ..models import OrderItem
+
+    return list(
+        OrderItem.objects.filter(order=order, is_gift=False, product__isnull=False)
+        .values_list('product_id', 'activity_id', 'quantity')
+    )
+
+
+def record_order_paid(order):
+    """訂單付款後（交易提交時）累加其商品銷售數量"""
+    items = _order_items(order)
+    day = _order_day(order)
+    transaction.on_commit(lambda: _apply_sales(day, items, 1))
+
+
+def record_order_cancelled(order):
+    """已付款訂單取消後（交易提交時）扣回其商品銷售數量"""
+    items = _order_items(order)
+    day = _order_day(order)
+    transaction.on_commit(lambda: _apply_sales(day, items, -1))
+
+
+def rebuild_best_sellers():
+    """
+    由資料庫重建所有排行（首次啟用、Redis 資料遺失或校正時）
+
+    Returns:
+        int: 重建的排行數量
+    """
+    from ..models import OrderItem
+
+    today = timezone.localdate()
+    earliest_day = today - timezone.timedelta(days=DAY_RETENTION_DAYS - 1)
+    earliest_week = today - timezone.timedelta(weeks=WEEK_RETENTION_WEEKS - 1)
+    earliest_week_label = _week_label(earliest_week)
+    # 每日 / 每週排行涵蓋的第一天，更早的銷售只計入全期與活動排行（日期為 None）
+    first_day = min(earliest_day, earliest_week - timezone.timedelta(days=earliest_week.weekday()))
+
+    rows = (
+        OrderItem.objects.filter(
+            order__status__in=COUNTED_STATUSES, order__is_deleted=False,
+            is_gift=False, product__isnull=False
+        )
+        .annotate(sold_at=Coalesce('order__paid_at', 'order__create_time'))
+        .annotate(day=local_day_bucket('sold_at', first_day, today))
+        .values('product_id', 'activity_id', 'day')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+
+    boards = {}
+    for row in rows:
+        if row['day'] is None:
+            period_keys = [(ALL_KEY, None)]
+            if row['activity_id']:
+                period_keys.append((ACTIVITY_KEY.format(activity_id=row['activity_id']), None))
+        else:
+            period_keys = _period_keys(row['day'], row['activity_id'])
+        for key, ttl in period_keys:
+            if key.startswith('best_sellers:day:') and row['day'] < earliest_day:
+                continue
+            if key.startswith('best_sellers:week:') and _week_label(row['day']) < earliest_week_label:
+                continue
+            scores, _ = boards.setdefault(key, ({}, ttl))
+            scores[row['product_id']] = scores.get(row['product_id'], 0) + row['quantity']
+
+    stale_keys = list(redis_client.scan_iter(match='best_sellers:*'))
+    pipe = redis_client.pipeline(transaction=True)
+    if stale_keys:
+        pipe.delete(*stale_keys)
+    for key, (scores, ttl) in boards.items():
+        pipe.zadd(key, scores)
+        if ttl:
+            pipe.expire(key, ttl)
+    pipe.set(BUILT_KEY, timezone.now().isoformat())
+    pipe.execute()
+
+    logger.info(f"熱銷排行重建完成: {len(boards)} 個排行")
+    return len(boards)
+
+
+def _ensure_built():
+    """排行尚未建立時重建（同一時間只由一個請求執行）"""
+    if redis_client.exists(BUILT_KEY):
+        return
+    if not cache.add(REBUILD_LOCK_KEY, 1, REBUILD_LOCK_TIMEOUT):
+        return
+    try:
+        rebuild_best_sellers()
+    finally:
+        cache.delete(REBUILD_LOCK_KEY)
+
+
+def _ranking_from_db(period, activity_id, limit):
+    """Redis 不可用時由資料庫計算排行"""
+    from ..models import OrderItem
+
+    queryset = OrderItem.objects.filter(
+        order__status__in=COUNTED_STATUSES, order__is_deleted=False,
+        is_gift=False, product__isnull=False
+    )
+    if activity_id:
+        queryset = queryset.filter(activity_id=activity_id)
+    if period != 'all':
+        today = timezone.localdate()
+        since = today if period == 'day' else today - timezone.timedelta(days=today.weekday())
+        queryset = queryset.filter(order__paid_at__date__gte=since)
+    return list(
+        queryset.values('product_id').annotate(quantity=Sum('quantity'))
+        .order_by('-quantity').values_list('product_id', 'quantity')[:limit]
+    )
+
+
+def get_ranking(period='all', activity_id=None, limit=10):
+    """
+    排行中的 (商品ID, 銷售數量)，由多到少
+
+    Args:
+        period: all、day（今日）或 week（本週）；指定 activity_id 時為該活動全期
+        limit: 筆數（限制在 1 ~ MAX_LIMIT）
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    if activity_id:
+        key = ACTIVITY_KEY.format(activity_id=activity_id)
+    elif period == 'day':
+        key = DAY_KEY.format(date=timezone.localdate().isoformat())
+    elif period == 'week':
+        key = WEEK_KEY.format(week=_week_label(timezone.localdate()))
+    else:
+        key = ALL_KEY
+
+    try:
+        _ensure_built()
+        return [
+            (int(member), int(score))
+            for member, score in redis_client.zrevrange(key, 0, limit - 1, withscores=True)
+        ]
+    except redis.RedisError as e:
+        logger.warning(f"讀取熱銷排行失敗，改由資料庫計算: {str(e)}")
+        return _ranking_from_db(period, activity_id, limit)
+
+
+def get_best_sellers(period='all', activity_id=None, limit=10):
+    """
+    熱銷商品（以單一查詢補上商品資料，已刪除的商品略過）
+
+    Returns:
+        list: [(Product, 銷售數量)]
+    """
+    from ..models import Product
+
+    ranking = get_ranking(period, activity_id, limit)
+    products = Product.objects.in_bulk([product_id for product_id, _ in ranking])
+    return [
+        (products[product_id], quantity)
+        for product_id, quantity in ranking
+        if product_id in products
+    ]
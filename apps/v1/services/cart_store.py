@@ -0,0 +1,157 @@
+# services/cart_store.py
+"""
+購物車快照（Redis）
+每位用戶一個 Redis hash，存放已序列化的購物車項目、優惠摘要與商品總數：
+- payload: {'items': [...], 'summary': {...}} 的 JSON
+- count: 購物車商品總數量
+- promotion_version: 建立快照時的促銷規則版本號
+- generation: 購物車異動次數，每次異動（交易提交後）遞增並清除快照
+
+購物車的異動仍同步寫入 Cart / CartItem，寫入後清除快照；
+讀取（items / count）則直接由快照回應，不需查詢資料庫，未命中時由呼叫端重建。
+重建前先取得 generation，寫入時 generation 未變才寫入（Lua 腳本比較後寫入），
+避免較慢的請求以舊資料覆蓋較新的快照。
+促銷規則版本變動或快照過期時視為未命中。
+"""
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .promotion_engine import get_promotion_version
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+CART_SNAPSHOT_KEY = 'cart_snapshot:{user_id}'
+# 快照存活時間（秒），作為商品預設價格等未版本化資料的更新上限
+CART_SNAPSHOT_TTL = getattr(settings, 'CART_SNAPSHOT_TTL', 60 * 10)
+
+
+# generation 與讀取時相同才寫入欄位（ARGV: generation, 存活秒數, 欄位, 值, ...）
+SAVE_IF_GENERATION_SCRIPT = """
+local generation = redis.call('HGET', KEYS[1], 'generation') or ''
+if generation ~= ARGV[1] then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+_save_if_generation = redis_client.register_script(SAVE_IF_GENERATION_SCRIPT)
+
+
+def _snapshot_key(user_id):
+    return CART_SNAPSHOT_KEY.format(user_id=user_id)
+
+
+def get_cart_generation(user_id):
+    """
+    重建快照前取得購物車的 generation
+
+    Returns:
+        str | None: Redis 不可用時回傳 None（不寫入快照）
+    """
+    try:
+        generation = redis_client.hget(_snapshot_key(user_id), 'generation')
+    except redis.RedisError as e:
+        logger.warning(f"讀取購物車快照版本失敗: {str(e)}")
+        return None
+    return generation.decode() if generation is not None else ''
+
+
+def _save_fields(user_id, generation, fields):
+    if generation is None:
+        return
+    args = [generation, CART_SNAPSHOT_TTL]
+    for field, value in fields.items():
+        args += [field, value]
+    _save_if_generation(keys=[_snapshot_key(user_id)], args=args)
+
+
+def load_cart_snapshot(user_id):
+    """
+    讀取購物車快照
+
+    Returns:
+        dict | None: {'items': [...], 'summary': {...}}，未命中時回傳 None
+    """
+    try:
+        payload, version = redis_client.hmget(_snapshot_key(user_id), 'payload', 'promotion_version')
+    except redis.RedisError as e:
+        logger.warning(f"讀取購物車快照失敗: {str(e)}")
+        return None
+
+    if payload is None or version is None:
+        return None
+
+    # 促銷規則已異動，價格與摘要需重新計算
+    if int(version) != get_promotion_version():
+        return None
+
+    return json.loads(payload)
+
+
+def save_cart_snapshot(user_id, payload, generation):
+    """
+    寫入購物車快照（整份覆蓋）
+
+    Args:
+        generation: 重建前由 get_cart_generation 取得；其後購物車已異動時不寫入
+    """
+    try:
+        _save_fields(user_id, generation, {
+            'payload': json.dumps(payload, ensure_ascii=False, cls=DjangoJSONEncoder),
+            'count': payload['summary']['totalQuantity'],
+            'promotion_version': get_promotion_version(),
+        })
+    except redis.RedisError as e:
+        logger.warning(f"寫入購物車快照失敗: {str(e)}")
+
+
+def get_cart_count(user_id):
+    """
+    由快照取得購物車商品總數量
+
+    Returns:
+        int | None: 未命中時回傳 None
+    """
+    try:
+        count = redis_client.hget(_snapshot_key(user_id), 'count')
+    except redis.RedisError as e:
+        logger.warning(f"讀取購物車數量失敗: {str(e)}")
+        return None
+    return int(count) if count is not None else None
+
+
+def save_cart_count(user_id, count, generation):
+    """只寫入商品總數量（尚無完整快照時使用，generation 同 save_cart_snapshot）"""
+    try:
+        _save_fields(user_id, generation, {'count': count})
+    except redis.RedisError as e:
+        logger.warning(f"寫入購物車數量失敗: {str(e)}")
+
+
+def _bump_generation(user_id):
+    key = _snapshot_key(user_id)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hdel(key, 'payload', 'count', 'promotion_version')
+        pipe.hincrby(key, 'generation', 1)
+        pipe.expire(key, CART_SNAPSHOT_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"清除購物車快照失敗: {str(e)}")
+
+
+def invalidate_cart_snapshot(user_id):
+    """購物車已異動：交易提交後清除快照並遞增 generation，下次讀取時由資料庫重建"""
+    transaction.on_commit(lambda: _bump_generation(user_id))
@@ -1,6 +1,6 @@
 from decimal import Decimal
-from django.db import models
-from apps.v1.models import PromotionRule, PromotionRuleRelation, ActivityProduct, ProductDefaultPrice
+from apps.v1.models import ActivityProduct, ProductDefaultPrice
+from .promotion_engine import get_promotion_index
 
 def get_safe_original_price(product, activity=None):
     """
@@ -18,135 +18,116 @@ def get_safe_original_price(product, activity=None):
     except ProductDefaultPrice.DoesNotExist:
         return Decimal("0")
 
-def calculate_cart_summary(user, cart_items):
+class CartPricingContext(object):
+    """
+    購物車計價上下文
+    每個請求建立一次：以批次查詢取得所有 (活動, 商品) 的活動價格與常態價格，
+    並透過 promotion_engine 計算每個項目的折扣與贈品。
+    CartItemSerializer 與 calculate_cart_summary 共用同一份結果，確保明細與摘要一致。
+    """
+
+    def __init__(self, cart_items, index=None):
+        self.items = list(cart_items)
+        self.index = index or get_promotion_index()
+
+        product_ids = {item.product_id for item in self.items}
+        activity_ids = {item.activity_id for item in self.items if item.activity_id}
+
+        # (活動ID, 商品ID) -> (活動價, 原價)
+        self.activity_prices = {}
+        if activity_ids:
+            self.activity_prices = {
+                (ap['activity_id'], ap['product_id']): (ap['price'], ap['original_price'])
+                for ap in ActivityProduct.objects.filter(
+                    activity_id__in=activity_ids, product_id__in=product_ids
+                ).values('activity_id', 'product_id', 'price', 'original_price')
+            }
+
+        self.default_prices = dict(
+            ProductDefaultPrice.objects.filter(product_id__in=product_ids).values_list('product_id', 'price')
+        ) if product_ids else {}
+
+        self._keys = {self._key(item) for item in self.items}
+        self._lines = {}
+
+    @staticmethod
+    def _key(item):
+        return (item.product_id, item.activity_id)
+
+    def covers(self, item):
+        """此上下文是否已載入該購物車項目的價格"""
+        return self._key(item) in self._keys
+
+    def unit_price(self, item):
+        """折扣前單價：活動價優先，否則常態價"""
+        if item.activity_id:
+            prices = self.activity_prices.get((item.activity_id, item.product_id))
+            if prices and prices[0] is not None:
+                return Decimal(prices[0])
+        return Decimal(self.default_prices.get(item.product_id, Decimal("0")))
+
+    def original_price(self, item):
+        """原價：活動商品原價優先，否則常態價"""
+        if item.activity_id:
+            prices = self.activity_prices.get((item.activity_id, item.product_id))
+            if prices and prices[1] is not None:
+                return Decimal(prices[1])
+        return Decimal(self.default_prices.get(item.product_id, Decimal("0")))
+
+    def line(self, item):
+        """取得購物車項目的計價結果（LinePricing）"""
+        key = (self._key(item), item.quantity)
+        if key not in self._lines:
+            self._lines[key] = self.index.price_line(
+                item.product_id, item.activity_id, item.quantity, self.unit_price(item)
+            )
+        return self._lines[key]
+
+    def applicable_rule(self, item):
+        """優先級最高的適用規則"""
+        return self.index.applicable_rule(item.product_id, item.activity_id)
+
+    def gifts(self, item):
+        """已達門檻的買贈規則所贈送的商品"""
+        return [
+            {
+                "product_id": rule.gift_product_id,
+                "name": rule.gift_product_name,
+                "imageUrl": rule.gift_product_image_url
+            }
+            for rule in self.line(item).gift_rules
+            if rule.gift_product_id
+        ]
+
+    def promotion_label(self, item):
+        """依優先級最高的規則產生促銷標籤"""
+        rule = self.applicable_rule(item)
+        if not rule:
+            return ""
+        if rule.rule_type == 'buy_discount' and rule.discount_rate:
+            return f"{int(rule.discount_rate * 10)}折"
+        elif rule.rule_type == 'buy_gift':
+            return f"買{rule.threshold_quantity}送{rule.gift_quantity}"
+        return ""
+
+    def summary(self):
+        """計算整個購物車的摘要"""
+        return self.index.summarize([self.line(item) for item in self.items])
+
+
+def calculate_cart_summary(user, cart_items, pricing=None):
     """
     計算購物車摘要資訊 - 包含小計、各種折扣、最終金額、數量統計
-    
+    價格以批次查詢取得，促銷規則由 promotion_engine 的記憶體索引計算，不會逐筆查詢
+
     Args:
         user: 當前使用者
         cart_items: 購物車項目清單
-        
+        pricing: 已建立的 CartPricingContext（與明細序列化共用）
+
     Returns:
         dict: 包含小計、折扣、最終金額、數量、贈品及適用規則等資訊
     """
-    subtotal = 0
-    item_discounts = 0
-    order_discounts = 0
-    final_total = 0
-    total_quantity = 0
-    total_gifts = 0
-    applied_rules = []
-    seen_rule_names = set()  # 👈 用於去重重複優惠名稱
-
-    for cart_item in cart_items:
-        product = cart_item.product
-        quantity = cart_item.quantity
-        activity = cart_item.activity
-
-        # 原始價格
-        if activity:
-            try:
-                activity_product = ActivityProduct.objects.get(activity=activity, product=product)
-                original_price = activity_product.price
-            except ActivityProduct.DoesNotExist:
-                original_price = get_safe_original_price(cart_item.product, cart_item.activity)
-        else:
-            original_price = get_safe_original_price(cart_item.product, cart_item.activity)
-
-        price = original_price
-        gift_count = 0
-
-        applicable_rules = PromotionRuleRelation.objects.filter(is_active=True).filter(
-            models.Q(product=product) |
-            models.Q(activity_product__product=product, activity_product__activity=activity) |
-            (models.Q(activity=activity) if activity else models.Q(pk=None))  # ✅ 避免 activity=None 錯配
-        ).order_by('-priority')
-
-        for rule_rel in applicable_rules:
-            rule = rule_rel.promotion_rule
-
-            # 買贈
-            if rule.rule_type == 'buy_gift' and rule.threshold_quantity and quantity >= rule.threshold_quantity:
-                multiplier = quantity // rule.threshold_quantity
-                gift_count += multiplier * (rule.gift_quantity or 0)
-
-                gift_name = "相同商品" if rule.is_gift_same_product else getattr(rule.gift_product, "product_name", "贈品")
-                rule_desc = f"{rule.name} (贈送{gift_name})"
-
-                if rule_desc not in seen_rule_names:
-                    applied_rules.append({"name": rule_desc, "type": "buy_gift"})
-                    seen_rule_names.add(rule_desc)
-
-            # 單品折扣
-            elif rule.rule_type == 'buy_discount' and rule.discount_rate and quantity >= rule.threshold_quantity:
-                price = original_price * (1 - rule.discount_rate)
-                if rule.name not in seen_rule_names:
-                    applied_rules.append({
-                        "name": rule.name,
-                        "type": "buy_discount",
-                        "discount_rate": float(rule.discount_rate)
-                    })
-                    seen_rule_names.add(rule.name)
-
-        item_subtotal = original_price * quantity
-        item_final = price * quantity
-        item_discount = item_subtotal - item_final
-
-        subtotal += item_subtotal
-        final_total += item_final
-        item_discounts += item_discount
-        total_quantity += quantity
-        total_gifts += gift_count
-
-    # 處理全站優惠
-    free_shipping = False
-    sitewide_rules = PromotionRuleRelation.objects.filter(is_active=True, is_sitewide=True).order_by('-priority')
-
-    for rule_rel in sitewide_rules:
-        rule = rule_rel.promotion_rule
-
-        # 滿額折
-        if rule.rule_type == 'order_discount' and rule.threshold_amount and subtotal >= rule.threshold_amount:
-            if rule.discount_rate:
-                discount = subtotal * rule.discount_rate
-            elif rule.discount_amount:
-                discount = rule.discount_amount
-            else:
-                discount = Decimal('0')
-
-            order_discounts += discount
-            final_total -= discount
-
-            if rule.name not in seen_rule_names:
-                applied_rules.append({
-                    "name": rule.name,
-                    "type": "order_discount",
-                    "discount": float(discount)
-                })
-                seen_rule_names.add(rule.name)
-
-        # 免運
-        elif rule.rule_type == 'order_free_shipping':
-            if ((rule.threshold_amount and subtotal >= rule.threshold_amount) or
-                (rule.threshold_quantity and total_quantity >= rule.threshold_quantity)):
-                if rule.name not in seen_rule_names:
-                    applied_rules.append({
-                        "name": rule.name,
-                        "type": "free_shipping"
-                    })
-                    seen_rule_names.add(rule.name)
-                free_shipping = True
-                break
-
-    final_total = max(Decimal('0'), final_total)
-
-    return {
-        "subtotal": float(subtotal),
-        "itemDiscounts": float(item_discounts),
-        "orderDiscounts": float(order_discounts),
-        "finalAmount": float(final_total),
-        "totalQuantity": total_quantity,
-        "totalGifts": total_gifts,
-        "freeShipping": free_shipping,
-        "appliedRules": applied_rules
-    }
\ No newline at end of file
+    if pricing is None:
+        pricing = CartPricingContext(cart_items)
+    return pricing.summary()
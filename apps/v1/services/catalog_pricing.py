@@ -0,0 +1,106 @@
+# services/catalog_pricing.py
+"""
+商品目錄計價
+一次解析整頁商品的目前售價、原價、是否促銷與活動名稱：
+- 先以 cache.get_many 讀取每個商品的快取
+- 未命中的商品以兩次查詢（活動商品、常態價格）計算後以 cache.set_many 寫回
+
+快取內容附帶有效期限（所採用活動的結束時間），逾期視為未命中；
+活動商品、常態價格、活動異動時由 signal 清除相關商品的快取。
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+CATALOG_PRICE_KEY = 'catalog_price:{product_id}'
+# 快取存活時間（秒）
+CATALOG_PRICE_TTL = 60 * 30
+
+
+def _price_key(product_id):
+    return CATALOG_PRICE_KEY.format(product_id=product_id)
+
+
+def resolve_catalog_prices(product_ids):
+    """
+    解析商品目前的售價資訊
+
+    Args:
+        product_ids: 商品ID
+
+    Returns:
+        dict: {商品ID: {'price', 'original_price', 'is_promotion', 'activity_name'}}
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        return {}
+
+    now = timezone.now()
+    cached = cache.get_many([_price_key(product_id) for product_id in product_ids])
+
+    result = {}
+    missing = []
+    for product_id in product_ids:
+        entry = cached.get(_price_key(product_id))
+        if entry is not None and (entry['valid_until'] is None or entry['valid_until'] >= now):
+            result[product_id] = entry['pricing']
+        else:
+            missing.append(product_id)
+
+    if missing:
+        computed = _compute_prices(missing, now)
+        cache.set_many(
+            {_price_key(product_id): entry for product_id, entry in computed.items()},
+            CATALOG_PRICE_TTL
+        )
+        for product_id, entry in computed.items():
+            result[product_id] = entry['pricing']
+
+    return result
+
+
+def _compute_prices(product_ids, now):
+    """以兩次查詢計算商品售價（活動價格優先，否則常態價格）"""
+    from ..models import ActivityProduct, ProductDefaultPrice
+
+    default_prices = dict(
+        ProductDefaultPrice.objects.filter(product_id__in=product_ids).values_list('product_id', 'price')
+    )
+
+    # 與 product.activities 的預設排序一致：活動開始時間新到舊、再依ID
+    activity_products = {}
+    for ap in ActivityProduct.objects.filter(
+        product_id__in=product_ids, activity__end_date__gte=now
+    ).order_by('product_id', '-activity__start_date', 'id').values(
+        'product_id', 'price', 'original_price', 'activity__name', 'activity__end_date'
+    ):
+        activity_products.setdefault(ap['product_id'], ap)
+
+    computed = {}
+    for product_id in product_ids:
+        default_price = default_prices.get(product_id, 0)
+        ap = activity_products.get(product_id)
+        if ap:
+            pricing = {
+                'price': ap['price'],
+                'original_price': ap['original_price'],
+                'is_promotion': True,
+                'activity_name': ap['activity__name']
+            }
+            valid_until = ap['activity__end_date']
+        else:
+            pricing = {
+                'price': default_price,
+                'original_price': default_price,
+                'is_promotion': False,
+                'activity_name': None
+            }
+            valid_until = None
+        computed[product_id] = {'pricing': pricing, 'valid_until': valid_until}
+    return computed
+
+
+def invalidate_catalog_prices(product_ids):
+    """清除商品的售價快取"""
+    keys = [_price_key(product_id) for product_id in set(product_ids) if product_id]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,55 @@
+# services/category_tree.py
+"""
+類別樹狀結構
+物料類別與商品類別的樹各以一次查詢取得全部類別、在記憶體中組成，
+物料類別的品號數量以一次彙總查詢取得。序列化結果快取至類別（或品號）異動為止。
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+from utils.tree import serialize_tree, get_cached_tree
+
+MATERIAL_CATEGORY_TREE_KEY = 'category_tree:material'
+CATEGORY_TREE_KEY = 'category_tree:product'
+# 快取存活時間（秒）
+CATEGORY_TREE_TTL = 60 * 60
+
+
+def build_material_category_tree():
+    from ..models import MaterialCategory, Item
+    from ..serializers import MaterialCategoryTreeSerializer
+
+    categories = list(MaterialCategory.objects.all())
+    item_counts = dict(
+        Item.objects.filter(material_category__isnull=False)
+        .values('material_category_id').annotate(count=Count('id'))
+        .values_list('material_category_id', 'count')
+    )
+    for category in categories:
+        category.item_count = item_counts.get(category.id, 0)
+    return serialize_tree(categories, MaterialCategoryTreeSerializer)
+
+
+def build_category_tree():
+    from ..models import Category
+    from ..serializers import CategoryTreeSerializer
+
+    return serialize_tree(list(Category.objects.all()), CategoryTreeSerializer)
+
+
+def get_material_category_tree():
+    """物料類別樹（快取）"""
+    return get_cached_tree(MATERIAL_CATEGORY_TREE_KEY, build_material_category_tree, CATEGORY_TREE_TTL)
+
+
+def get_category_tree():
+    """商品類別樹（快取）"""
+    return get_cached_tree(CATEGORY_TREE_KEY, build_category_tree, CATEGORY_TREE_TTL)
+
+
+def invalidate_material_category_tree():
+    cache.delete(MATERIAL_CATEGORY_TREE_KEY)
+
+
+def invalidate_category_tree():
+    cache.delete(CATEGORY_TREE_KEY)
@@ -0,0 +1,378 @@
+# services/dashboard_rollup.py
+"""
+儀表板統計彙總
+商品、批號、訂單的統計數字保存在 Redis hash，由模型異動（signals）與批次處理
+於交易提交後以 HINCRBY 增減，儀表板讀取時只需一次 Redis 讀取。
+每晚的完整重算（reconcile_dashboard_rollup）校正未經 signals 的異動
+（queryset.update 等）並更新與日期相關的「即將到期」數量。
+
+- dashboard:rollup              全期統計（reconciled_at 欄位存在才視為有效）
+- dashboard:rollup:daily:{日期}  依訂單建立日期的訂單數與銷售額
+金額以「分」為單位的整數保存，避免浮點誤差。
+"""
+import logging
+from datetime import datetime, time
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, DateField, Q, Sum, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+ROLLUP_KEY = 'dashboard:rollup'
+DAILY_KEY = 'dashboard:rollup:daily:{date}'
+# 每日統計保留天數
+DAILY_RETENTION_DAYS = 90
+# 計入銷售額的訂單狀態
+SALES_STATUSES = ('completed', 'shipped')
+# 低庫存門檻（批號總數量）
+LOW_STOCK_THRESHOLD = 10
+# 即將到期天數
+EXPIRING_DAYS = 30
+# 進行中活動數量的快取秒數（與時間相關，不由異動維護）
+ACTIVE_ACTIVITY_CACHE_KEY = 'dashboard:active_activities'
+ACTIVE_ACTIVITY_CACHE_TTL = 60
+
+
+def local_day_bucket(field, first_day, last_day):
+    """
+    將時間欄位依本地時區的日期區間歸入日期（first_day 之前為 NULL）
+    以明確的區間比較取代 TruncDate，MySQL 未載入時區資料表時 TruncDate 會回傳 NULL
+    """
+    whens = []
+    day = last_day
+    while day >= first_day:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        whens.append(When(**{f'{field}__gte': start}, then=Value(day)))
+        day -= timezone.timedelta(days=1)
+    return Case(*whens, default=None, output_field=DateField())
+
+
+def _cents(amount):
+    return int((Decimal(amount or 0) * 100).quantize(Decimal('1')))
+
+
+def _is_expiring(expiry_date, today=None):
+    if expiry_date is None:
+        return False
+    today = today or timezone.localdate()
+    return today < expiry_date <= today + timezone.timedelta(days=EXPIRING_DAYS)
+
+
+def product_contribution(values):
+    """單一商品對統計的貢獻（values 為 None 表示不存在）"""
+    if values is None or values['is_deleted']:
+        return {}
+    return {'product_total': 1, 'product_active': 1}
+
+
+def batch_contribution(values):
+    """單一批號對統計的貢獻"""
+    if values is None or values['is_deleted']:
+        return {}
+    quantity = values['quantity'] or 0
+    return {
+        'batch_count': 1,
+        'stock_quantity': quantity,
+        'low_stock': int(quantity <= LOW_STOCK_THRESHOLD),
+        'expiring_soon': int(_is_expiring(values['expiry_date'])),
+    }
+
+
+def order_contribution(values):
+    """
+    單一訂單對統計的貢獻
+
+    Returns:
+        tuple: (全期統計, 建立日期, 當日統計)
+    """
+    if values is None or values['is_deleted']:
+        return {}, None, {}
+    sales = _cents(values['final_amount']) if values['status'] in SALES_STATUSES else 0
+    totals = {'order_total': 1, f"order_status:{values['status']}": 1, 'sales_cents': sales}
+    day = timezone.localdate(values['create_time']) if values['create_time'] else None
+    return totals, day, {'orders': 1, 'sales_cents': sales}
+
+
+def _diff(before, after):
+    fields = set(before) | set(after)
+    return {field: after.get(field, 0) - before.get(field, 0) for field in fields
+            if after.get(field, 0) != before.get(field, 0)}
+
+
+def apply_deltas(totals=None, daily=None):
+    """
+    增減統計（Redis 不可用時略過，由每晚重算校正）
+
+    Args:
+        totals: {欄位: 增減量}
+        daily: {日期: {欄位: 增減量}}
+    """
+    totals = {field: value for field, value in (totals or {}).items() if value}
+    daily = {day: fields for day, fields in (daily or {}).items() if day and any(fields.values())}
+    if not totals and not daily:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for field, value in totals.items():
+            pipe.hincrby(ROLLUP_KEY, field, value)
+        for day, fields in daily.items():
+            key = DAILY_KEY.format(date=day.isoformat())
+            for field, value in fields.items():
+                if value:
+                    pipe.hincrby(key, field, value)
+            pipe.expire(key, DAILY_RETENTION_DAYS * 24 * 60 * 60)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"更新儀表板統計失敗: {str(e)}")
+
+
+def record_change(before, after, contribution):
+    """以異動前後的貢獻差，於交易提交後更新統計（商品、批號）"""
+    delta = _diff(contribution(before), contribution(after))
+    if delta:
+        transaction.on_commit(lambda: apply_deltas(totals=delta))
+
+
+def record_order_change(before, after):
+    """以異動前後的貢獻差，於交易提交後更新訂單統計"""
+    before_totals, before_day, before_daily = order_contribution(before)
+    after_totals, after_day, after_daily = order_contribution(after)
+
+    totals = _diff(before_totals, after_totals)
+    daily = {}
+    if before_day == after_day:
+        if before_day:
+            daily[before_day] = _diff(before_daily, after_daily)
+    else:
+        if before_day:
+            daily[before_day] = _diff(before_daily, {})
+        if after_day:
+            daily[after_day] = _diff({}, after_daily)
+
+    if totals or any(daily.values()):
+        transaction.on_commit(lambda: apply_deltas(totals=totals, daily=daily))
+
+
+def record_status_transition(from_status, to_status, count):
+    """
+    批次狀態異動（queryset.update，不經 signals）後更新訂單數量統計
+    僅適用於不影響銷售額的狀態異動（例如待付款 → 已逾期）
+    """
+    if not count or from_status == to_status:
+        return
+    totals = {f'order_status:{from_status}': -count, f'order_status:{to_status}': count}
+    transaction.on_commit(lambda: apply_deltas(totals=totals))
+
+
+def _record_product(before, after):
+    record_change(before, after, product_contribution)
+
+
+def _record_batch(before, after):
+    record_change(before, after, batch_contribution)
+
+
+# 由 signals 維護統計的模型：{模型: (計算貢獻所需欄位, 記錄函式)}
+TRACKED_MODELS = {
+    'v1.Product': (('is_deleted',), _record_product),
+    'v1.Batch': (('is_deleted', 'quantity', 'expiry_date'), _record_batch),
+    'v1.Order': (('is_deleted', 'status', 'final_amount', 'create_time'), record_order_change),
+}
+
+_UNCHANGED = object()
+
+
+def capture_previous(instance, update_fields=None, stored=None):
+    """
+    儲存前取得資料庫中的原值（pre_save），供儲存後計算差異
+
+    Args:
+        stored: 呼叫端已讀取的資料庫原值（需包含 TRACKED_MODELS 的欄位），避免重複查詢
+    """
+    fields, _ = TRACKED_MODELS[instance._meta.label]
+    if instance._state.adding:
+        previous = None
+    elif update_fields is not None and not set(update_fields) & set(fields):
+        previous = _UNCHANGED
+    elif stored is not None:
+        previous = {field: stored[field] for field in fields}
+    else:
+        previous = type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first()
+    instance._dashboard_previous = previous
+
+
+def record_saved(instance):
+    """儲存後（post_save）依原值與新值的差異更新統計"""
+    fields, recorder = TRACKED_MODELS[instance._meta.label]
+    previous = instance.__dict__.pop('_dashboard_previous', _UNCHANGED)
+    if previous is _UNCHANGED:
+        return
+    recorder(previous, {field: getattr(instance, field) for field in fields})
+
+
+def record_deleted(instance):
+    """刪除後（post_delete）扣除其統計"""
+    fields, recorder = TRACKED_MODELS[instance._meta.label]
+    recorder({field: getattr(instance, field) for field in fields}, None)
+
+
+def compute_dashboard_metrics(days=DAILY_RETENTION_DAYS):
+    """
+    由資料庫完整計算統計
+
+    Returns:
+        tuple: (全期統計, {日期: 當日統計})
+    """
+    from ..models import Product, Batch, Order
+
+    today = timezone.localdate()
+    totals = Product.objects.aggregate(
+        product_total=Count('id'),
+        product_active=Count('id', filter=Q(is_deleted=False)),
+    )
+    totals.update(Batch.objects.aggregate(
+        batch_count=Count('id'),
+        stock_quantity=Sum('quantity'),
+        low_stock=Count('id', filter=Q(quantity__lte=LOW_STOCK_THRESHOLD)),
+        expiring_soon=Count('id', filter=Q(
+            expiry_date__lte=today + timezone.timedelta(days=EXPIRING_DAYS),
+            expiry_date__gt=today
+        )),
+    ))
+    totals['stock_quantity'] = totals['stock_quantity'] or 0
+
+    totals['order_total'] = 0
+    totals['sales_cents'] = 0
+    for row in Order.objects.values('status').annotate(count=Count('id'), sales=Sum('final_amount')).order_by():
+        totals['order_total'] += row['count']
+        totals[f"order_status:{row['status']}"] = row['count']
+        if row['status'] in SALES_STATUSES:
+            totals['sales_cents'] += _cents(row['sales'])
+
+    daily = {}
+    since = timezone.now() - timezone.timedelta(days=days)
+    rows = (
+        Order.objects.filter(create_time__gte=since)
+        .annotate(day=local_day_bucket('create_time', timezone.localdate(since), today))
+        .values('day')
+        .annotate(
+            orders=Count('id'),
+            sales=Sum('final_amount', filter=Q(status__in=SALES_STATUSES)),
+        )
+        .order_by()
+    )
+    for row in rows:
+        if row['day'] is None:
+            continue
+        daily[row['day']] = {'orders': row['orders'], 'sales_cents': _cents(row['sales'])}
+
+    return totals, daily
+
+
+def reconcile_dashboard_rollup(days=DAILY_RETENTION_DAYS):
+    """
+    完整重算並覆寫 Redis 中的統計（每晚排程執行，或統計不存在時）
+    重算期間提交的異動可能被覆寫，於下次重算校正
+    """
+    totals, daily = compute_dashboard_metrics(days)
+    reconciled_at = timezone.now().isoformat()
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(ROLLUP_KEY)
+    pipe.hset(ROLLUP_KEY, mapping={**totals, 'reconciled_at': reconciled_at})
+    for day, fields in daily.items():
+        key = DAILY_KEY.format(date=day.isoformat())
+        pipe.delete(key)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, DAILY_RETENTION_DAYS * 24 * 60 * 60)
+    pipe.execute()
+
+    logger.info(f"儀表板統計重算完成: {len(daily)} 天")
+    return {'totals': totals, 'days': len(daily), 'reconciled_at': reconciled_at}
+
+
+def _decode(data):
+    return {k.decode(): v.decode() for k, v in data.items()}
+
+
+def _load_rollup(day):
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hgetall(ROLLUP_KEY)
+    pipe.hgetall(DAILY_KEY.format(date=day.isoformat()))
+    totals, daily = pipe.execute()
+    return _decode(totals), _decode(daily)
+
+
+def get_active_activity_count():
+    """進行中的活動數量（短暫快取）"""
+    from ..models import Activity
+
+    try:
+        count = cache.get(ACTIVE_ACTIVITY_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"讀取進行中活動數量快取失敗: {str(e)}")
+        count = None
+    if count is None:
+        now = timezone.now()
+        count = Activity.objects.filter(start_date__lte=now, end_date__gte=now).count()
+        try:
+            cache.set(ACTIVE_ACTIVITY_CACHE_KEY, count, ACTIVE_ACTIVITY_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"寫入進行中活動數量快取失敗: {str(e)}")
+    return count
+
+
+def get_dashboard_statistics():
+    """
+    儀表板統計數據
+    優先讀取 Redis 統計；尚未建立時先完整重算，Redis 不可用時直接由資料庫計算
+    """
+    today = timezone.localdate()
+    try:
+        totals, daily = _load_rollup(today)
+        if 'reconciled_at' not in totals:
+            reconcile_dashboard_rollup()
+            totals, daily = _load_rollup(today)
+    except redis.RedisError as e:
+        logger.warning(f"讀取儀表板統計失敗，改由資料庫計算: {str(e)}")
+        all_totals, all_daily = compute_dashboard_metrics(days=1)
+        totals = {k: str(v) for k, v in all_totals.items()}
+        daily = {k: str(v) for k, v in all_daily.get(today, {}).items()}
+
+    def value(data, field):
+        return int(data.get(field, 0))
+
+    return {
+        'product': {
+            'total': value(totals, 'product_total'),
+            'active': value(totals, 'product_active'),
+        },
+        'stock': {
+            'batch_count': value(totals, 'batch_count'),
+            'total_quantity': value(totals, 'stock_quantity'),
+            'low_stock': value(totals, 'low_stock'),
+            'expiring_soon': value(totals, 'expiring_soon')
+        },
+        'order': {
+            'total': value(totals, 'order_total'),
+            'processing': value(totals, 'order_status:processing'),
+            'shipped': value(totals, 'order_status:shipped'),
+            'total_sales': Decimal(value(totals, 'sales_cents')) / 100
+        },
+        'today': {
+            'orders': value(daily, 'orders'),
+            'sales': Decimal(value(daily, 'sales_cents')) / 100
+        },
+        'activity': {
+            'active': get_active_activity_count()
+        },
+        'reconciled_at': totals.get('reconciled_at')
+    }
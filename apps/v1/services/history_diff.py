@@ -0,0 +1,59 @@
+# services/history_diff.py
+"""
+歷史紀錄差異計算
+以「整頁歷史紀錄 + 頁尾前一筆」兩次查詢取得比較對象，單次走訪計算每筆紀錄
+與前一筆的欄位差異，取代逐筆查詢 prev_record 的作法。
+"""
+from django.db.models import Q
+
+
+def history_page_queryset(history_records):
+    """歷史紀錄的排序（新到舊）與操作者預先載入"""
+    return history_records.select_related('history_user').order_by('-history_date', '-history_id')
+
+
+def _predecessor(history_records, record):
+    """取得同一物件在 record 之前的一筆歷史紀錄"""
+    return history_records.filter(
+        Q(history_date__lt=record.history_date) |
+        Q(history_date=record.history_date, history_id__lt=record.history_id)
+    ).order_by('-history_date', '-history_id').first()
+
+
+def compute_page_changes(history_records, page):
+    """
+    計算一頁歷史紀錄的欄位差異
+
+    Args:
+        history_records: 同一物件的歷史紀錄查詢（用於取得頁尾的前一筆）
+        page: 依新到舊排序的歷史紀錄（當頁）
+
+    Returns:
+        dict: {history_id: {欄位: {'from': 舊值, 'to': 新值}}}，第一筆或無法比較的紀錄為空字典
+    """
+    page = list(page)
+    if not page:
+        return {}
+
+    # 頁內每筆的前一筆即為下一個元素，頁尾另外查詢一次
+    predecessors = page[1:] + [_predecessor(history_records, page[-1])]
+
+    changes = {}
+    for record, prev_record in zip(page, predecessors):
+        if prev_record is None:
+            changes[record.pk] = {}
+            continue
+        try:
+            diff = record.diff_against(prev_record)
+        except Exception:
+            # 若無法比較（如欄位已變更的舊紀錄），該筆回傳空字典
+            changes[record.pk] = {}
+            continue
+        changes[record.pk] = {
+            change.field: {
+                'from': str(change.old),
+                'to': str(change.new)
+            }
+            for change in diff.changes
+        }
+    return changes
@@ -0,0 +1,267 @@
+# services/inventory_reservation.py
+"""
+批號庫存預留引擎（Redis）
+每個批號在 Redis 維護一個可預留數量計數器，下單時以單一 Lua 腳本
+一次檢查並扣減所有批號（全部成功或全部不扣），不再逐批號取得 SET NX 鎖。
+同時下單的請求會依序排入 Redis 執行，只有真正庫存不足時才會失敗。
+
+可預留數量 = 總數量 - 預留庫存（即常態 + 活動庫存）。
+扣減的同時以預留代號記錄「已在 Redis 扣減、尚未寫入資料庫」的數量（進行中預留），
+訂單交易更新批號後清除；由資料庫重設計數器時（sync_inventory_counters）扣除進行中預留，
+不會把尚未提交的訂單再次計入。
+
+- 計數器不存在時由資料庫初始化
+- 批號經由 save() 異動（後台調整、取消）時，於交易提交後以 INCRBY 套用差額
+- 訂單交易失敗時清除其進行中預留並由資料庫重設計數器
+- 定期由資料庫重設所有計數器（reconcile_inventory_counters），校正程序中斷、
+  歸還失敗或差額遺失造成的誤差；逾時仍未清除的進行中預留視為程序已中斷
+"""
+import logging
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+INVENTORY_COUNTER_KEY = 'inventory_available:{batch_id}'
+# 進行中預留 {預留代號: "批號ID:數量,..."} 與其建立時間
+INVENTORY_PENDING_KEY = 'inventory_pending'
+INVENTORY_PENDING_AT_KEY = 'inventory_pending_at'
+# 進行中預留逾時（秒），超過時視為程序已中斷，不再自計數器扣除
+INVENTORY_PENDING_TIMEOUT = 60 * 10
+
+# KEYS: 各批號計數器..., 進行中預留, 進行中預留時間；ARGV: 各批號數量..., 預留代號, 內容, 時間
+# 回傳值：{1, 0} 成功；{0, i} 第 i 個計數器不存在；{-1, i} 第 i 個批號庫存不足
+RESERVE_SCRIPT = """
+local n = #KEYS - 2
+for i = 1, n do
+    local available = redis.call('GET', KEYS[i])
+    if not available then
+        return {0, i}
+    end
+    if tonumber(available) < tonumber(ARGV[i]) then
+        return {-1, i}
+    end
+end
+for i = 1, n do
+    redis.call('DECRBY', KEYS[i], ARGV[i])
+end
+redis.call('HSET', KEYS[n + 1], ARGV[n + 1], ARGV[n + 2])
+redis.call('ZADD', KEYS[n + 2], ARGV[n + 3], ARGV[n + 1])
+return {1, 0}
+"""
+
+# 歸還預留數量 / 套用差額；計數器不存在時不建立，等待下次由資料庫載入
+RELEASE_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[i])
+    end
+end
+return 1
+"""
+
+# 以資料庫的可預留數量扣除該批號的進行中預留後設定計數器（先清除逾時的進行中預留）
+# KEYS: 計數器, 進行中預留, 進行中預留時間；ARGV: 批號ID, 可預留數量, 現在時間, 逾時秒數, 僅在不存在時設定(1/0)
+SYNC_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', tonumber(ARGV[3]) - tonumber(ARGV[4]))
+for _, token in ipairs(expired) do
+    redis.call('HDEL', KEYS[2], token)
+    redis.call('ZREM', KEYS[3], token)
+end
+if ARGV[5] == '1' and redis.call('EXISTS', KEYS[1]) == 1 then
+    return tonumber(redis.call('GET', KEYS[1]))
+end
+local pending = 0
+for _, payload in ipairs(redis.call('HVALS', KEYS[2])) do
+    for batch_id, quantity in string.gmatch(payload, '(%d+):(%d+)') do
+        if batch_id == ARGV[1] then
+            pending = pending + tonumber(quantity)
+        end
+    end
+end
+local value = math.max(tonumber(ARGV[2]) - pending, 0)
+redis.call('SET', KEYS[1], value)
+return value
+"""
+
+_reserve_script = redis_client.register_script(RESERVE_SCRIPT)
+_release_script = redis_client.register_script(RELEASE_SCRIPT)
+_sync_script = redis_client.register_script(SYNC_SCRIPT)
+
+
+def _counter_key(batch_id):
+    return INVENTORY_COUNTER_KEY.format(batch_id=batch_id)
+
+
+def reservable_quantity(quantity, reserved_stock):
+    """
+    批號的可預留數量（總數量 - 預留庫存）
+    下單時預留庫存 +n、常態庫存 -n，此數量與 Redis 計數器同樣減少 n
+    """
+    return (quantity or 0) - (reserved_stock or 0)
+
+
+def sync_inventory_counters(batch_ids, only_missing=False):
+    """
+    由資料庫重設批號計數器（扣除進行中預留）
+    逐批號鎖定資料列（SELECT ... FOR UPDATE）後設定，已更新該批號、尚未提交的訂單
+    會先完成，讀到的可預留數量與進行中預留不會遺漏同一筆訂單
+
+    Args:
+        only_missing: 只設定不存在的計數器（延遲初始化）
+
+    Returns:
+        int: 處理的批號數量
+    """
+    from ..models import Batch
+
+    synced = 0
+    for batch_id in batch_ids:
+        with transaction.atomic():
+            row = Batch.objects.select_for_update().filter(id=batch_id).values_list(
+                'quantity', 'reserved_stock'
+            ).first()
+            if row is None:
+                redis_client.delete(_counter_key(batch_id))
+                continue
+            _sync_script(
+                keys=[_counter_key(batch_id), INVENTORY_PENDING_KEY, INVENTORY_PENDING_AT_KEY],
+                args=[batch_id, reservable_quantity(*row), int(time.time()), INVENTORY_PENDING_TIMEOUT,
+                      1 if only_missing else 0]
+            )
+        synced += 1
+    return synced
+
+
+def load_inventory_counters(batch_ids):
+    """由資料庫載入批號可預留數量至 Redis（已存在的計數器不覆蓋）"""
+    sync_inventory_counters(batch_ids, only_missing=True)
+
+
+def reserve_inventory(batch_quantities):
+    """
+    原子性扣減多個批號的可預留數量，並記錄為進行中預留
+    訂單交易內更新批號後呼叫 settle_reservation，交易失敗時呼叫 cancel_reservation
+
+    Args:
+        batch_quantities: {批號ID: 需求數量}
+
+    Returns:
+        tuple: (是否成功, 庫存不足的批號ID, 預留代號)
+    """
+    batch_ids = list(batch_quantities)
+    if not batch_ids:
+        return True, None, None
+
+    token = uuid.uuid4().hex
+    payload = ','.join(f'{batch_id}:{int(batch_quantities[batch_id])}' for batch_id in batch_ids)
+    keys = [_counter_key(batch_id) for batch_id in batch_ids] + [INVENTORY_PENDING_KEY, INVENTORY_PENDING_AT_KEY]
+    args = [int(batch_quantities[batch_id]) for batch_id in batch_ids] + [token, payload, int(time.time())]
+
+    # 計數器不存在時由資料庫載入後重試一次
+    for _ in range(2):
+        status, index = _reserve_script(keys=keys, args=args)
+        if status == 1:
+            return True, None, token
+        if status == -1:
+            return False, batch_ids[index - 1], None
+        load_inventory_counters(batch_ids)
+
+    logger.warning(f"批號庫存計數器載入失敗: {batch_ids}")
+    return False, batch_ids[index - 1], None
+
+
+def settle_reservation(token):
+    """
+    清除進行中預留（數量已寫入批號的預留庫存）
+    於訂單交易內、批號更新之後呼叫：此時批號資料列已鎖定，sync_inventory_counters
+    會等到交易提交後才讀取，不會同時扣除資料庫與進行中預留
+    """
+    if not token:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hdel(INVENTORY_PENDING_KEY, token)
+        pipe.zrem(INVENTORY_PENDING_AT_KEY, token)
+        pipe.execute()
+    except redis.RedisError as e:
+        # 逾時後由 sync_inventory_counters 清除
+        logger.warning(f"清除進行中預留失敗: {str(e)}")
+
+
+def cancel_reservation(token, batch_quantities):
+    """訂單交易回滾後清除進行中預留，並由資料庫重設相關計數器"""
+    settle_reservation(token)
+    try:
+        sync_inventory_counters(list(batch_quantities))
+    except redis.RedisError as e:
+        # 由定期的 reconcile_inventory_counters 校正
+        logger.warning(f"重設批號庫存計數器失敗: {str(e)}")
+
+
+def release_inventory(batch_quantities):
+    """
+    歸還批號的可預留數量（訂單逾期釋放）
+
+    Args:
+        batch_quantities: {批號ID: 數量}
+    """
+    batch_ids = list(batch_quantities)
+    if not batch_ids:
+        return
+
+    _release_script(
+        keys=[_counter_key(batch_id) for batch_id in batch_ids],
+        args=[int(batch_quantities[batch_id]) for batch_id in batch_ids]
+    )
+
+
+def adjust_inventory_counters(batch_deltas):
+    """
+    套用批號可預留數量的差額（批號經由 save() 異動，交易提交後呼叫）
+
+    Args:
+        batch_deltas: {批號ID: 差額}
+    """
+    batch_deltas = {batch_id: delta for batch_id, delta in batch_deltas.items() if delta}
+    if not batch_deltas:
+        return
+    try:
+        release_inventory(batch_deltas)
+    except redis.RedisError as e:
+        logger.warning(f"更新批號庫存計數器失敗: {str(e)}")
+
+
+def reset_inventory_counters(batch_ids):
+    """清除批號計數器（批號刪除時），下次預留時由資料庫重新載入"""
+    keys = [_counter_key(batch_id) for batch_id in batch_ids]
+    if not keys:
+        return
+    try:
+        redis_client.delete(*keys)
+    except redis.RedisError as e:
+        logger.warning(f"清除批號庫存計數器失敗: {str(e)}")
+
+
+def reconcile_inventory_counters():
+    """
+    由資料庫重設所有已建立的批號計數器（定期執行）
+
+    Returns:
+        int: 重設的計數器數量
+    """
+    prefix = INVENTORY_COUNTER_KEY.format(batch_id='')
+    batch_ids = sorted(
+        int(key.decode()[len(prefix):])
+        for key in redis_client.scan_iter(match=f'{prefix}*')
+    )
+    synced = sync_inventory_counters(batch_ids)
+    logger.info(f"批號庫存計數器校正完成: {synced} 個")
+    return synced
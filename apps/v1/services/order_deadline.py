@@ -0,0 +1,84 @@
+# services/order_deadline.py
+"""
+訂單付款期限排程（Redis sorted set）
+訂單建立時以付款截止時間為分數寫入 ZSET，排程程序每秒取出已到期的訂單，
+只針對這些訂單釋放預留庫存，不需等待每 15 分鐘的全表輪詢。
+
+取出與移除在同一個 Lua 腳本中完成，多個排程程序同時執行也不會重複處理。
+實際釋放由 order_expiry 負責，會在交易內重新確認訂單仍為「待付款」，
+因此與付款確認、取消訂單同時發生時不會誤釋放已付款訂單的庫存。
+"""
+import time
+import logging
+
+import redis
+from django.conf import settings
+
+from .order_expiry import expire_overdue_orders
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+ORDER_DEADLINE_KEY = 'order_payment_deadlines'
+
+# 取出分數不大於 ARGV[1] 的成員（最多 ARGV[2] 筆）並自 ZSET 移除
+POP_DUE_SCRIPT = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #members > 0 then
+    redis.call('ZREM', KEYS[1], unpack(members))
+end
+return members
+"""
+
+_pop_due_script = redis_client.register_script(POP_DUE_SCRIPT)
+
+
+def schedule_order_expiry(order_id, deadline):
+    """登記訂單付款截止時間"""
+    try:
+        redis_client.zadd(ORDER_DEADLINE_KEY, {str(order_id): deadline.timestamp()})
+    except redis.RedisError as e:
+        # 排程失敗時仍由定期全表檢查處理
+        logger.warning(f"登記訂單 {order_id} 付款期限失敗: {str(e)}")
+
+
+def unschedule_order_expiry(order_id):
+    """訂單已付款或取消，移除付款期限排程"""
+    try:
+        redis_client.zrem(ORDER_DEADLINE_KEY, str(order_id))
+    except redis.RedisError as e:
+        logger.warning(f"移除訂單 {order_id} 付款期限排程失敗: {str(e)}")
+
+
+def pop_due_orders(now=None, limit=500):
+    """
+    取出已到期的訂單ID（取出即自排程移除）
+
+    Returns:
+        list: 訂單ID
+    """
+    now = now or time.time()
+    members = _pop_due_script(keys=[ORDER_DEADLINE_KEY], args=[now, limit])
+    return [int(member) for member in members]
+
+
+def release_due_orders(limit=500):
+    """
+    處理已到期的訂單並釋放預留庫存
+    處理失敗時將訂單重新排入，下次再處理
+
+    Returns:
+        dict: 處理統計，無到期訂單時回傳 None
+    """
+    order_ids = pop_due_orders(limit=limit)
+    if not order_ids:
+        return None
+
+    try:
+        return expire_overdue_orders(order_ids=order_ids)
+    except Exception:
+        retry_at = time.time()
+        redis_client.zadd(ORDER_DEADLINE_KEY, {str(order_id): retry_at for order_id in order_ids})
+        raise
@@ -0,0 +1,149 @@
+# services/order_expiry.py
+"""
+逾期訂單處理
+以固定大小分批處理已過付款期限的「待付款」訂單：
+- 批次將訂單狀態改為「已逾期」
+- 依批號彙總釋放數量，每個批號一次 UPDATE 扣回預留庫存
+- 批次寫入釋放日誌與歷史記錄
+每批在獨立交易中以 select_for_update 重新確認訂單狀態，
+與付款確認、取消訂單同時發生時不會重複釋放。
+"""
+import time
+import logging
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history
+
+from ..models import Order, Batch, InventoryReservation, OrderInventoryLog
+from .inventory_reservation import release_inventory
+from .stock_projection import mark_batches_dirty
+from .audit_timeline import record_history_events, record_object_events
+from .dashboard_rollup import record_status_transition
+
+logger = logging.getLogger(__name__)
+
+# 每批處理的訂單數量
+EXPIRY_CHUNK_SIZE = 200
+
+
+def expire_overdue_orders(now=None, order_ids=None, chunk_size=EXPIRY_CHUNK_SIZE):
+    """
+    處理已過付款期限的訂單並釋放預留庫存
+
+    Args:
+        now: 判斷逾期的時間點，預設為目前時間
+        order_ids: 僅處理指定的訂單ID（None 表示全部）
+        chunk_size: 每批處理的訂單數量
+
+    Returns:
+        dict: 處理的訂單數、釋放的預留記錄數、批號數、批次數與耗時（毫秒）
+    """
+    started = time.monotonic()
+    now = now or timezone.now()
+    stats = {'orders': 0, 'reservations': 0, 'batches': 0, 'chunks': 0}
+
+    queryset = Order.objects.filter(status='pending_payment', payment_deadline__lt=now)
+    if order_ids is not None:
+        queryset = queryset.filter(id__in=list(order_ids))
+
+    last_id = 0
+    while True:
+        chunk_ids = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not chunk_ids:
+            break
+        last_id = chunk_ids[-1]
+
+        chunk_stats = _expire_chunk(chunk_ids, now)
+        stats['chunks'] += 1
+        for key in ('orders', 'reservations', 'batches'):
+            stats[key] += chunk_stats[key]
+
+    stats['duration_ms'] = int((time.monotonic() - started) * 1000)
+    if stats['orders']:
+        logger.info(
+            f"逾期訂單處理完成: 訂單 {stats['orders']} 筆, 預留 {stats['reservations']} 筆, "
+            f"批號 {stats['batches']} 個, 共 {stats['chunks']} 批, 耗時 {stats['duration_ms']}ms"
+        )
+    return stats
+
+
+def _expire_chunk(order_ids, now):
+    """在單一交易中處理一批逾期訂單"""
+    stats = {'orders': 0, 'reservations': 0, 'batches': 0}
+
+    with transaction.atomic():
+        # 鎖定並重新確認狀態，已付款或已取消的訂單不處理
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status='pending_payment', payment_deadline__lt=now)
+            .only('id', 'order_number')
+        )
+        if not orders:
+            return stats
+
+        expired_ids = [order.id for order in orders]
+        order_numbers = {order.id: order.order_number for order in orders}
+
+        Order.objects.filter(id__in=expired_ids).update(status='expired', update_time=timezone.now())
+        record_status_transition('pending_payment', 'expired', len(expired_ids))
+
+        reservations = list(
+            InventoryReservation.objects.filter(order_id__in=expired_ids, is_confirmed=False)
+            .values_list('order_id', 'batch_id', 'batch__batch_number', 'quantity')
+        )
+
+        # 依批號彙總釋放數量
+        batch_quantities = {}
+        logs = []
+        for order_id, batch_id, batch_number, quantity in reservations:
+            batch_quantities[batch_id] = batch_quantities.get(batch_id, 0) + quantity
+            logs.append(OrderInventoryLog(
+                order_id=order_id,
+                batch_id=batch_id,
+                operation='release',
+                quantity=quantity,
+                note=f"訂單 {order_numbers[order_id]} 付款逾期，自動釋放批號 {batch_number} 預留庫存"
+            ))
+
+        # 每個批號一次 UPDATE，預留庫存不低於 0，常態庫存同 Batch.save() 的計算方式回補
+        # stock 需寫在 reserved_stock 之前，確保各資料庫都以更新前的 reserved_stock 計算
+        for batch_id, quantity in batch_quantities.items():
+            remaining = Greatest(F('reserved_stock') - quantity, Value(0))
+            Batch.objects.filter(id=batch_id).update(
+                stock=F('quantity') - F('active_stock') - remaining,
+                reserved_stock=remaining
+            )
+
+        # bulk 寫入不會觸發歷史 signal，需自行寫入操作時間軸
+        record_object_events(OrderInventoryLog, bulk_create_with_history(logs, OrderInventoryLog))
+        order_history = Order.history.bulk_history_create(list(Order.objects.filter(id__in=expired_ids)), update=True)
+        record_history_events(order_history, ['status'])
+        if batch_quantities:
+            batch_history = Batch.history.bulk_history_create(
+                list(Batch.objects.filter(id__in=list(batch_quantities))), update=True
+            )
+            record_history_events(batch_history, ['reserved_stock', 'stock'])
+
+        transaction.on_commit(lambda: _after_release(batch_quantities))
+
+    stats['orders'] = len(expired_ids)
+    stats['reservations'] = len(reservations)
+    stats['batches'] = len(batch_quantities)
+    return stats
+
+
+def _after_release(batch_quantities):
+    """交易提交後歸還 Redis 可預留數量並重算活動商品庫存"""
+    if not batch_quantities:
+        return
+    try:
+        release_inventory(batch_quantities)
+    except Exception as e:
+        # 無法歸還時不清除計數器（重新載入會重複計入未提交的預留），寧可少賣
+        logger.warning(f"歸還批號可預留數量失敗: {str(e)}")
+    mark_batches_dirty(batch_quantities)
@@ -0,0 +1,61 @@
+# services/order_read.py
+"""
+訂單讀取模型
+以固定數量的查詢載入訂單、訂單項目、商品、活動與排序後的商品圖片，
+供用戶訂單列表等需要完整訂單明細的端點共用。
+"""
+from django.db.models import Prefetch
+
+from ..models import Order, OrderItem, ProductImage
+from ..serializers import OrderSerializer, OrderItemSerializer
+
+
+def order_detail_queryset(queryset=None):
+    """
+    為訂單查詢加上訂單項目、商品、活動與商品圖片的預先載入
+    （訂單、項目、圖片各一次查詢）
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+
+    items = OrderItem.objects.select_related('product', 'activity').prefetch_related(
+        Prefetch(
+            'product__images',
+            queryset=ProductImage.objects.order_by('sort_order'),
+            to_attr='sorted_images'
+        )
+    )
+    return queryset.prefetch_related(Prefetch('items', queryset=items))
+
+
+def user_orders_queryset(user):
+    """用戶的訂單（新到舊），已預先載入明細"""
+    return order_detail_queryset(Order.objects.filter(user=user)).order_by('-create_time', '-id')
+
+
+def serialize_order_item(item):
+    """序列化訂單項目並附上商品圖片"""
+    item_data = OrderItemSerializer(item).data
+
+    # 添加商品圖片URL
+    if item.product:
+        item_data['image_url'] = item.product.main_image_url
+
+        images = item.product.sorted_images
+        if images:
+            item_data['additional_images'] = [img.image_url for img in images]
+
+    return item_data
+
+
+def serialize_orders(orders):
+    """
+    序列化訂單及其項目
+    orders 需由 order_detail_queryset 取得，否則會逐筆查詢
+    """
+    result = []
+    for order in orders:
+        order_data = OrderSerializer(order).data
+        order_data['items'] = [serialize_order_item(item) for item in order.items.all()]
+        result.append(order_data)
+    return result
@@ -5,22 +5,33 @@ import redis
 import logging
 from django.utils import timezone
 from datetime import timedelta
-from django.db import transaction
+from django.db import transaction, IntegrityError
+from django.db.models import F
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from simple_history.utils import bulk_create_with_history
 
 from ..models import (
     Order, OrderItem, Batch, InventoryReservation, 
     OrderInventoryLog, OrderConfiguration, ProductItemRelation,
     Product, Activity
 )
-from .simplified_order_services import generate_order_number
+from .simplified_order_services import generate_order_number, regenerate_order_number
+from .inventory_reservation import reserve_inventory, settle_reservation, cancel_reservation
+from .cart_summary import CartPricingContext
+from .order_deadline import schedule_order_expiry, unschedule_order_expiry
+from .stock_projection import mark_batches_dirty
+from .audit_timeline import record_history_events, record_object_events
+from .best_sellers import record_order_paid, record_order_cancelled
 
 logger = logging.getLogger(__name__)
 
 # 創建Redis連接
 redis_client = redis.Redis.from_url(settings.REDIS_URL)
 
+# 訂單編號唯一鍵衝突時最多重新生成的次數
+ORDER_NUMBER_MAX_ATTEMPTS = 3
+
 class OrderValidationError(Exception):
     """訂單驗證錯誤"""
     pass
@@ -126,21 +137,22 @@ def calculate_cart_hash(cart_items):
     cart_data.sort()  # 排序以確保相同內容的hash值一致
     return hash("|".join(cart_data))
 
-def check_inventory_availability(cart_items):
+def check_inventory_availability(cart_items, relations_by_product=None):
     """
     檢查庫存可用性
     不實際扣減庫存，只檢查是否足夠
     """
+    if relations_by_product is None:
+        relations_by_product = load_product_batch_relations(cart_items)
+    
     for cart_item in cart_items:
         product = cart_item.product
         quantity = cart_item.quantity
         
         # 獲取產品對應的批號關聯 - ProductItemRelation 使用 'batch_components' 作為 related_name
-        product_batch_relations = ProductItemRelation.objects.filter(
-            product=product
-        ).select_related('batch')
+        product_batch_relations = relations_by_product.get(product.id)
         
-        if not product_batch_relations.exists():
+        if not product_batch_relations:
             raise OrderValidationError(f"商品 {product.product_name} 沒有設定庫存關聯")
         
         for relation in product_batch_relations:
@@ -155,9 +167,38 @@ def check_inventory_availability(cart_items):
             if batch.available_stock < needed_quantity:
                 raise OrderValidationError(f"商品 {product.product_name} 庫存不足")
 
+def load_product_batch_relations(cart_items):
+    """
+    一次查詢購物車所有商品的批號關聯
+
+    Returns:
+        dict: {商品ID: [ProductItemRelation, ...]}
+    """
+    relations_by_product = {}
+    relations = ProductItemRelation.objects.filter(
+        product_id__in={cart_item.product_id for cart_item in cart_items}
+    ).select_related('batch', 'item')
+    for relation in relations:
+        relations_by_product.setdefault(relation.product_id, []).append(relation)
+    return relations_by_product
+
+def create_order_record(order_number, **fields):
+    """
+    寫入訂單主表
+    編號由序號配置保證不重複，僅在唯一鍵衝突時（序號計數器遺失）重新生成，不預先查詢
+    """
+    for attempt in range(ORDER_NUMBER_MAX_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return Order.objects.create(order_number=order_number, **fields)
+        except IntegrityError:
+            if attempt == ORDER_NUMBER_MAX_ATTEMPTS - 1:
+                raise
+            order_number = regenerate_order_number(order_number)
+
 def create_order_with_inventory_reservation(user, cart_items, shipping_info):
     """
-    創建訂單並預留庫存，使用Redis鎖防止超賣
+    創建訂單並預留庫存，以 Redis Lua 腳本原子性扣減批號可預留數量防止超賣
     增加了驗證和防重機制
     """
     # 計算購物車hash值
@@ -173,8 +214,11 @@ def create_order_with_inventory_reservation(user, cart_items, shipping_info):
         # 驗證購物車商品
         validate_cart_items(cart_items)
         
+        # 一次載入所有商品的批號關聯
+        relations_by_product = load_product_batch_relations(cart_items)
+        
         # 檢查庫存可用性
-        check_inventory_availability(cart_items)
+        check_inventory_availability(cart_items, relations_by_product)
         
         # 獲取訂單配置
         config = OrderConfiguration.objects.first()
@@ -187,165 +231,123 @@ def create_order_with_inventory_reservation(user, cart_items, shipping_info):
         # 計算付款截止時間
         payment_deadline = timezone.now() + timedelta(minutes=config.payment_timeout_minutes)
         
-        # 批號庫存鎖相關變量
-        batch_locks = {}
+        # 批號需求量與對應商品名稱（用於庫存不足訊息）
         batch_quantities = {}
-        all_locks_acquired = True
+        batch_products = {}
+        reservation_token = None
         
         try:
             # 第一步：識別所有需要的批號和數量
             for cart_item in cart_items:
-                product = cart_item.product
-                quantity = cart_item.quantity
-                
-                # 獲取產品對應的批號關聯
-                product_batch_relations = ProductItemRelation.objects.filter(
-                    product=product
-                ).select_related('batch', 'item')
-                
-                for relation in product_batch_relations:
-                    batch = relation.batch
-                    if not batch:
+                for relation in relations_by_product.get(cart_item.product_id, []):
+                    if not relation.batch_id:
                         continue
                     
                     # 計算需要的庫存數量
-                    needed_quantity = int(relation.quantity * quantity)
+                    needed_quantity = int(relation.quantity * cart_item.quantity)
                     
                     # 累計批號需求量
-                    if batch.id in batch_quantities:
-                        batch_quantities[batch.id] += needed_quantity
-                    else:
-                        batch_quantities[batch.id] = needed_quantity
+                    batch_quantities[relation.batch_id] = batch_quantities.get(relation.batch_id, 0) + needed_quantity
+                    batch_products.setdefault(relation.batch_id, cart_item.product.product_name)
             
-            # 第二步：嘗試為每個批號獲取Redis鎖
-            for batch_id, needed_quantity in batch_quantities.items():
-                # 創建鎖標識
-                lock_key = f"batch_lock:{batch_id}"
-                
-                # 嘗試獲取鎖，有效期為配置的庫存鎖定時間
-                acquired = redis_client.set(
-                    lock_key, 
-                    "1", 
-                    nx=True, 
-                    ex=config.inventory_lock_seconds
-                )
-                
-                # 如果獲取鎖失敗，記錄並準備釋放所有已獲取的鎖
-                if not acquired:
-                    logger.warning(f"Failed to acquire lock for batch {batch_id}")
-                    all_locks_acquired = False
-                    break
-                
-                batch_locks[batch_id] = lock_key
+            # 第二步：以 Lua 腳本原子性扣減所有批號的可預留數量（全部成功或全部不扣）
+            reserved, short_batch_id, reservation_token = reserve_inventory(batch_quantities)
+            if not reserved:
+                raise OrderValidationError(f"商品 {batch_products.get(short_batch_id, '')} 庫存不足")
+            
+            # 第三步：預先計算訂單項目與金額
+            pricing = CartPricingContext(cart_items)
+            order_items = []
+            total_amount = 0
+            
+            for cart_item in cart_items:
+                # 活動價優先，否則常態價
+                unit_price = pricing.unit_price(cart_item)
+                item_total = unit_price * cart_item.quantity
+                total_amount += item_total
                 
-            # 如果無法獲取所有鎖，釋放已獲取的鎖並返回失敗
-            if not all_locks_acquired:
-                for lock_key in batch_locks.values():
-                    redis_client.delete(lock_key)
-                return None, "庫存競爭，請稍後再試"
+                order_items.append(OrderItem(
+                    product=cart_item.product,
+                    activity=cart_item.activity,
+                    quantity=cart_item.quantity,
+                    unit_price=unit_price,
+                    total_price=item_total,
+                    is_gift=False
+                ))
             
-            # 第三步：在資料庫事務中創建訂單並預留庫存
+            # 第四步：在資料庫事務中批次寫入訂單、預留記錄與日誌
             with transaction.atomic():
-                # 再次檢查庫存（雙重檢查）
-                check_inventory_availability(cart_items)
-                
                 # 創建訂單 - 使用正確的欄位名稱
-                order = Order.objects.create(
+                order = create_order_record(
+                    order_number,
                     user=user,
-                    order_number=order_number,
                     status='pending_payment',
                     payment_deadline=payment_deadline,
-                    lock_key=','.join(batch_locks.values()),
                     receiver_name=shipping_info.get('name', ''),
                     receiver_phone=shipping_info.get('phone', ''),
                     receiver_address=shipping_info.get('address', ''),
-                    shipping_notes=shipping_info.get('notes', '')  # 如果有備註
+                    shipping_notes=shipping_info.get('notes', ''),  # 如果有備註
+                    total_amount=total_amount,
+                    final_amount=total_amount  # 如有折扣可在此處理
                 )
                 
-                # 創建訂單項目並計算金額
-                total_amount = 0
+                reservations = []
+                logs = []
                 
-                for cart_item in cart_items:
-                    product = cart_item.product
-                    quantity = cart_item.quantity
+                for order_item, cart_item in zip(order_items, cart_items):
+                    order_item.order = order
                     
-                    # 從產品獲取價格 - 使用正確的關聯名稱
-                    unit_price = 0
-                    if hasattr(product, 'default_price'):
-                        unit_price = product.default_price.price
-                    
-                    # 如果有活動，應用活動價格
-                    if cart_item.activity:
-                        # 從 ActivityProduct 獲取活動價格
-                        from ..models import ActivityProduct
-                        activity_product = ActivityProduct.objects.filter(
-                            activity=cart_item.activity,
-                            product=product
-                        ).first()
-                        
-                        if activity_product:
-                            unit_price = activity_product.price
-                    
-                    # 計算總價
-                    item_total = unit_price * quantity
-                    total_amount += item_total
-                    
-                    # 創建訂單項目
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        activity=cart_item.activity,
-                        quantity=quantity,
-                        unit_price=unit_price,
-                        total_price=item_total,
-                        is_gift=False
-                    )
-                    
-                    # 預留批號庫存
-                    for relation in ProductItemRelation.objects.filter(product=product):
-                        batch = relation.batch
-                        if not batch:
+                    for relation in relations_by_product.get(cart_item.product_id, []):
+                        if not relation.batch_id:
                             continue
                         
-                        # 計算需要的庫存數量
-                        needed_quantity = int(relation.quantity * quantity)
+                        needed_quantity = int(relation.quantity * cart_item.quantity)
                         
-                        # 再次檢查批號庫存是否足夠
-                        if batch.available_stock < needed_quantity:
-                            # 庫存不足，回滾事務
-                            raise OrderValidationError(f"商品 {product.product_name} (批號 {batch.batch_number}) 庫存不足")
-                        
-                        # 增加預留庫存
-                        batch.reserved_stock += needed_quantity
-                        batch.save()
-                        
-                        # 創建庫存預留記錄
-                        reservation = InventoryReservation.objects.create(
+                        # 庫存預留記錄
+                        reservations.append(InventoryReservation(
                             order=order,
-                            batch=batch,
+                            batch=relation.batch,
                             item=relation.item,
                             quantity=needed_quantity,
                             is_confirmed=False,
                             expires_at=payment_deadline
-                        )
+                        ))
                         
-                        # 記錄操作日誌
-                        OrderInventoryLog.objects.create(
+                        # 操作日誌
+                        logs.append(OrderInventoryLog(
                             order=order,
-                            batch=batch,
+                            batch=relation.batch,
                             operation='reserve',
                             quantity=needed_quantity,
-                            note=f"為訂單 {order_number} 預留批號 {batch.batch_number} 庫存"
-                        )
+                            note=f"為訂單 {order.order_number} 預留批號 {relation.batch.batch_number} 庫存"
+                        ))
+                
+                # bulk 寫入不會觸發歷史 signal，以回傳的物件（含主鍵）寫入操作時間軸
+                for objs, model in ((order_items, OrderItem), (reservations, InventoryReservation),
+                                    (logs, OrderInventoryLog)):
+                    created = bulk_create_with_history(objs, model, default_user=user)
+                    record_object_events(model, created)
+                
+                # 每個批號一次 UPDATE 同步預留庫存（可預留數量已由 Redis 扣減）
+                # 以 F() 更新避免覆寫並行訂單的預留量，常態庫存同 Batch.save() 的計算方式扣除
+                for batch_id, needed_quantity in batch_quantities.items():
+                    Batch.objects.filter(id=batch_id).update(
+                        reserved_stock=F('reserved_stock') + needed_quantity,
+                        stock=F('stock') - needed_quantity
+                    )
+                batch_history = Batch.history.bulk_history_create(
+                    list(Batch.objects.filter(id__in=list(batch_quantities))),
+                    update=True,
+                    default_user=user
+                )
+                record_history_events(batch_history, ['reserved_stock', 'stock'])
                 
-                # 更新訂單總金額
-                order.total_amount = total_amount
-                order.final_amount = total_amount  # 如有折扣可在此處理
-                order.save()
+                # 預留庫存已寫入批號（資料列已鎖定至提交），清除 Redis 的進行中預留
+                settle_reservation(reservation_token)
                 
-                # 成功後釋放所有Redis鎖
-                for lock_key in batch_locks.values():
-                    redis_client.delete(lock_key)
+                # 提交後重算相關活動商品的庫存，並登記付款期限排程
+                mark_batches_dirty(batch_quantities)
+                transaction.on_commit(lambda: schedule_order_expiry(order.id, payment_deadline))
                 
                 # 釋放防重鎖
                 release_order_duplication_lock(duplication_lock_key)
@@ -353,10 +355,11 @@ def create_order_with_inventory_reservation(user, cart_items, shipping_info):
                 return order, None
                 
         except Exception as e:
-            # 發生異常，釋放所有Redis鎖
-            for lock_key in batch_locks.values():
-                redis_client.delete(lock_key)
-            logger.exception(f"訂單創建失敗: {str(e)}")
+            # 發生異常（交易已回滾），清除進行中預留並由資料庫重設計數器
+            if reservation_token:
+                cancel_reservation(reservation_token, batch_quantities)
+            if not isinstance(e, OrderValidationError):
+                logger.exception(f"訂單創建失敗: {str(e)}")
             raise
             
     except OrderValidationError as e:
@@ -393,6 +396,8 @@ def confirm_order_payment(order_id, payment_info=None):
             if payment_info:
                 order.payment_method = payment_info.get('method', '')
             order.save()
+            transaction.on_commit(lambda: unschedule_order_expiry(order.id))
+            record_order_paid(order)
             
             # 確認所有庫存預留
             reservations = InventoryReservation.objects.filter(order=order)
@@ -431,6 +436,8 @@ def cancel_order(order_id, reason=None, user=None):
             if order.status not in ['pending_payment', 'paid']:
                 return False, "訂單狀態不可取消"
             
+            was_paid = order.status == 'paid'
+
             # 更新訂單狀態
             order.status = 'cancelled'
             order.cancelled_at = timezone.now()
@@ -439,6 +446,10 @@ def cancel_order(order_id, reason=None, user=None):
                 current_notes = order.order_notes or ""
                 order.order_notes = f"{current_notes}\n取消原因: {reason}" if current_notes else f"取消原因: {reason}"
             order.save()
+            transaction.on_commit(lambda: unschedule_order_expiry(order.id))
+            if was_paid:
+                # 已付款訂單已計入熱銷排行，取消時扣回
+                record_order_cancelled(order)
             
             # 釋放所有未確認的庫存預留
             reservations = InventoryReservation.objects.filter(
@@ -482,38 +493,10 @@ def cancel_order(order_id, reason=None, user=None):
 def cleanup_expired_reservations():
     """
     清理過期的庫存預留
+    統一由 order_expiry 分批處理：將逾期訂單標記為已過期並釋放預留庫存
     """
-    now = timezone.now()
-    expired_reservations = InventoryReservation.objects.filter(
-        expires_at__lt=now,
-        is_confirmed=False
-    )
-    
-    for reservation in expired_reservations:
-        batch = reservation.batch
-        order = reservation.order
-        
-        # 減少批號的預留庫存
-        batch.reserved_stock -= reservation.quantity
-        if batch.reserved_stock < 0:
-            batch.reserved_stock = 0
-        batch.save()
-        
-        # 記錄庫存日誌
-        OrderInventoryLog.objects.create(
-            order=order,
-            batch=batch,
-            operation='expire',
-            quantity=reservation.quantity,
-            note=f"訂單 {order.order_number} 付款超時，自動釋放批號 {batch.batch_number} 預留庫存"
-        )
-        
-        # 將訂單標記為已過期
-        if order.status == 'pending_payment':
-            order.status = 'expired'
-            order.save()
-    
-    # 刪除過期預留記錄
-    expired_reservations.delete()
-    
-    logger.info(f"清理了 {len(expired_reservations)} 條過期的庫存預留記錄")
\ No newline at end of file
+    from .order_expiry import expire_overdue_orders
+
+    stats = expire_overdue_orders()
+    logger.info(f"清理了 {stats['reservations']} 條過期的庫存預留記錄")
+    return stats
@@ -0,0 +1,325 @@
+# services/promotion_engine.py
+"""
+促銷規則引擎
+將所有啟用中的促銷規則一次載入記憶體，依商品 / 活動 / 活動商品建立索引，
+購物車計算時只需純 Python 運算，不再逐筆查詢資料庫。
+
+索引以版本號控管：規則、規則關聯、活動、活動商品異動時遞增版本號（存於 cache），
+各進程發現版本不同時才重建索引。
+"""
+import logging
+import threading
+from decimal import Decimal
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PROMOTION_VERSION_KEY = 'promotion_engine:version'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class CompiledRule(object):
+    """已編譯的促銷規則快照（規則關聯 + 規則內容）"""
+    __slots__ = (
+        'relation_id', 'rule_id', 'priority', 'name', 'rule_type',
+        'threshold_amount', 'threshold_quantity', 'discount_rate', 'discount_amount',
+        'is_gift_same_product', 'gift_quantity',
+        'gift_product_id', 'gift_product_name', 'gift_product_image_url',
+    )
+
+    def __init__(self, relation):
+        rule = relation.promotion_rule
+        gift_product = rule.gift_product
+        self.relation_id = relation.id
+        self.rule_id = rule.id
+        self.priority = relation.priority
+        self.name = rule.name
+        self.rule_type = rule.rule_type
+        self.threshold_amount = rule.threshold_amount
+        self.threshold_quantity = rule.threshold_quantity
+        self.discount_rate = rule.discount_rate
+        self.discount_amount = rule.discount_amount
+        self.is_gift_same_product = rule.is_gift_same_product
+        self.gift_quantity = rule.gift_quantity
+        self.gift_product_id = gift_product.id if gift_product else None
+        self.gift_product_name = gift_product.product_name if gift_product else None
+        self.gift_product_image_url = gift_product.main_image_url if gift_product else None
+
+    def gift_count_for(self, quantity):
+        """買贈規則：依購買數量計算贈品數量"""
+        if self.rule_type != 'buy_gift' or not self.threshold_quantity or quantity < self.threshold_quantity:
+            return 0
+        return (quantity // self.threshold_quantity) * (self.gift_quantity or 0)
+
+    def discount_applies_to(self, quantity):
+        """單品折扣規則：是否達到門檻數量"""
+        return (
+            self.rule_type == 'buy_discount'
+            and bool(self.discount_rate)
+            and quantity >= (self.threshold_quantity or 0)
+        )
+
+
+class LinePricing(object):
+    """單一購物車項目的計價結果"""
+
+    def __init__(self, quantity, unit_price):
+        self.quantity = quantity
+        self.original_price = Decimal(unit_price)
+        self.price = self.original_price
+        self.gift_count = 0
+        self.discount_rule = None
+        self.gift_rules = []
+        self.applied_rules = []
+
+    @property
+    def subtotal(self):
+        return self.original_price * self.quantity
+
+    @property
+    def total(self):
+        return self.price * self.quantity
+
+    @property
+    def discount(self):
+        return self.subtotal - self.total
+
+
+class PromotionIndex(object):
+    """
+    促銷規則索引
+    - by_product: 商品規則
+    - by_activity: 活動規則
+    - by_activity_product: (活動ID, 商品ID) 的活動商品規則
+    - sitewide: 全商城規則
+    """
+
+    def __init__(self, version, relations):
+        self.version = version
+        self.by_product = {}
+        self.by_activity = {}
+        self.by_activity_product = {}
+        self.sitewide = []
+
+        for relation in relations:
+            compiled = CompiledRule(relation)
+            if relation.is_sitewide:
+                self.sitewide.append(compiled)
+            elif relation.activity_product_id:
+                key = (relation.activity_product.activity_id, relation.activity_product.product_id)
+                self.by_activity_product.setdefault(key, []).append(compiled)
+            elif relation.activity_id:
+                self.by_activity.setdefault(relation.activity_id, []).append(compiled)
+            elif relation.product_id:
+                self.by_product.setdefault(relation.product_id, []).append(compiled)
+
+        self.sitewide.sort(key=_rule_sort_key)
+
+    @classmethod
+    def build(cls, version):
+        """一次查詢載入所有啟用中的規則關聯"""
+        from ..models import PromotionRuleRelation
+
+        relations = PromotionRuleRelation.objects.filter(is_active=True).select_related(
+            'promotion_rule', 'promotion_rule__gift_product', 'activity_product'
+        )
+        return cls(version, relations)
+
+    def rules_for(self, product_id, activity_id=None):
+        """取得購物車項目適用的規則（依優先級由高至低）"""
+        rules = list(self.by_product.get(product_id, ()))
+        if activity_id:
+            rules.extend(self.by_activity_product.get((activity_id, product_id), ()))
+            rules.extend(self.by_activity.get(activity_id, ()))
+        rules.sort(key=_rule_sort_key)
+        return rules
+
+    def applicable_rule(self, product_id, activity_id=None):
+        """取得優先級最高的適用規則"""
+        rules = self.rules_for(product_id, activity_id)
+        return rules[0] if rules else None
+
+    def price_line(self, product_id, activity_id, quantity, unit_price):
+        """
+        計算單一購物車項目套用規則後的價格與贈品
+        單品折扣只套用優先級最高且達門檻的規則，買贈規則則全部累計
+        """
+        line = LinePricing(quantity, unit_price)
+
+        for rule in self.rules_for(product_id, activity_id):
+            # 買贈
+            if rule.rule_type == 'buy_gift' and rule.threshold_quantity and quantity >= rule.threshold_quantity:
+                line.gift_count += rule.gift_count_for(quantity)
+                line.gift_rules.append(rule)
+
+                gift_name = "相同商品" if rule.is_gift_same_product else (rule.gift_product_name or "贈品")
+                line.applied_rules.append({"name": f"{rule.name} (贈送{gift_name})", "type": "buy_gift"})
+
+            # 單品折扣
+            elif line.discount_rule is None and rule.discount_applies_to(quantity):
+                line.discount_rule = rule
+                line.price = line.original_price * (1 - rule.discount_rate)
+                line.applied_rules.append({
+                    "name": rule.name,
+                    "type": "buy_discount",
+                    "discount_rate": float(rule.discount_rate)
+                })
+
+        return line
+
+    def evaluate_cart(self, lines):
+        """
+        以純 Python 計算購物車摘要
+
+        Args:
+            lines: 可迭代的 (product_id, activity_id, quantity, unit_price)
+
+        Returns:
+            dict: 包含小計、折扣、最終金額、數量、贈品及適用規則等資訊
+        """
+        return self.summarize([self.price_line(*line) for line in lines])
+
+    def summarize(self, priced_lines):
+        """
+        彙總已計價的購物車項目並套用全站優惠
+
+        Args:
+            priced_lines: price_line() 回傳的 LinePricing 清單
+        """
+        subtotal = Decimal('0')
+        item_discounts = Decimal('0')
+        order_discounts = Decimal('0')
+        final_total = Decimal('0')
+        total_quantity = 0
+        total_gifts = 0
+        applied_rules = []
+        seen_rule_names = set()  # 用於去重重複優惠名稱
+
+        for line in priced_lines:
+            for applied in line.applied_rules:
+                if applied["name"] not in seen_rule_names:
+                    applied_rules.append(applied)
+                    seen_rule_names.add(applied["name"])
+
+            subtotal += line.subtotal
+            final_total += line.total
+            item_discounts += line.discount
+            total_quantity += line.quantity
+            total_gifts += line.gift_count
+
+        # 處理全站優惠
+        free_shipping = False
+
+        for rule in self.sitewide:
+            # 滿額折
+            if rule.rule_type == 'order_discount' and rule.threshold_amount and subtotal >= rule.threshold_amount:
+                if rule.discount_rate:
+                    discount = subtotal * rule.discount_rate
+                elif rule.discount_amount:
+                    discount = rule.discount_amount
+                else:
+                    discount = Decimal('0')
+
+                order_discounts += discount
+                final_total -= discount
+
+                if rule.name not in seen_rule_names:
+                    applied_rules.append({
+                        "name": rule.name,
+                        "type": "order_discount",
+                        "discount": float(discount)
+                    })
+                    seen_rule_names.add(rule.name)
+
+            # 免運
+            elif rule.rule_type == 'order_free_shipping':
+                if ((rule.threshold_amount and subtotal >= rule.threshold_amount) or
+                        (rule.threshold_quantity and total_quantity >= rule.threshold_quantity)):
+                    if rule.name not in seen_rule_names:
+                        applied_rules.append({
+                            "name": rule.name,
+                            "type": "free_shipping"
+                        })
+                        seen_rule_names.add(rule.name)
+                    free_shipping = True
+                    break
+
+        final_total = max(Decimal('0'), final_total)
+
+        return {
+            "subtotal": float(subtotal),
+            "itemDiscounts": float(item_discounts),
+            "orderDiscounts": float(order_discounts),
+            "finalAmount": float(final_total),
+            "totalQuantity": total_quantity,
+            "totalGifts": total_gifts,
+            "freeShipping": free_shipping,
+            "appliedRules": applied_rules
+        }
+
+
+def _rule_sort_key(rule):
+    return (-rule.priority, rule.relation_id)
+
+
+def get_promotion_version():
+    """取得目前的規則版本號，不存在時初始化為 1"""
+    version = cache.get(PROMOTION_VERSION_KEY)
+    if version is None:
+        cache.add(PROMOTION_VERSION_KEY, 1, None)
+        version = cache.get(PROMOTION_VERSION_KEY, 1)
+    return version
+
+
+def get_promotion_index():
+    """
+    取得促銷規則索引
+    版本號未變動時直接使用進程內的索引，否則重新載入
+    """
+    global _index
+    version = get_promotion_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = PromotionIndex.build(version)
+            logger.info(f"促銷規則索引已重建 (version={version})")
+        return _index
+
+
+# 索引中使用的贈品商品欄位（其餘商品欄位異動不影響索引）
+GIFT_PRODUCT_FIELDS = ('product_name', 'main_image_url')
+
+
+def gift_product_changed(product, update_fields=None, stored=None):
+    """
+    商品儲存前（pre_save）判斷索引中的贈品資料是否會改變
+    僅在贈品欄位有異動且商品為某規則的贈品時回傳 True
+
+    Args:
+        stored: 呼叫端已讀取的資料庫原值（需包含 GIFT_PRODUCT_FIELDS），避免重複查詢
+    """
+    if product._state.adding:
+        return False
+    if update_fields is not None and not set(update_fields) & set(GIFT_PRODUCT_FIELDS):
+        return False
+    previous = stored
+    if previous is None:
+        previous = type(product)._base_manager.filter(pk=product.pk).values(*GIFT_PRODUCT_FIELDS).first()
+    if previous is None or all(previous[field] == getattr(product, field) for field in GIFT_PRODUCT_FIELDS):
+        return False
+    return product.promotion_gifts.exists()
+
+
+def invalidate_promotion_index():
+    """遞增規則版本號，使所有進程的索引失效"""
+    try:
+        cache.incr(PROMOTION_VERSION_KEY)
+    except ValueError:
+        # 版本號尚未初始化（或已被清除）
+        cache.set(PROMOTION_VERSION_KEY, 2, None)
@@ -1,47 +1,212 @@
 """
 訂單編號生成服務
 提供訂單編號生成的邏輯
+
+訂單編號由每日遞增序號編碼而成，不需先查詢資料庫確認是否重複：
+- 序號優先取自 Redis 每日計數器（INCR，原子遞增）
+- Redis 不可用時改由資料庫 OrderNumberSequence 以區塊方式配置（每次保留 ORDER_NUMBER_DB_BLOCK_SIZE 個）
+- 兩種來源以序號最低位元區分，彼此不會重複
+- 序號經 Feistel 置換打亂後以 Crockford Base32 編碼，編號不會透露當日訂單數量
 """
-import random
-import string
+import hashlib
+import logging
+import threading
+
+import redis
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS, IntegrityError
 from django.utils import timezone
-from apps.v1.models import Order
+from apps.v1.models import OrderNumberSequence
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+ORDER_NUMBER_SEQUENCE_KEY = 'order_number_seq:{day}'
+# Redis 每日計數器存活時間（秒）
+ORDER_NUMBER_SEQUENCE_TTL = 60*60*48
+# 資料庫每次配置的序號數量
+ORDER_NUMBER_DB_BLOCK_SIZE = 100
+# 編號重複時（例如 Redis 資料遺失後計數器重新開始）計數器跳過的數量
+ORDER_NUMBER_SKIP = 100000
+
+# 序號來源（最低位元）
+SOURCE_REDIS = 0
+SOURCE_DATABASE = 1
+
+# 編碼後的位元數（8 個 Base32 字元）
+CODE_BITS = 40
+HALF_BITS = CODE_BITS // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+FEISTEL_ROUNDS = 4
+# Crockford Base32，排除容易混淆的 I、L、O、U
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+_round_keys = [
+    hashlib.blake2b(f'{settings.SECRET_KEY}:order_number:{i}'.encode(), digest_size=8).digest()
+    for i in range(FEISTEL_ROUNDS)
+]
+
+# 本程序已向資料庫保留的序號區塊 {日期: [下一個序號, 區塊結尾]}
+_db_blocks = {}
+_db_blocks_lock = threading.Lock()
+
+
+def _round(value, key):
+    digest = hashlib.blake2b(value.to_bytes(3, 'big'), key=key, digest_size=3).digest()
+    return int.from_bytes(digest, 'big') & HALF_MASK
+
+
+def permute(value):
+    """40 位元的 Feistel 置換（一對一，不同序號必得不同結果）"""
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for key in _round_keys:
+        left, right = right, left ^ _round(right, key)
+    return (left << HALF_BITS) | right
+
+
+def unpermute(value):
+    """permute 的反函數"""
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for key in reversed(_round_keys):
+        left, right = right ^ _round(left, key), left
+    return (left << HALF_BITS) | right
+
+
+def encode(value):
+    chars = []
+    for _ in range(CODE_BITS // 5):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def decode(code):
+    value = 0
+    for char in code:
+        value = (value << 5) | ALPHABET.index(char)
+    return value
+
+
+def _next_redis_sequence(day):
+    key = ORDER_NUMBER_SEQUENCE_KEY.format(day=day.strftime('%Y%m%d'))
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.incr(key)
+    pipe.expire(key, ORDER_NUMBER_SEQUENCE_TTL)
+    return pipe.execute()[0]
+
+
+def _reserve_db_block(day):
+    """
+    向資料庫保留一個序號區塊
+    使用獨立連線並立即提交，外層交易回滾時已配置的區塊不會被收回
+
+    Returns:
+        int: 區塊的最後一個序號
+    """
+    connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    table = connection.ops.quote_name(OrderNumberSequence._meta.db_table)
+    day = connection.ops.adapt_datefield_value(day)
+    try:
+        connection.set_autocommit(False)
+        with connection.cursor() as cursor:
+            for _ in range(2):
+                cursor.execute(
+                    f'UPDATE {table} SET last_value = last_value + %s WHERE day = %s',
+                    [ORDER_NUMBER_DB_BLOCK_SIZE, day]
+                )
+                if cursor.rowcount:
+                    break
+                try:
+                    cursor.execute(
+                        f'INSERT INTO {table} (day, last_value) VALUES (%s, %s)',
+                        [day, ORDER_NUMBER_DB_BLOCK_SIZE]
+                    )
+                    break
+                except IntegrityError:
+                    # 其他程序已同時建立當日序號，改為更新
+                    connection.rollback()
+            cursor.execute(f'SELECT last_value FROM {table} WHERE day = %s', [day])
+            last_value = cursor.fetchone()[0]
+        connection.commit()
+        return last_value
+    finally:
+        connection.close()
+
+
+def _next_db_sequence(day):
+    with _db_blocks_lock:
+        block = _db_blocks.get(day)
+        if block is None or block[0] > block[1]:
+            last_value = _reserve_db_block(day)
+            block = [last_value - ORDER_NUMBER_DB_BLOCK_SIZE + 1, last_value]
+            # 只保留當日區塊
+            _db_blocks.clear()
+            _db_blocks[day] = block
+        value = block[0]
+        block[0] += 1
+        return value
+
+
+def next_sequence(day):
+    """
+    配置當日的下一個序號
+
+    Returns:
+        int: 含來源位元的序號
+    """
+    try:
+        return (_next_redis_sequence(day) << 1) | SOURCE_REDIS
+    except redis.RedisError as e:
+        logger.warning(f"Redis 訂單序號配置失敗，改用資料庫序號區塊: {str(e)}")
+        return (_next_db_sequence(day) << 1) | SOURCE_DATABASE
+
+
+def format_order_number(day, sequence):
+    code = encode(permute(sequence))
+    return f"ORD-{day.strftime('%Y%m%d')}-{code[:5]}-{code[5:]}"
+
+
+def parse_order_number(order_number):
+    """
+    由訂單編號還原日期與序號（客服查詢、除錯用）
+
+    Returns:
+        tuple: (日期字串 YYYYMMDD, 序號, 來源)
+    """
+    _, date_part, head, tail = order_number.split('-')
+    sequence = unpermute(decode(head + tail))
+    return date_part, sequence >> 1, sequence & 1
+
 
 def generate_order_number():
     """
     生成唯一的訂單編號
-    格式: ORD-YYYYMMDD-NNNNN-ZZZ
+    格式: ORD-YYYYMMDD-XXXXX-XXX
     YYYYMMDD: 年月日
-    NNNNN: 5位隨機數字
-    ZZZ: 隨機字元
-    
+    XXXXX-XXX: 當日序號經置換後的 Base32 編碼
+
     返回:
         str: 生成的訂單編號
     """
-    # 年月日部分
-    date_part = timezone.now().strftime('%Y%m%d')
-    
-    # 5位隨機數字
-    random_digits = ''.join(random.choices('0123456789', k=5))
-    
-    # 隨機字元，使用數字和大寫字母，排除容易混淆的字符
-    random_chars = ''.join(random.choices(
-        string.ascii_uppercase.replace('O', '').replace('I', '') + 
-        string.digits.replace('0', '').replace('1', ''),
-        k=3
-    ))
-    
-    # 組合訂單編號
-    order_number = f"ORD-{date_part}-{random_digits}-{random_chars}"
-    
-    # 檢查是否已存在相同的訂單編號，如果存在則重新生成
-    while Order.objects.filter(order_number=order_number).exists():
-        random_digits = ''.join(random.choices('0123456789', k=5))
-        random_chars = ''.join(random.choices(
-            string.ascii_uppercase.replace('O', '').replace('I', '') + 
-            string.digits.replace('0', '').replace('1', ''),
-            k=3
-        ))
-        order_number = f"ORD-{date_part}-{random_digits}-{random_chars}"
-    
-    return order_number
\ No newline at end of file
+    day = timezone.localdate()
+    return format_order_number(day, next_sequence(day))
+
+
+def regenerate_order_number(order_number):
+    """
+    寫入時發現編號已存在（Redis 計數器遺失後重新開始）時，
+    讓計數器跳過一段序號並重新生成
+    """
+    date_part, _, source = parse_order_number(order_number)
+    if source == SOURCE_REDIS:
+        try:
+            redis_client.incrby(ORDER_NUMBER_SEQUENCE_KEY.format(day=date_part), ORDER_NUMBER_SKIP)
+        except redis.RedisError as e:
+            logger.warning(f"Redis 訂單序號跳號失敗: {str(e)}")
+    else:
+        with _db_blocks_lock:
+            _db_blocks.clear()
+    logger.warning(f"訂單編號 {order_number} 已存在，重新生成")
+    return generate_order_number()
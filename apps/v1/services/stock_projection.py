@@ -0,0 +1,195 @@
+# services/stock_projection.py
+"""
+活動商品可售庫存投影
+商品的可售數量 = 各組成品號 min(批號可用庫存 // 用量)，以批號的
+available_stock（常態 + 活動 - 預留）計算，並寫入 ActivityProduct.stock。
+
+批號或組成關聯異動時只標記受影響的商品（Redis set），交易提交後
+延遲排入 celery 任務統一重算，避免在結帳交易中逐筆重算活動商品。
+Redis 或 celery 不可用時改為交易提交後同步重算。
+"""
+import time
+import logging
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min, Value, IntegerField
+from django.db.models.functions import Coalesce, Floor, Greatest, Cast
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+STOCK_PROJECTION_DIRTY_KEY = 'stock_projection:dirty_products'
+STOCK_PROJECTION_SCHEDULED_KEY = 'stock_projection:scheduled'
+# 延遲重算秒數（期間內的異動合併為一次重算）
+STOCK_PROJECTION_DEBOUNCE_SECONDS = 2
+# 排程標記存活時間，任務遺失時逾期後可重新排程
+STOCK_PROJECTION_SCHEDULED_TTL = 60
+
+
+def buildable_units_queryset(product_ids=None):
+    """
+    以單一彙總查詢計算商品可組成數量
+
+    Returns:
+        QuerySet: values('product_id', 'units')
+    """
+    from ..models import ProductItemRelation
+
+    available = F('batch__stock') + F('batch__active_stock') - F('batch__reserved_stock')
+    units = Coalesce(
+        Cast(Floor(Greatest(available, Value(0)) / F('quantity')), IntegerField()),
+        Value(0)  # 未指定批號的組成視為無庫存
+    )
+
+    queryset = ProductItemRelation.objects.filter(quantity__gt=0)
+    if product_ids is not None:
+        queryset = queryset.filter(product_id__in=list(product_ids))
+    return queryset.values('product_id').annotate(units=Min(units)).order_by()
+
+
+def compute_buildable_units(product_ids):
+    """
+    計算商品可組成數量
+
+    Returns:
+        dict: {商品ID: 可組成數量}，未設定組成的商品為 0
+    """
+    product_ids = set(product_ids)
+    result = dict.fromkeys(product_ids, 0)
+    if product_ids:
+        for row in buildable_units_queryset(product_ids):
+            result[row['product_id']] = max(row['units'], 0)
+    return result
+
+
+def refresh_products(product_ids):
+    """
+    重算商品的可售庫存並更新活動商品（數值相同者不更新）
+
+    Returns:
+        int: 更新的活動商品數量
+    """
+    from ..models import ActivityProduct
+
+    units_by_product = compute_buildable_units(product_ids)
+
+    # 相同數值的商品合併為一次 UPDATE
+    products_by_units = {}
+    for product_id, units in units_by_product.items():
+        products_by_units.setdefault(units, []).append(product_id)
+
+    updated = 0
+    for units, ids in products_by_units.items():
+        updated += ActivityProduct.objects.filter(product_id__in=ids).exclude(stock=units).update(stock=units)
+    return updated
+
+
+def mark_products_dirty(product_ids):
+    """標記商品需要重算，交易提交後排入延遲任務"""
+    product_ids = {product_id for product_id in product_ids if product_id}
+    if product_ids:
+        transaction.on_commit(lambda: _schedule_refresh(product_ids))
+
+
+def mark_batches_dirty(batch_ids):
+    """標記使用這些批號的商品需要重算"""
+    from ..models import ProductItemRelation
+
+    batch_ids = list(batch_ids)
+    if batch_ids:
+        mark_products_dirty(
+            ProductItemRelation.objects.filter(batch_id__in=batch_ids).values_list('product_id', flat=True).distinct()
+        )
+
+
+def _schedule_refresh(product_ids):
+    try:
+        redis_client.sadd(STOCK_PROJECTION_DIRTY_KEY, *product_ids)
+        if cache.add(STOCK_PROJECTION_SCHEDULED_KEY, 1, STOCK_PROJECTION_SCHEDULED_TTL):
+            from ..tasks import refresh_stock_projection
+            refresh_stock_projection.apply_async(countdown=STOCK_PROJECTION_DEBOUNCE_SECONDS)
+    except Exception as e:
+        logger.warning(f"排程可售庫存重算失敗，改為同步重算: {str(e)}")
+        cache.delete(STOCK_PROJECTION_SCHEDULED_KEY)
+        refresh_products(product_ids)
+
+
+def refresh_dirty_products():
+    """
+    取出所有已標記的商品並重算（由延遲任務呼叫）
+
+    Returns:
+        int: 更新的活動商品數量
+    """
+    # 先清除排程標記，之後的異動會重新排程
+    cache.delete(STOCK_PROJECTION_SCHEDULED_KEY)
+
+    pipe = redis_client.pipeline()
+    pipe.smembers(STOCK_PROJECTION_DIRTY_KEY)
+    pipe.delete(STOCK_PROJECTION_DIRTY_KEY)
+    members, _ = pipe.execute()
+
+    product_ids = {int(member) for member in members}
+    if not product_ids:
+        return 0
+    try:
+        return refresh_products(product_ids)
+    except Exception:
+        # 重算失敗時放回標記，等待下次處理
+        redis_client.sadd(STOCK_PROJECTION_DIRTY_KEY, *product_ids)
+        raise
+
+
+def recalculate_all_stock(dry_run=False, chunk_size=1000):
+    """
+    全量重算所有活動商品的可售庫存
+    以單一彙總查詢取得所有商品的可組成數量，比對後以 bulk_update 分批寫入
+
+    Args:
+        dry_run: 只比對差異，不寫入資料庫
+        chunk_size: bulk_update 每批筆數
+
+    Returns:
+        dict: checked（檢查筆數）、updated（更新筆數）、changes（差異明細）、duration_ms（耗時）
+    """
+    from ..models import ActivityProduct
+
+    started = time.monotonic()
+    units_by_product = {row['product_id']: max(row['units'], 0) for row in buildable_units_queryset()}
+
+    activity_products = ActivityProduct.objects.select_related('product', 'activity').only(
+        'id', 'stock', 'product_id', 'product__product_name', 'activity_id', 'activity__name'
+    ).order_by('id')
+
+    checked = 0
+    changed = []
+    changes = []
+    for ap in activity_products.iterator(chunk_size=chunk_size):
+        checked += 1
+        new_stock = units_by_product.get(ap.product_id, 0)
+        if ap.stock == new_stock:
+            continue
+        changes.append({
+            'id': ap.id,
+            'product_name': ap.product.product_name,
+            'activity_name': ap.activity.name,
+            'old_stock': ap.stock,
+            'new_stock': new_stock
+        })
+        ap.stock = new_stock
+        changed.append(ap)
+
+    if not dry_run and changed:
+        ActivityProduct.objects.bulk_update(changed, ['stock'], batch_size=chunk_size)
+
+    return {
+        'checked': checked,
+        'updated': 0 if dry_run else len(changed),
+        'changes': changes,
+        'duration_ms': int((time.monotonic() - started) * 1000)
+    }
@@ -1,56 +1,78 @@
 # tasks.py
+import logging
+
 from celery import shared_task
-from django.utils import timezone
-from django.db import transaction
-from .models import Order, InventoryReservation, OrderInventoryLog, Batch
+from django.core.cache import cache
+
+from .services.order_expiry import expire_overdue_orders
+from .services.stock_projection import refresh_dirty_products
+from .services.dashboard_rollup import reconcile_dashboard_rollup
+from .services.best_sellers import rebuild_best_sellers
+from .services.inventory_reservation import reconcile_inventory_counters
+
+logger = logging.getLogger(__name__)
+
+# 逾期處理執行鎖，避免上一輪尚未結束時重複執行
+EXPIRED_ORDERS_LOCK_KEY = 'task_lock:check_expired_orders'
+EXPIRED_ORDERS_LOCK_TIMEOUT = 60 * 14
+INVENTORY_COUNTERS_LOCK_KEY = 'task_lock:reconcile_inventory_counters'
+INVENTORY_COUNTERS_LOCK_TIMEOUT = 60 * 50
 
 @shared_task
 def check_expired_orders():
     """
     檢查並處理過期的訂單
     """
-    process_expired_orders()
+    if not cache.add(EXPIRED_ORDERS_LOCK_KEY, 1, EXPIRED_ORDERS_LOCK_TIMEOUT):
+        logger.warning("上一輪逾期訂單處理尚未結束，略過本次執行")
+        return None
+    try:
+        return process_expired_orders()
+    finally:
+        cache.delete(EXPIRED_ORDERS_LOCK_KEY)
 
 def process_expired_orders():
     """
     處理已過支付期限的訂單
-    1. 找出已過支付期限的「待付款」訂單
-    2. 將其狀態更新為「已逾期」
-    3. 釋放其預留的庫存
-    """
-    # 找出已過付款期限的訂單
-    now = timezone.now()
-    expired_orders = Order.objects.filter(
-        status='pending_payment',
-        payment_deadline__lt=now
-    )
-    
-    for order in expired_orders:
-        with transaction.atomic():
-            # 更新訂單狀態為逾期
-            order.status = 'expired'
-            order.save()
-            
-            # 釋放所有預留庫存
-            reservations = InventoryReservation.objects.filter(
-                order=order,
-                is_confirmed=False
-            )
-            
-            for reservation in reservations:
-                batch = reservation.batch
-                
-                # 減少批號的預留庫存
-                batch.reserved_stock -= reservation.quantity
-                if batch.reserved_stock < 0:
-                    batch.reserved_stock = 0
-                batch.save()
-                
-                # 記錄庫存日誌
-                OrderInventoryLog.objects.create(
-                    order=order,
-                    batch=batch,
-                    operation='release',
-                    quantity=reservation.quantity,
-                    note=f"訂單 {order.order_number} 付款逾期，自動釋放批號 {batch.batch_number} 預留庫存"
-                )
\ No newline at end of file
+    1. 分批找出已過支付期限的「待付款」訂單
+    2. 批次將其狀態更新為「已逾期」
+    3. 依批號彙總釋放其預留的庫存並批次寫入日誌
+
+    Returns:
+        dict: 處理數量與耗時統計
+    """
+    return expire_overdue_orders()
+
+@shared_task
+def refresh_stock_projection():
+    """
+    重算已標記商品的活動商品庫存（由批號 / 組成異動延遲觸發）
+    """
+    return refresh_dirty_products()
+
+@shared_task
+def reconcile_dashboard_statistics():
+    """
+    每晚完整重算儀表板統計，校正增量更新的誤差並更新即將到期數量
+    """
+    return reconcile_dashboard_rollup()
+
+@shared_task
+def rebuild_best_seller_rankings():
+    """
+    每晚由資料庫重建熱銷排行，校正 Redis 不可用期間遺漏的增減
+    """
+    return rebuild_best_sellers()
+
+@shared_task
+def reconcile_inventory_reservation_counters():
+    """
+    定期由資料庫重設批號庫存計數器，校正程序中斷、歸還失敗或差額遺失造成的誤差
+    """
+    if not cache.add(INVENTORY_COUNTERS_LOCK_KEY, 1, INVENTORY_COUNTERS_LOCK_TIMEOUT):
+        logger.warning("上一輪批號庫存計數器校正尚未結束，略過本次執行")
+        return None
+    try:
+        return reconcile_inventory_counters()
+    finally:
+        cache.delete(INVENTORY_COUNTERS_LOCK_KEY)
@@ -1,25 +1,14 @@
 # utils.py
 
-def recalculate_all_activity_product_stock():
+def recalculate_all_activity_product_stock(dry_run=False):
     """
     Utility function to recalculate stock for all ActivityProduct records.
     This can be called from a management command, admin action, or after imports.
+    Uses a single aggregate query and bulk_update (see services.stock_projection).
     """
-    from .models import ActivityProduct
+    from .services.stock_projection import recalculate_all_stock
     
-    activity_products = ActivityProduct.objects.all()
-    updated_count = 0
-    
-    for ap in activity_products:
-        old_stock = ap.stock
-        new_stock = ap.calculate_available_stock()
-        
-        if old_stock != new_stock:
-            # Use update to avoid triggering signals
-            ActivityProduct.objects.filter(id=ap.id).update(stock=new_stock)
-            updated_count += 1
-    
-    return updated_count
+    return recalculate_all_stock(dry_run=dry_run)['updated']
 
 
 import uuid
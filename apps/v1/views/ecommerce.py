@@ -2,13 +2,14 @@ from django.conf import settings
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from simple_history.utils import update_change_reason
 from simple_history.models import HistoricalRecords
 from ..services.simplified_order_services import generate_order_number
@@ -17,18 +18,28 @@ from django.db import transaction
 import logging
 import traceback
 from utils.view import TrackedAPIView
-from ..services.cart_summary import calculate_cart_summary
+from utils.export import ExportMixin
+from ..services.cart_summary import CartPricingContext, calculate_cart_summary
+from ..services.order_read import user_orders_queryset, serialize_orders
+from ..services.audit_timeline import timeline_queryset
+from ..services.dashboard_rollup import get_dashboard_statistics
+from ..services.best_sellers import get_best_sellers, PERIODS as BEST_SELLER_PERIODS, MAX_LIMIT as BEST_SELLER_MAX_LIMIT
+from ..services.cart_store import (
+    load_cart_snapshot, save_cart_snapshot, get_cart_count, save_cart_count, invalidate_cart_snapshot,
+    get_cart_generation
+)
 from ..models import (
     Product, ProductImage, Banner, Cart, CartItem, 
-    Order, OrderItem, ShipmentItem, Item, Batch, Activity, Category, 
-    MaterialCategory, PromotionRule, UserActivityLog, InventoryReservation, OrderInventoryLog
+    Order, OrderItem, ShipmentItem, Batch, Category,
+    InventoryReservation, OrderInventoryLog
 )
 from ..serializers import (
-    HistoricalRecordSerializer, ProductListSerializer, ProductDetailSerializer, 
+    ProductListSerializer, ProductDetailSerializer, 
     ProductCreateUpdateSerializer, ProductImageSerializer, CategoryProductCountSerializer,
     ProductWithPricingSerializer, CartItemSerializer, CartItemCreateSerializer,
     BannerSerializer, BannerResponseSerializer, OrderSerializer, OrderItemSerializer, 
-    ShipmentItemSerializer, InventoryReservationSerializer, OrderInventoryLogSerializer
+    ShipmentItemSerializer, InventoryReservationSerializer, OrderInventoryLogSerializer,
+    AuditEventSerializer
 )
 from ..filters import ProductFilter, OrderFilter
 from .warehouse import ModelHistoryViewMixin
@@ -36,6 +47,22 @@ from .warehouse import ModelHistoryViewMixin
 logger = logging.getLogger(__name__)
 
 
+def _parse_best_seller_params(request, default_limit):
+    """
+    解析熱銷排行的 activity、limit 參數（limit 限制在 1 ~ BEST_SELLER_MAX_LIMIT）
+
+    Returns:
+        tuple: (活動ID, 筆數)，參數不是整數時回傳錯誤訊息
+    """
+    try:
+        activity_id = request.query_params.get('activity')
+        activity_id = int(activity_id) if activity_id else None
+        limit = int(request.query_params.get('limit', default_limit))
+    except ValueError:
+        return None, 'activity、limit 必須是整數'
+    return (activity_id, max(1, min(limit, BEST_SELLER_MAX_LIMIT))), None
+
+
 class ProductViewSet(TrackedAPIView, ModelHistoryViewMixin):
     """商品視圖集"""
     queryset = Product.objects.all()
@@ -54,6 +81,28 @@ class ProductViewSet(TrackedAPIView, ModelHistoryViewMixin):
             return ProductCreateUpdateSerializer
         return ProductListSerializer
     
+    @action(detail=False, methods=['get'], url_path='best-sellers', permission_classes=[AllowAny])
+    def best_sellers(self, request):
+        """
+        熱銷商品（前台「熱銷」區塊，免登入）
+        參數 period: all、day、week（預設）；activity: 活動ID；limit: 筆數（1 ~ 20）
+        """
+        period = request.query_params.get('period', 'week')
+        if period not in BEST_SELLER_PERIODS:
+            period = 'week'
+        params, error = _parse_best_seller_params(request, 8)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        best_sellers = get_best_sellers(period, *params)
+        return Response({"data": [{
+            'id': str(product.id),
+            'name': product.product_name,
+            'shortDescription': (product.description or "")[:100],
+            'imageUrl': product.main_image_url,
+            'soldQuantity': sold_quantity,
+        } for product, sold_quantity in best_sellers]})
+
     @action(detail=True, methods=['get'], url_name='components', permission_classes=[IsAuthenticated])
     def components(self, request, pk=None):
         from ..serializers import ProductItemRelationSerializer
@@ -176,26 +225,37 @@ class CartViewSet(viewsets.ViewSet):
         """獲取或創建用戶的購物車"""
         cart, created = Cart.objects.get_or_create(user=request.user)
         return cart
+
+    def get_cart_payload(self, request, cart):
+        """
+        組出購物車列表與優惠摘要，並寫入 Redis 快照（查詢期間購物車已異動時不寫入）
+        計價上下文每次請求只建立一次，由序列化器與摘要計算共用
+        """
+        generation = get_cart_generation(request.user.id)
+        cart_items = list(CartItem.objects.filter(cart=cart).select_related('product', 'activity'))
+        pricing = CartPricingContext(cart_items)
+        serialized_items = CartItemSerializer(cart_items, many=True, context={'cart_pricing': pricing}).data
+        summary = calculate_cart_summary(request.user, cart_items, pricing=pricing)
+        payload = {
+            'items': serialized_items,
+            'summary': summary
+        }
+        save_cart_snapshot(request.user.id, payload, generation)
+        return payload
     
     @action(detail=False, methods=['get'], url_path='items')
     def items(self, request):
         """
         獲取購物車商品列表，包含優惠摘要與折扣後價格
         """
-        cart = self.get_cart(request)
-        cart_items = CartItem.objects.filter(cart=cart).select_related('product', 'activity')
-
-        # ➕ 序列化商品資料
-        serialized_items = CartItemSerializer(cart_items, many=True).data
-
-        # ➕ 套用優惠計算摘要（使用 service 處理）
-        summary = calculate_cart_summary(request.user, cart_items)
+        # ➕ 優先使用 Redis 快照，未命中才查詢資料庫重建
+        payload = load_cart_snapshot(request.user.id)
+        if payload is None:
+            cart = self.get_cart(request)
+            payload = self.get_cart_payload(request, cart)
 
         return Response({
-            'data': {
-                'items': serialized_items,
-                'summary': summary
-            }
+            'data': payload
         })
     
     @action(detail=False, methods=['post'], url_path='add')
@@ -204,16 +264,11 @@ class CartViewSet(viewsets.ViewSet):
         serializer = CartItemCreateSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
+            invalidate_cart_snapshot(request.user.id)
             # 新增成功後直接返回購物車列表與 summary
             cart = self.get_cart(request)
-            cart_items = CartItem.objects.filter(cart=cart).select_related('product', 'activity')
-            serialized_items = CartItemSerializer(cart_items, many=True).data
-            summary = calculate_cart_summary(request.user, cart_items)
             return Response({
-                'data': {
-                    'items': serialized_items,
-                    'summary': summary
-                }
+                'data': self.get_cart_payload(request, cart)
             }, status=status.HTTP_201_CREATED)
         
         return Response({
@@ -249,6 +304,7 @@ class CartViewSet(viewsets.ViewSet):
             )
             cart_item.quantity = quantity
             cart_item.save()
+            invalidate_cart_snapshot(request.user.id)
         except CartItem.DoesNotExist:
             return Response({
                 'data': {
@@ -257,14 +313,8 @@ class CartViewSet(viewsets.ViewSet):
                 }
             }, status=status.HTTP_404_NOT_FOUND)
 
-        cart_items = CartItem.objects.filter(cart=cart).select_related('product', 'activity')
-        serialized_items = CartItemSerializer(cart_items, many=True).data
-        summary = calculate_cart_summary(request.user, cart_items)
         return Response({
-            'data': {
-                'items': serialized_items,
-                'summary': summary
-            }
+            'data': self.get_cart_payload(request, cart)
         })
             
     @action(detail=False, methods=['delete'], url_path='remove')
@@ -285,6 +335,7 @@ class CartViewSet(viewsets.ViewSet):
             # 確保項目屬於當前用戶的購物車
             cart_item = CartItem.objects.get(id=cart_item_id, cart=cart)
             cart_item.delete()
+            invalidate_cart_snapshot(request.user.id)
         except CartItem.DoesNotExist:
             return Response({
                 'data': {
@@ -293,23 +344,20 @@ class CartViewSet(viewsets.ViewSet):
                 }
             }, status=status.HTTP_404_NOT_FOUND)
         
-        cart_items = CartItem.objects.filter(cart=cart).select_related('product', 'activity')
-        serialized_items = CartItemSerializer(cart_items, many=True).data
-        summary = calculate_cart_summary(request.user, cart_items)
         return Response({
-            'data': {
-                'items': serialized_items,
-                'summary': summary
-            }
+            'data': self.get_cart_payload(request, cart)
         })
     
     @action(detail=False, methods=['get'], url_path='count')
     def count(self, request):
         """獲取購物車商品數量"""
-        cart = self.get_cart(request)
-        count = CartItem.objects.filter(cart=cart).aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
+        count = get_cart_count(request.user.id)
+        if count is None:
+            generation = get_cart_generation(request.user.id)
+            count = CartItem.objects.filter(cart__user=request.user).aggregate(
+                total=Sum('quantity')
+            )['total'] or 0
+            save_cart_count(request.user.id, count, generation)
         
         return Response({
             'data': {
@@ -324,21 +372,28 @@ class CartViewSet(viewsets.ViewSet):
         
         # 刪除該購物車中的所有項目
         CartItem.objects.filter(cart=cart).delete()
+        invalidate_cart_snapshot(request.user.id)
+        generation = get_cart_generation(request.user.id)
+
+        payload = {
+            'items': [],
+            'summary': {
+                'subtotal': 0,
+                'itemDiscounts': 0,
+                'orderDiscounts': 0,
+                'finalAmount': 0,
+                'totalQuantity': 0,
+                'totalGifts': 0,
+                'freeShipping': False,
+                'appliedRules': []
+            }
+        }
+        save_cart_snapshot(request.user.id, payload, generation)
         
         # 返回清空後的購物車狀態
         return Response({
             'data': {
-                'items': [],
-                'summary': {
-                    'subtotal': 0,
-                    'itemDiscounts': 0,
-                    'orderDiscounts': 0,
-                    'finalAmount': 0,
-                    'totalQuantity': 0,
-                    'totalGifts': 0,
-                    'freeShipping': False,
-                    'appliedRules': []
-                },
+                **payload,
                 'success': True,
                 'message': '購物車已清空'
             }
@@ -379,7 +434,7 @@ class BannerViewSet(TrackedAPIView, ModelHistoryViewMixin):
         return Response(serializer.data)
 
 
-class OrderViewSet(TrackedAPIView, ModelHistoryViewMixin):
+class OrderViewSet(TrackedAPIView, ModelHistoryViewMixin, ExportMixin):
     """訂單視圖集"""
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
@@ -389,6 +444,30 @@ class OrderViewSet(TrackedAPIView, ModelHistoryViewMixin):
     search_fields = ['order_number', 'receiver_name', 'receiver_phone']
     ordering_fields = ['create_time', 'status', 'final_amount']
     ordering = ['-create_time']
+    export_filename = 'orders'
+    export_fields = [
+        ('訂單編號', 'order_number'),
+        ('下單用戶', 'user__username'),
+        ('狀態', 'status'),
+        ('總金額', 'total_amount'),
+        ('折扣金額', 'discount_amount'),
+        ('實付金額', 'final_amount'),
+        ('付款方式', 'payment_method'),
+        ('收件人姓名', 'receiver_name'),
+        ('聯絡電話', 'receiver_phone'),
+        ('收件地址', 'receiver_address'),
+        ('付款時間', 'paid_at'),
+        ('建立時間', 'create_time'),
+    ]
+    inventory_log_export_fields = [
+        ('訂單編號', 'order__order_number'),
+        ('批號', 'batch__batch_number'),
+        ('操作類型', 'operation'),
+        ('數量', 'quantity'),
+        ('操作者', 'operator__username'),
+        ('備註', 'note'),
+        ('建立時間', 'create_time'),
+    ]
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def create_order(self, request):
@@ -461,6 +540,8 @@ class OrderViewSet(TrackedAPIView, ModelHistoryViewMixin):
                                     'message': f'處理購物車項目失敗: {str(e)}'
                                 }
                             }, status=status.HTTP_400_BAD_REQUEST)
+                # 購物車內容已異動
+                invalidate_cart_snapshot(user.id)
             # 如果是ID列表，直接使用
             elif isinstance(cart_items_data[0], (int, str)):
                 cart_item_ids = [int(item_id) for item_id in cart_items_data]
@@ -550,6 +631,7 @@ class OrderViewSet(TrackedAPIView, ModelHistoryViewMixin):
             
             # 訂單創建成功，清空購物車項目
             CartItem.objects.filter(id__in=cart_item_ids).delete()
+            invalidate_cart_snapshot(user.id)
             
             # 返回訂單信息
             serializer = OrderSerializer(order)
@@ -781,6 +863,18 @@ class OrderViewSet(TrackedAPIView, ModelHistoryViewMixin):
         return Response({
             'data': serializer.data
         })
+
+    @action(detail=False, methods=['get'], url_path='inventory_logs/export', permission_classes=[IsAuthenticated])
+    def export_inventory_logs(self, request):
+        """匯出符合訂單過濾條件的庫存操作日誌（file_format=csv|ndjson，可用 operation 過濾）"""
+        orders = self.filter_queryset(self.get_queryset())
+        logs = OrderInventoryLog.objects.filter(order__in=orders.values('pk'))
+
+        operation = request.query_params.get('operation')
+        if operation:
+            logs = logs.filter(operation=operation)
+
+        return self.get_export_response(logs, self.inventory_log_export_fields, 'order_inventory_logs')
     
     @action(detail=True, methods=['get'], url_name='items', permission_classes=[IsAuthenticated])
     def items(self, request, pk=None):
@@ -851,75 +945,21 @@ class OrderViewSet(TrackedAPIView, ModelHistoryViewMixin):
     
     @action(detail=False, methods=['get'], url_name='user_orders', permission_classes=[IsAuthenticated])
     def user_orders(self, request):
-        """獲取當前用戶的訂單及其詳細項目信息"""
-        user = request.user
-        orders = Order.objects.filter(user=user).order_by('-create_time')
+        """
+        獲取當前用戶的訂單及其詳細項目信息
+        訂單、項目與商品圖片以固定數量的查詢載入；
+        帶 pagination=cursor 或 cursor 參數時由 MyPagination 改用依建立時間的游標分頁
+        """
+        orders = user_orders_queryset(request.user)
         
         page = self.paginate_queryset(orders)
         if page is not None:
-            # 創建結果列表
-            result = []
-            for order in page:
-                # 獲取訂單基本信息
-                order_data = OrderSerializer(order).data
-                
-                # 獲取訂單項目
-                order_items = OrderItem.objects.filter(order=order).select_related('product', 'activity')
-                order_items_data = []
-                
-                for item in order_items:
-                    # 序列化每個訂單項目
-                    item_data = OrderItemSerializer(item).data
-                    
-                    # 添加商品圖片URL
-                    if item.product:
-                        item_data['image_url'] = item.product.main_image_url
-                        
-                        # 可選：獲取更多的商品圖片
-                        product_images = ProductImage.objects.filter(product=item.product).order_by('sort_order')
-                        if product_images.exists():
-                            item_data['additional_images'] = [img.image_url for img in product_images]
-                    
-                    order_items_data.append(item_data)
-                
-                # 添加項目數據到訂單
-                order_data['items'] = order_items_data
-                result.append(order_data)
-            
             # 返回帶有分頁的結果
-            return self.get_paginated_response(result)
+            return self.get_paginated_response(serialize_orders(page))
         
         # 無分頁時的處理
-        result = []
-        for order in orders:
-            # 獲取訂單基本信息
-            order_data = OrderSerializer(order).data
-            
-            # 獲取訂單項目
-            order_items = OrderItem.objects.filter(order=order).select_related('product', 'activity')
-            order_items_data = []
-            
-            for item in order_items:
-                # 序列化每個訂單項目
-                item_data = OrderItemSerializer(item).data
-                
-                # 添加商品圖片URL
-                if item.product:
-                    item_data['image_url'] = item.product.main_image_url
-                    
-                    # 可選：獲取更多的商品圖片
-                    product_images = ProductImage.objects.filter(product=item.product).order_by('sort_order')
-                    if product_images.exists():
-                        item_data['additional_images'] = [img.image_url for img in product_images]
-                
-                order_items_data.append(item_data)
-            
-            # 添加項目數據到訂單
-            order_data['items'] = order_items_data
-            result.append(order_data)
-        
         return Response({
-            'data': result
+            'data': serialize_orders(orders)
         })
 
     @action(detail=False, methods=['get'], url_name='check_payment_deadline', permission_classes=[IsAuthenticated])
@@ -1051,60 +1091,41 @@ class ProductWithPricingViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset.distinct()
 
 
-class RecentHistoryPagination(PageNumberPagination):
+class RecentHistoryPagination(CursorPagination):
+    """操作時間軸游標分頁（依發生時間新到舊）"""
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
+    ordering = ('-event_time', '-id')
 
 
 class RecentHistoryView(APIView):
+    """
+    近期操作紀錄（操作時間軸）
+    參數：days（預設 7 天）或 since / until、model、user、object_id
+    """
     permission_classes = [IsAuthenticated]
-    pagination_class = RecentHistoryPagination()
-
-    def paginate_queryset(self, queryset, request, view=None):
-        return self.pagination_class.paginate_queryset(queryset, request, view=view)
-
-    def get_paginated_response(self, data):
-        return self.pagination_class.get_paginated_response(data)
+    pagination_class = RecentHistoryPagination
 
     def get(self, request):
-        days = int(request.query_params.get('days', 7))
-        model = request.query_params.get('model', None)
-        user_id = request.query_params.get('user', None)
-
-        since = timezone.now() - timezone.timedelta(days=days)
-
-        all_history = []
-        model_classes = [
-            Item, Product, Batch, Activity, Order, OrderItem,
-            Banner, Cart, PromotionRule, UserActivityLog,
-            MaterialCategory, Category
-        ]
-
-        for model_cls in model_classes:
-            history_model = model_cls.history.model
-            qs = history_model.objects.filter(history_date__gte=since)
-            if user_id:
-                qs = qs.filter(history_user_id=user_id)
-            if model:
-                if model.lower() != model_cls.__name__.lower():
-                    continue
-            for record in qs:
-                record._model_name = model_cls.__name__  # 附加模型名稱方便序列化顯示
-                all_history.append(record)
-
-        # 按時間排序
-        all_history.sort(key=lambda r: r.history_date, reverse=True)
+        since = parse_datetime(request.query_params.get('since', '') or '')
+        until = parse_datetime(request.query_params.get('until', '') or '')
+        if since is None:
+            days = int(request.query_params.get('days', 7))
+            since = timezone.now() - timezone.timedelta(days=days)
 
-        page = self.paginate_queryset(all_history, request)
-        serializer = HistoricalRecordSerializer(page, many=True)
-        data = serializer.data
-
-        # 附加模型名稱進去
-        for i, record in enumerate(page):
-            data[i]['model_name'] = getattr(record, '_model_name', 'Unknown')
+        queryset = timeline_queryset(
+            model=request.query_params.get('model', None),
+            user_id=request.query_params.get('user', None),
+            object_id=request.query_params.get('object_id', None),
+            since=since,
+            until=until
+        )
 
-        return self.get_paginated_response(data)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = AuditEventSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class DashboardViewSet(viewsets.ViewSet):
@@ -1113,55 +1134,8 @@ class DashboardViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'], url_name='statistics', permission_classes=[IsAuthenticated])
     def statistics(self, request):
-        """獲取系統統計數據"""
-        # 產品統計
-        product_count = Product.objects.count()
-        active_product_count = Product.objects.filter(is_deleted=False).count()
-        
-        # 庫存統計
-        batch_count = Batch.objects.count()
-        total_stock = Batch.objects.aggregate(total=Sum('quantity'))['total'] or 0
-        low_stock_count = Batch.objects.filter(quantity__lte=10).count()
-        expiring_count = Batch.objects.filter(
-            expiry_date__lte=timezone.now().date() + timezone.timedelta(days=30),
-            expiry_date__gt=timezone.now().date()
-        ).count()
-        
-        # 訂單統計
-        order_count = Order.objects.count()
-        processing_order_count = Order.objects.filter(status='processing').count()
-        shipped_order_count = Order.objects.filter(status='shipped').count()
-        total_sales = Order.objects.filter(status__in=['completed', 'shipped']).aggregate(
-            total=Sum('final_amount')
-        )['total'] or 0
-        
-        # 活動統計
-        active_activity_count = Activity.objects.filter(
-            start_date__lte=timezone.now(),
-            end_date__gte=timezone.now()
-        ).count()
-        
-        return Response({
-            'product': {
-                'total': product_count,
-                'active': active_product_count,
-            },
-            'stock': {
-                'batch_count': batch_count,
-                'total_quantity': total_stock,
-                'low_stock': low_stock_count,
-                'expiring_soon': expiring_count
-            },
-            'order': {
-                'total': order_count,
-                'processing': processing_order_count,
-                'shipped': shipped_order_count,
-                'total_sales': total_sales
-            },
-            'activity': {
-                'active': active_activity_count
-            }
-        })
+        """獲取系統統計數據（讀取增量維護的統計，見 services.dashboard_rollup）"""
+        return Response(get_dashboard_statistics())
     
     @action(detail=False, methods=['get'], url_name='recent_orders', permission_classes=[IsAuthenticated])
     def recent_orders(self, request):
@@ -1173,26 +1147,24 @@ class DashboardViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'], url_name='top_products', permission_classes=[IsAuthenticated])
     def top_products(self, request):
-        """獲取熱銷商品"""
-        limit = int(request.query_params.get('limit', 5))
-        
-        # 計算各商品的銷售數量
-        products_sold = OrderItem.objects.values('product').annotate(
-            sold_quantity=Sum('quantity')
-        ).order_by('-sold_quantity')[:limit]
-        
-        result = []
-        for item in products_sold:
-            try:
-                product = Product.objects.get(id=item['product'])
-                result.append({
-                    'id': product.id,
-                    'product_code': product.product_code,
-                    'product_name': product.product_name,
-                    'sold_quantity': item['sold_quantity'],
-                    'main_image_url': product.main_image_url
-                })
-            except Product.DoesNotExist:
-                pass
+        """
+        獲取熱銷商品（讀取 Redis 熱銷排行，見 services.best_sellers）
+        參數 period: all（預設）、day、week；activity: 活動ID；limit: 筆數（1 ~ 20）
+        """
+        period = request.query_params.get('period', 'all')
+        if period not in BEST_SELLER_PERIODS:
+            return Response({'error': f'period 僅支援 {", ".join(BEST_SELLER_PERIODS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        params, error = _parse_best_seller_params(request, 5)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        best_sellers = get_best_sellers(period, *params)
+        result = [{
+            'id': product.id,
+            'product_code': product.product_code,
+            'product_name': product.product_name,
+            'sold_quantity': sold_quantity,
+            'main_image_url': product.main_image_url
+        } for product, sold_quantity in best_sellers]
         
         return Response(result)
\ No newline at end of file
@@ -16,7 +16,7 @@ from ..serializers import (
     UserActivityLogSerializer
 )
 from ..filters import ActivityFilter
-from ..utils import recalculate_all_activity_product_stock
+from ..services.stock_projection import recalculate_all_stock
 from .warehouse import ModelHistoryViewMixin
 
 
@@ -190,11 +190,21 @@ class ActivityProductViewSet(TrackedAPIView, ModelHistoryViewMixin):
         """
         Recalculate stock for all activity products
         """
-        updated_count = recalculate_all_activity_product_stock()
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+        result = recalculate_all_stock(dry_run=dry_run)
+        
+        if dry_run:
+            return Response({
+                'updated_count': 0,
+                'changes': result['changes'],
+                'duration_ms': result['duration_ms'],
+                'message': f'試算：{len(result["changes"])} 個活動商品需要更新'
+            })
         
         return Response({
-            'updated_count': updated_count,
-            'message': f'成功更新 {updated_count} 個活動商品的庫存'
+            'updated_count': result['updated'],
+            'duration_ms': result['duration_ms'],
+            'message': f'成功更新 {result["updated"]} 個活動商品的庫存'
         })
     
     @action(detail=False, methods=['get'], url_name='stock_report', permission_classes=[IsAuthenticated])
@@ -202,22 +212,20 @@ class ActivityProductViewSet(TrackedAPIView, ModelHistoryViewMixin):
         """
         Get a report of all activity products with stock inconsistencies
         """
-        activity_products = ActivityProduct.objects.all()
-        inconsistent = []
-        
-        for ap in activity_products:
-            calculated = ap.calculate_available_stock()
-            if ap.stock != calculated:
-                inconsistent.append({
-                    'id': ap.id,
-                    'product_name': ap.product.product_name,
-                    'activity_name': ap.activity.name,
-                    'current_stock': ap.stock,
-                    'calculated_stock': calculated
-                })
+        result = recalculate_all_stock(dry_run=True)
+        inconsistent = [
+            {
+                'id': change['id'],
+                'product_name': change['product_name'],
+                'activity_name': change['activity_name'],
+                'current_stock': change['old_stock'],
+                'calculated_stock': change['new_stock']
+            }
+            for change in result['changes']
+        ]
         
         return Response({
-            'total_checked': activity_products.count(),
+            'total_checked': result['checked'],
             'inconsistent_count': len(inconsistent),
             'inconsistent_items': inconsistent
         })
@@ -6,6 +6,9 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Sum
 
 from utils.view import TrackedAPIView
+from utils.export import ExportMixin
+from ..services.history_diff import history_page_queryset, compute_page_changes
+from ..services.category_tree import get_material_category_tree, get_category_tree
 from ..models import (
     Item, Category, MaterialCategory, Product, ProductImage, ProductItemRelation, Batch
 )
@@ -28,20 +31,15 @@ class ModelHistoryViewMixin:
     def history(self, request, pk=None):
         """查看模型的歷史記錄"""
         instance = self.get_object()
-        history_records = instance.history.all().order_by('-history_date')
-
-        if history_records.exists():
-            model_class = type(history_records.first())
-            serializer_class = type(
-                'DynamicHistoricalRecordSerializer',
-                (HistoricalRecordSerializer,),
-                {'Meta': type('Meta', (), {'model': model_class, 'fields': '__all__'})}
-            )
-            serializer = serializer_class(history_records, many=True)
-        else:
-            serializer = HistoricalRecordSerializer(history_records, many=True)
+        history_records = history_page_queryset(instance.history.all())
 
+        # 先分頁，只計算與序列化當頁的差異
         page = self.paginate_queryset(history_records)
+        records = page if page is not None else list(history_records)
+        context = self.get_serializer_context()
+        context['history_changes'] = compute_page_changes(history_records, records)
+        serializer = HistoricalRecordSerializer(records, many=True, context=context)
+
         if page is not None:
             return self.get_paginated_response(serializer.data)
 
@@ -65,10 +63,7 @@ class MaterialCategoryViewSet(TrackedAPIView, ModelHistoryViewMixin):
     @action(detail=False, methods=['get'], url_name='tree', permission_classes=[IsAuthenticated])
     def tree(self, request):
         """獲取樹狀結構的物料類別數據"""
-        # 僅獲取頂層類別（無父類別的）
-        root_categories = MaterialCategory.objects.filter(parent__isnull=True)
-        serializer = MaterialCategoryTreeSerializer(root_categories, many=True)
-        return Response(serializer.data)
+        return Response(get_material_category_tree())
     
     @action(detail=True, methods=['get'], url_name='items', permission_classes=[IsAuthenticated])
     def items(self, request, pk=None):
@@ -122,10 +117,7 @@ class CategoryViewSet(TrackedAPIView, ModelHistoryViewMixin):
     @action(detail=False, methods=['get'], url_name='tree', permission_classes=[IsAuthenticated])
     def tree(self, request):
         """獲取樹狀結構的類別數據"""
-        # 僅獲取頂層類別（無父類別的）
-        root_categories = Category.objects.filter(parent__isnull=True)
-        serializer = CategoryTreeSerializer(root_categories, many=True)
-        return Response(serializer.data)
+        return Response(get_category_tree())
     
     @action(detail=True, methods=['get'], url_name='products', permission_classes=[IsAuthenticated])
     def products(self, request, pk=None):
@@ -191,7 +183,7 @@ class ItemViewSet(TrackedAPIView, ModelHistoryViewMixin):
         return Response(serializer.data)
 
 
-class BatchViewSet(TrackedAPIView, ModelHistoryViewMixin):
+class BatchViewSet(TrackedAPIView, ModelHistoryViewMixin, ExportMixin):
     """批號視圖集"""
     queryset = Batch.objects.all()
     serializer_class = BatchListSerializer
@@ -201,6 +193,20 @@ class BatchViewSet(TrackedAPIView, ModelHistoryViewMixin):
     search_fields = ['item__item_code', 'batch_number', 'warehouse', 'location']
     ordering_fields = ['batch_number', 'warehouse', 'quantity', 'expiry_date', 'create_time']
     ordering = ['expiry_date', 'batch_number']
+    export_filename = 'batches'
+    export_fields = [
+        ('批號', 'batch_number'),
+        ('品號', 'item__item_code'),
+        ('品名', 'item__name'),
+        ('倉庫', 'warehouse'),
+        ('儲位', 'location'),
+        ('總數量', 'quantity'),
+        ('常態庫存', 'stock'),
+        ('活動庫存', 'active_stock'),
+        ('預留庫存', 'reserved_stock'),
+        ('效期', 'expiry_date'),
+        ('狀態', 'state'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
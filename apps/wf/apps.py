@@ -4,4 +4,7 @@ class WfConfig(AppConfig):
     name = 'apps.wf'
     verbose_name = '工作流管理'
 
+    def ready(self):
+        import apps.wf.signals
+
 
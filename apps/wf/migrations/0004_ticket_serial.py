@@ -0,0 +1,26 @@
+# Generated by Django 4.2.11 on 2026-10-15 06:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wf', '0003_customfield_created_by_customfield_updated_by_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketSerial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日期')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='已分配的最大流水号')),
+                ('workflow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='wf.workflow', verbose_name='关联工作流')),
+            ],
+            options={
+                'unique_together': {('workflow', 'day')},
+            },
+        ),
+    ]
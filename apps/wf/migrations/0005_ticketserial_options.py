@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-15 06:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wf', '0004_ticket_serial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ticketserial',
+            options={'verbose_name': '工单流水号计数器', 'verbose_name_plural': '工单流水号计数器'},
+        ),
+    ]
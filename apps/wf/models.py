@@ -234,3 +234,17 @@ class TicketFlow(BaseModel):
     intervene_type = models.IntegerField('干预类型', default=0, help_text='流转类型', choices=Transition.intervene_type_choices)
     participant_cc = models.JSONField('抄送给', default=list, blank=True, help_text='抄送给(userid列表)')
 
+
+
+class TicketSerial(models.Model):
+    """
+    工单流水号计数器（每个工作流每天一行，Redis 不可用时以 SELECT ... FOR UPDATE 递增）
+    """
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, verbose_name='关联工作流')
+    day = models.DateField('日期')
+    last_value = models.PositiveIntegerField('已分配的最大流水号', default=0)
+
+    class Meta:
+        verbose_name = '工单流水号计数器'
+        verbose_name_plural = verbose_name
+        unique_together = ('workflow', 'day')
@@ -2,12 +2,13 @@ from apps.wf.serializers import CustomFieldSerializer
 from apps.wf.serializers import TicketSerializer, TicketSimpleSerializer
 from typing import Tuple
 from apps.system.models import User
-from apps.wf.models import CustomField, State, Ticket, TicketFlow, Transition, Workflow
+from apps.wf.models import State, Ticket, TicketFlow, Transition, Workflow
 from rest_framework.exceptions import APIException, PermissionDenied
-from django.utils import timezone
-from datetime import timedelta
+import copy
 import random
 from .scripts import GetParticipants, HandleScripts
+from .ticket_sn import allocate_ticket_sn
+from .workflow_cache import get_compiled_workflow
 from utils.queryset import get_parent_queryset
 
 class WfService(object):
@@ -16,50 +17,48 @@ class WfService(object):
         """
         获取工作流状态列表
         """
-        return State.objects.filter(workflow=workflow, is_deleted=False).order_by('sort')
+        return get_compiled_workflow(workflow).states
     
     @staticmethod
     def get_workflow_transitions(workflow:Workflow):
         """
         获取工作流流转列表
         """
-        return Transition.objects.filter(workflow=workflow, is_deleted=False)
+        return get_compiled_workflow(workflow).transitions
     
     @staticmethod
     def get_workflow_start_state(workflow:Workflow):
         """
         获取工作流初始状态
         """
-        try:
-            wf_state_obj = State.objects.get(workflow=workflow, type=State.STATE_TYPE_START, is_deleted=False)
-            return wf_state_obj
-        except:
+        wf_state_obj = copy.copy(get_compiled_workflow(workflow).start_state)
+        if wf_state_obj is None:
             raise Exception('工作流状态配置错误')
+        return wf_state_obj
 
     @staticmethod
     def get_workflow_end_state(workflow:Workflow):
         """
         获取工作流结束状态
         """
-        try:
-            wf_state_obj = State.objects.get(workflow=workflow, type=State.STATE_TYPE_END, is_deleted=False)
-            return wf_state_obj
-        except:
+        wf_state_obj = copy.copy(get_compiled_workflow(workflow).end_state)
+        if wf_state_obj is None:
             raise Exception('工作流状态配置错误')
+        return wf_state_obj
 
     @staticmethod
     def get_workflow_custom_fields(workflow:Workflow):
         """
         获取工单字段
         """
-        return CustomField.objects.filter(is_deleted=False, workflow=workflow).order_by('sort')
+        return get_compiled_workflow(workflow).custom_fields
 
     @staticmethod
     def get_workflow_custom_fields_list(workflow:Workflow):
         """
         获取工单字段key List
         """
-        return list(CustomField.objects.filter(is_deleted=False, workflow=workflow).order_by('sort').values_list('field_key', flat=True))
+        return list(get_compiled_workflow(workflow).custom_field_keys)
 
     @classmethod
     def get_ticket_transitions(cls, ticket:Ticket):
@@ -73,7 +72,7 @@ class WfService(object):
         """
         获取状态可执行的操作
         """
-        return Transition.objects.filter(is_deleted=False, source_state=state).all()
+        return get_compiled_workflow(state.workflow_id).get_state_transitions(state.id)
 
     @classmethod
     def get_ticket_steps(cls, ticket:Ticket):
@@ -102,13 +101,9 @@ class WfService(object):
     @classmethod
     def get_ticket_sn(cls, workflow:Workflow):
         """
-        生成工单流水号
+        生成工单流水号（每个工作流每天原子递增，见 ticket_sn）
         """
-        now = timezone.now()
-        today = str(now)[:10]+' 00:00:00'
-        next_day = str(now+timedelta(days=1))[:10]+' 00:00:00'
-        ticket_day_count_new = Ticket.objects.filter(create_time__gte=today, create_time__lte=next_day, workflow=workflow).count()+1
-        return '%s_%04d%02d%02d%04d' % (workflow.sn_prefix, now.year, now.month, now.day, ticket_day_count_new)
+        return allocate_ticket_sn(workflow)
 
 
         
@@ -117,8 +112,8 @@ class WfService(object):
         """
         获取下个节点状态
         """
-        source_state = ticket.state
-        destination_state = transition.destination_state
+        compiled = get_compiled_workflow(ticket.workflow_id)
+        destination_state = compiled.get_state(transition.destination_state_id) or transition.destination_state
         ticket_all_value = cls.get_ticket_all_field_value(ticket)
         ticket_all_value.update(**new_ticket_data)
         for key, value in ticket_all_value.items():
@@ -129,7 +124,7 @@ class WfService(object):
                 expression = i['expression'].format(**ticket_all_value)
                 import datetime, time  # 用于支持条件表达式中对时间的操作
                 if eval(expression, {'__builtins__':None}, {'datetime':datetime, 'time':time}):
-                    destination_state = State.objects.get(pk=i['target_state'])
+                    destination_state = compiled.get_state(i['target_state']) or State.objects.get(pk=i['target_state'])
                     return destination_state
         return destination_state
     
@@ -253,8 +248,7 @@ class WfService(object):
         # 获取工单基础表中的字段中的字段信息
         field_info_dict = TicketSimpleSerializer(instance=ticket).data
         # 获取自定义字段的值
-        custom_fields_queryset = cls.get_workflow_custom_fields(ticket.workflow)
-        for i in custom_fields_queryset:
+        for i in cls.get_workflow_custom_fields(ticket.workflow_id):
             field_info_dict[i.field_key] = ticket.ticket_data.get(i.field_key, None)
         return field_info_dict
 
@@ -262,7 +256,9 @@ class WfService(object):
     def handle_ticket(cls, ticket:Ticket, transition: Transition, new_ticket_data:dict={}, handler:User=None, 
         suggestion:str='', created:bool=False, by_timer:bool=False, by_task:bool=False, by_hook:bool=False):
 
-        source_state = ticket.state
+        # 工单当前状态取自工作流定义缓存（get_state 返回副本，不会修改共用的状态对象）
+        source_state = get_compiled_workflow(ticket.workflow_id).get_state(ticket.state_id) or ticket.state
+        ticket.state = source_state
         source_ticket_data = ticket.ticket_data
 
         # 校验处理权限
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import State, Transition, CustomField
+from .workflow_cache import invalidate_workflow
+
+# 状态、流转、自定义字段变更时使工作流定义缓存失效
+@receiver(post_save, sender=State)
+@receiver(post_delete, sender=State)
+@receiver(post_save, sender=Transition)
+@receiver(post_delete, sender=Transition)
+@receiver(post_save, sender=CustomField)
+@receiver(post_delete, sender=CustomField)
+def update_workflow_cache(sender, instance, **kwargs):
+    invalidate_workflow(instance.workflow_id)
@@ -1,3 +1,99 @@
-from django.test import TestCase
+import threading
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import redis
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+from apps.wf import ticket_sn
+from apps.wf.models import State, Ticket, Workflow
+from apps.wf.services import WfService
+
+
+def redis_available():
+    try:
+        return ticket_sn.redis_client.ping()
+    except redis.RedisError:
+        return False
+
+
+class TicketSnConcurrencyTests(TransactionTestCase):
+    """
+    并发新建工单时流水号不重复
+    """
+    threads = 20
+
+    def setUp(self):
+        self.workflow = Workflow.objects.create(name='请假', sn_prefix='qj')
+        self.state = State.objects.create(name='开始', workflow=self.workflow, type=1)
+
+    def create_tickets_in_parallel(self):
+        """模拟 TicketViewSet.create：各线程在自己的事务中新建工单并分配流水号"""
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def create_ticket():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    ticket = Ticket.objects.create(workflow=self.workflow, state=self.state, title='test')
+                    ticket.sn = WfService.get_ticket_sn(self.workflow)
+                    ticket.save()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=create_ticket) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        return list(Ticket.objects.filter(workflow=self.workflow).values_list('sn', flat=True))
+
+    def assertSerial(self, sns):
+        self.assertEqual(len(sns), self.threads)
+        self.assertEqual(len(set(sns)), self.threads)
+        self.assertEqual(sorted(int(sn[-4:]) for sn in sns), list(range(1, self.threads + 1)))
+
+    @skipUnless(connection.features.has_select_for_update, '数据库不支持 SELECT ... FOR UPDATE')
+    def test_database_counter_is_unique_under_parallel_creates(self):
+        with mock.patch.object(ticket_sn, '_next_redis_value', side_effect=redis.ConnectionError):
+            sns = self.create_tickets_in_parallel()
+        self.assertSerial(sns)
+
+    @skipUnless(redis_available(), 'Redis 不可用')
+    def test_redis_counter_is_unique_under_parallel_creates(self):
+        for key in ticket_sn.redis_client.scan_iter(match=f'wf_ticket_sn:{self.workflow.id}:*'):
+            ticket_sn.redis_client.delete(key)
+        sns = self.create_tickets_in_parallel()
+        self.assertSerial(sns)
+
+    def test_switching_to_database_continues_after_issued_sn(self):
+        with mock.patch.object(ticket_sn, '_next_redis_value', side_effect=redis.ConnectionError):
+            first = WfService.get_ticket_sn(self.workflow)
+            Ticket.objects.create(workflow=self.workflow, state=self.state, sn=first)
+            # 模拟 Redis 期间已发出的流水号
+            Ticket.objects.create(workflow=self.workflow, state=self.state, sn=first[:-4] + '0007')
+            second = WfService.get_ticket_sn(self.workflow)
+        self.assertTrue(first.endswith('0001'))
+        self.assertTrue(second.endswith('0008'))
+
+    @skipUnless(redis_available(), 'Redis 不可用')
+    def test_redis_continues_after_database_fallback(self):
+        for key in ticket_sn.redis_client.scan_iter(match=f'wf_ticket_sn:{self.workflow.id}:*'):
+            ticket_sn.redis_client.delete(key)
+
+        def create_ticket():
+            sn = WfService.get_ticket_sn(self.workflow)
+            Ticket.objects.create(workflow=self.workflow, state=self.state, sn=sn)
+            return sn
+
+        sns = [create_ticket()]
+        # Redis 短暂不可用，期间改由数据库计数器分配，Redis 中的计数器仍保留
+        with mock.patch.object(ticket_sn, '_next_redis_value', side_effect=redis.ConnectionError):
+            sns += [create_ticket(), create_ticket()]
+        sns += [create_ticket(), create_ticket()]
+        self.assertEqual([int(sn[-4:]) for sn in sns], [1, 2, 3, 4, 5])
@@ -0,0 +1,110 @@
+"""
+工单流水号分配
+每个工作流每天独立递增，格式 {sn_prefix}_YYYYMMDDNNNN
+- 优先使用 Redis INCR 原子递增
+- Redis 不可用时锁定 TicketSerial 计数器行（SELECT ... FOR UPDATE）递增，锁随工单事务提交释放
+两种来源切换时以计数器行与当天已发出的最大流水号为起点，避免重复；
+Redis 恢复后，若当天曾改用数据库计数器，先把 Redis 计数器提高到计数器行的值再递增
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 創建Redis連接
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+TICKET_SN_KEY = 'wf_ticket_sn:{workflow_id}:{day}'
+# Redis 计数器存活时间（秒）
+TICKET_SN_TTL = 60*60*48
+
+# 计数器存在时递增（低于 ARGV[1] 时先提高到 ARGV[1]），不存在时返回 nil（由调用端设置起点）
+INCR_EXISTING_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return false
+end
+if tonumber(current) < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return redis.call('INCR', KEYS[1])
+"""
+
+_incr_existing = redis_client.register_script(INCR_EXISTING_SCRIPT)
+
+
+def format_ticket_sn(workflow, day, value):
+    return '%s_%04d%02d%02d%04d' % (workflow.sn_prefix, day.year, day.month, day.day, value)
+
+
+def get_issued_max(workflow, day):
+    """当天该工作流已发出的最大流水号（仅在计数器初始化或降级时查询）"""
+    from .models import Ticket
+
+    prefix = format_ticket_sn(workflow, day, 0)[:-4]
+    sn = (
+        Ticket.objects.filter(workflow=workflow, sn__startswith=prefix)
+        .order_by(Length('sn').desc(), '-sn')
+        .values_list('sn', flat=True)
+        .first()
+    )
+    if not sn:
+        return 0
+    try:
+        return int(sn[len(prefix):])
+    except ValueError:
+        return 0
+
+
+def _get_db_counter(workflow, day):
+    """数据库计数器行的值（当天未曾改用数据库计数器时为 0）"""
+    from .models import TicketSerial
+
+    counter = TicketSerial.objects.filter(workflow=workflow, day=day).values_list('last_value', flat=True).first()
+    return counter or 0
+
+
+def _get_floor(workflow, day):
+    return max(_get_db_counter(workflow, day), get_issued_max(workflow, day))
+
+
+def _next_redis_value(workflow, day):
+    key = TICKET_SN_KEY.format(workflow_id=workflow.id, day=day.strftime('%Y%m%d'))
+    # Redis 短暂不可用期间数据库计数器已发出的流水号，恢复后不可再由 Redis 发出
+    value = _incr_existing(keys=[key], args=[_get_db_counter(workflow, day), TICKET_SN_TTL])
+    if value is None:
+        # 当天第一次分配（或 Redis 数据遗失），以数据库中的最大值为起点
+        redis_client.set(key, _get_floor(workflow, day), nx=True, ex=TICKET_SN_TTL)
+        value = redis_client.incr(key)
+    return int(value)
+
+
+def _next_db_value(workflow, day):
+    from .models import TicketSerial
+
+    with transaction.atomic():
+        counter, _ = TicketSerial.objects.select_for_update().get_or_create(workflow=workflow, day=day)
+        counter.last_value = max(counter.last_value, get_issued_max(workflow, day)) + 1
+        counter.save(update_fields=['last_value'])
+    return counter.last_value
+
+
+def allocate_ticket_sn(workflow):
+    """
+    分配工单流水号
+
+    Returns:
+        str: 流水号
+    """
+    day = timezone.localdate()
+    try:
+        value = _next_redis_value(workflow, day)
+    except redis.RedisError as e:
+        logger.warning(f"Redis 工单流水号分配失败，改用数据库计数器: {str(e)}")
+        value = _next_db_value(workflow, day)
+    return format_ticket_sn(workflow, day, value)
@@ -0,0 +1,151 @@
+"""
+工作流定义缓存
+把工作流的状态、流转（按来源状态索引）、自定义字段与开始/结束状态编译为 CompiledWorkflow，
+缓存在进程内与 Redis（django cache），以每个工作流的版本号判断是否过期。
+State / Transition / CustomField 变更时递增版本号（见 signals）。
+"""
+import copy
+import logging
+import time
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import State, Transition, CustomField
+
+logger = logging.getLogger(__name__)
+
+# 缓存存活时间（秒）
+WORKFLOW_CACHE_TTL = 60*60*24
+# 进程内缓存存活时间（秒），未经 signals 的变更（queryset.update 等）最迟在此时间后生效
+WORKFLOW_LOCAL_CACHE_TTL = 60*5
+WORKFLOW_VERSION_KEY = 'wf_compiled__version_{workflow_id}'
+WORKFLOW_COMPILED_KEY = 'wf_compiled__{workflow_id}__v{version}'
+
+# 进程内缓存 {工作流ID: (版本号, 过期时间, CompiledWorkflow)}
+_local_cache = {}
+_local_cache_lock = threading.Lock()
+
+
+class CompiledWorkflow(object):
+    """
+    工作流的静态定义（只读，多个请求共用，不可修改其中的对象）
+    """
+
+    def __init__(self, workflow_id, states, transitions, custom_fields):
+        self.workflow_id = workflow_id
+        self.states = states  # 按 sort 排序
+        self.states_by_id = {state.id: state for state in states}
+        self.transitions = transitions
+        self.custom_fields = custom_fields  # 按 sort 排序
+        self.custom_field_keys = [field.field_key for field in custom_fields]
+
+        self.transitions_by_source = {}
+        for transition in transitions:
+            # 流转的来源、目标状态直接指向已载入的状态，避免再次查询
+            for attr in ('source_state', 'destination_state'):
+                state = self.states_by_id.get(getattr(transition, f'{attr}_id'))
+                if state is not None:
+                    setattr(transition, attr, state)
+            self.transitions_by_source.setdefault(transition.source_state_id, []).append(transition)
+
+        self.start_state = self._single_state_of_type(State.STATE_TYPE_START)
+        self.end_state = self._single_state_of_type(State.STATE_TYPE_END)
+
+    def _single_state_of_type(self, state_type):
+        matched = [state for state in self.states if state.type == state_type]
+        return matched[0] if len(matched) == 1 else None
+
+    def get_state(self, state_id):
+        """
+        返回状态的副本（可赋给工单，惰性加载的关联不会写入共用的对象）
+        """
+        state = self.states_by_id.get(state_id)
+        return copy.copy(state) if state is not None else None
+
+    def get_state_transitions(self, state_id):
+        return self.transitions_by_source.get(state_id, [])
+
+
+def compile_workflow(workflow_id):
+    """由数据库载入工作流定义（3 次查询）"""
+    states = list(State.objects.filter(workflow_id=workflow_id, is_deleted=False).order_by('sort'))
+    transitions = list(
+        Transition.objects.filter(workflow_id=workflow_id, is_deleted=False)
+        .select_related('source_state', 'destination_state')
+    )
+    custom_fields = list(CustomField.objects.filter(workflow_id=workflow_id, is_deleted=False).order_by('sort'))
+    return CompiledWorkflow(workflow_id, states, transitions, custom_fields)
+
+
+def _get_version(workflow_id):
+    """取得工作流定义的版本号，Redis 不可用时返回 None"""
+    key = WORKFLOW_VERSION_KEY.format(workflow_id=workflow_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            # 以时间为初始值，版本号被清除后重建时不会与进程内缓存的旧版本相同
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key, 0)
+        return version
+    except Exception as e:
+        logger.warning(f"读取工作流定义版本号失败，改由数据库载入: {str(e)}")
+        return None
+
+
+def bump_version(workflow_id):
+    """使工作流定义缓存失效"""
+    key = WORKFLOW_VERSION_KEY.format(workflow_id=workflow_id)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+    except Exception as e:
+        # 不影响定义的保存；Redis 恢复后其中的旧定义可能仍被使用，需再次保存以刷新
+        logger.error(f"递增工作流 {workflow_id} 定义版本号失败: {str(e)}")
+    with _local_cache_lock:
+        _local_cache.pop(workflow_id, None)
+
+
+def invalidate_workflow(workflow_id):
+    """工作流定义变更，事务提交后递增版本号"""
+    if workflow_id:
+        transaction.on_commit(lambda: bump_version(workflow_id))
+
+
+def get_compiled_workflow(workflow):
+    """
+    取得编译后的工作流定义
+    进程内缓存命中时只需读取一次版本号，其次读取 Redis，都未命中时由数据库编译；
+    Redis 不可用时直接由数据库编译
+
+    Args:
+        workflow: Workflow 实例或工作流ID
+    """
+    workflow_id = getattr(workflow, 'pk', workflow)
+    version = _get_version(workflow_id)
+    if version is None:
+        return compile_workflow(workflow_id)
+
+    cached = _local_cache.get(workflow_id)
+    if cached is not None and cached[0] == version and cached[1] > time.monotonic():
+        return cached[2]
+
+    key = WORKFLOW_COMPILED_KEY.format(workflow_id=workflow_id, version=version)
+    try:
+        compiled = cache.get(key)
+    except Exception as e:
+        logger.warning(f"读取工作流定义缓存失败，改由数据库载入: {str(e)}")
+        return compile_workflow(workflow_id)
+    if compiled is None:
+        compiled = compile_workflow(workflow_id)
+        try:
+            cache.set(key, compiled, WORKFLOW_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"写入工作流定义缓存失败: {str(e)}")
+
+    with _local_cache_lock:
+        _local_cache[workflow_id] = (version, time.monotonic() + WORKFLOW_LOCAL_CACHE_TTL, compiled)
+    return compiled
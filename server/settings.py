@@ -58,6 +58,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.monitor.middleware.RequestMonitorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -202,6 +203,11 @@ CELERY_TIMEZONE = 'Asia/Shanghai'
 CELERY_ENABLE_UTC = True
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# 請求監控（查詢數、N+1、Redis 呼叫、Server-Timing 標頭與路由統計）
+MONITOR_ENABLED = True
+MONITOR_QUERY_BUDGET = 50  # 單一請求查詢數超過時記錄警告
+MONITOR_DUPLICATE_THRESHOLD = 3  # 相同 SQL 重複次數達此值視為 N+1
+
 # swagger配置
 SWAGGER_SETTINGS = {
    'LOGIN_URL':'/django/admin/login/',
@@ -294,7 +300,19 @@ from celery.schedules import crontab
 CELERY_BEAT_SCHEDULE = {
     'check-expired-orders': {
         'task': 'apps.v1.tasks.check_expired_orders',
-        'schedule': crontab(minute='*/15'),  # 每 15 分鐘執行一次
+        'schedule': crontab(minute='*/15'),  # 每 15 分鐘執行一次（到期訂單由 run_order_deadline_scheduler 即時處理，此為補漏）
+    },
+    'reconcile-dashboard-statistics': {
+        'task': 'apps.v1.tasks.reconcile_dashboard_statistics',
+        'schedule': crontab(hour=3, minute=0),  # 每日凌晨 3 點完整重算儀表板統計
+    },
+    'rebuild-best-seller-rankings': {
+        'task': 'apps.v1.tasks.rebuild_best_seller_rankings',
+        'schedule': crontab(hour=3, minute=10),  # 每日凌晨 3:10 重建熱銷排行
+    },
+    'reconcile-inventory-reservation-counters': {
+        'task': 'apps.v1.tasks.reconcile_inventory_reservation_counters',
+        'schedule': crontab(minute=5),  # 每小時第 5 分鐘由資料庫重設批號庫存計數器
     },
 }
 
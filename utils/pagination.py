@@ -1,23 +1,136 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.exceptions import ParseError
 
+# pageoff 不分頁時允許的最大筆數
+PAGEOFF_LIMIT = 800
+
+
+def exceeds(queryset, limit):
+    """
+    判斷查詢結果是否達到 limit 筆
+    只計算前 limit 筆，避免對大表做完整 COUNT
+    """
+    return queryset[:limit].count() >= limit
+
+
+def estimate_count(queryset):
+    """
+    取得資料表的估計筆數（無過濾條件時使用資料庫統計資訊）
+    有過濾條件或資料庫不支援時回傳 None
+    """
+    if queryset.query.where:
+        return None
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """總筆數優先使用資料庫估計值的分頁器"""
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimated = estimate_count(self.object_list)
+        if estimated is None:
+            return super().count
+        self.estimated = True
+        return estimated
+
+
+class MyCursorPagination(CursorPagination):
+    """
+    游標分頁（keyset），不需 COUNT 與 OFFSET，適合大表或無限捲動
+    排序依序取 view.cursor_ordering、排序參數 / view.ordering、create_time，
+    並補上主鍵確保排序穩定
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_filter_ordering(self, request, queryset, view):
+        """排序過濾器（OrderingFilter）的排序，未指定排序參數且 view 無 ordering 時回傳 None"""
+        for backend in getattr(view, 'filter_backends', None) or ():
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return ordering
+        return None
+
+    def get_ordering(self, request, queryset, view):
+        ordering = (
+            getattr(view, 'cursor_ordering', None)
+            or self.get_filter_ordering(request, queryset, view)
+            or getattr(view, 'ordering', None)
+        )
+        if not ordering:
+            field_names = {field.name for field in queryset.model._meta.fields}
+            ordering = '-create_time' if 'create_time' in field_names else '-pk'
+
+        ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        pk_name = queryset.model._meta.pk.name
+        if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return tuple(ordering)
+
+
 class MyPagination(PageNumberPagination):
+    """
+    頁碼分頁，另提供：
+    - pagination=cursor 或 cursor 參數：改用游標分頁
+    - count=estimate：總筆數使用資料庫估計值（僅無過濾條件時）
+    """
     page_size = 10
     page_size_query_param = 'page_size'
+    cursor_pagination_class = MyCursorPagination
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def is_cursor_mode(self, request):
+        return request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params
 
     def paginate_queryset(self, queryset, request, view=None):
         if request.query_params.get('pageoff', None) or request.query_params.get('page', None) == '0':
-            if queryset.count() < 800:
+            if not exceeds(queryset, PAGEOFF_LIMIT):
                 return None
             raise ParseError('单次请求数据量大,请分页获取')
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view=view)
+        if request.query_params.get('count') == 'estimate':
+            self.django_paginator_class = EstimatedCountPaginator
         return super().paginate_queryset(queryset, request, view=view)
 
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if getattr(self.page.paginator, 'estimated', False):
+            response.data['count_estimated'] = True
+        return response
+
+
 class PageOrNot:
     def paginate_queryset(self, queryset):
         if (self.paginator is None):
             return None
-        elif self.request.query_params.get('pageoff', None) and queryset.count()<500:
+        elif self.request.query_params.get('pageoff', None):
+            if exceeds(queryset, 500):
+                raise ParseError('单次请求数据量大,请求中止')
             return None
-        elif self.request.query_params.get('pageoff', None) and queryset.count()>=500:
-            raise ParseError('单次请求数据量大,请求中止')
         return self.paginator.paginate_queryset(queryset, self.request, view=self)
@@ -47,8 +47,11 @@ def get_child_queryset2(obj, hasParent=True):
     obj实例
     数据表需包含parent字段
     是否包含父默认True
+    有阶层闭包表的模型(get_descendant_ids)直接以单一查询取得
     '''
     cls = type(obj)
+    if hasattr(obj, 'get_descendant_ids'):
+        return cls.objects.filter(pk__in=obj.get_descendant_ids(include_self=hasParent))
     queryset = cls.objects.none()
     fatherQueryset = cls.objects.filter(pk=obj.id)
     if hasParent:
@@ -61,6 +64,8 @@ def get_child_queryset2(obj, hasParent=True):
 
 def get_parent_queryset(obj, hasSelf=True):
     cls = type(obj)
+    if hasattr(obj, 'get_ancestor_ids'):
+        return cls.objects.filter(id__in=obj.get_ancestor_ids(include_self=hasSelf))
     ids = []
     if hasSelf:
         ids.append(obj.id)
@@ -0,0 +1,56 @@
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.filters import OrderingFilter
+from rest_framework.generics import ListAPIView
+from rest_framework.test import APIRequestFactory
+
+from apps.wf.models import Workflow
+from utils.pagination import MyPagination
+
+
+class WorkflowSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Workflow
+        fields = ['id', 'name']
+
+
+class WorkflowListView(ListAPIView):
+    queryset = Workflow.objects.all()
+    serializer_class = WorkflowSerializer
+    pagination_class = MyPagination
+    filter_backends = [OrderingFilter]
+    authentication_classes = []
+    permission_classes = []
+
+
+class CursorPaginationOrderingTests(TestCase):
+    """
+    游標分頁的排序
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.workflows = [Workflow.objects.create(name=f'流程{i}') for i in range(5)]
+
+    def get(self, view_class, **params):
+        request = APIRequestFactory().get('/', {'pagination': 'cursor', 'page_size': 2, **params})
+        return view_class.as_view()(request)
+
+    def test_without_ordering_falls_back_to_create_time(self):
+        response = self.get(WorkflowListView)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [self.workflows[4].id, self.workflows[3].id])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_ordering_param_is_used(self):
+        response = self.get(WorkflowListView, ordering='id')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [self.workflows[0].id, self.workflows[1].id])
+
+    def test_view_ordering_is_used(self):
+        view_class = type('OrderedWorkflowListView', (WorkflowListView,), {'ordering': ['name']})
+        response = self.get(view_class)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.data['results']], ['流程0', '流程1'])
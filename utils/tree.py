@@ -0,0 +1,47 @@
+from django.core.cache import cache
+
+
+def build_children_map(objs, parent_attr='parent_id'):
+    """
+    將節點依父節點分組
+    返回 {父节点ID: [子节点, ...]}，最上层节点的键为 None
+    """
+    children_map = {}
+    for obj in objs:
+        children_map.setdefault(getattr(obj, parent_attr), []).append(obj)
+    return children_map
+
+
+def serialize_tree(objs, serializer_class, context=None, parent_attr='parent_id'):
+    """
+    一次取得的所有节点在内存中组成树状结构后序列化
+    serializer_class 需由 context['children_map'] 取得子节点（见 TreeChildrenMixin）
+    """
+    context = dict(context or {})
+    context['children_map'] = build_children_map(objs, parent_attr)
+    roots = context['children_map'].get(None, [])
+    return list(serializer_class(roots, many=True, context=context).data)
+
+
+def get_cached_tree(cache_key, builder, timeout=60*60):
+    """取得快取的树状结构，未命中时以 builder() 建立"""
+    data = cache.get(cache_key)
+    if data is None:
+        data = builder()
+        cache.set(cache_key, data, timeout)
+    return data
+
+
+class TreeChildrenMixin:
+    """
+    树状序列化器的 children 栏位
+    有 context['children_map'] 时直接取内存中的子节点，否则逐层查询
+    """
+
+    def get_children(self, obj):
+        children_map = self.context.get('children_map')
+        if children_map is None:
+            children = type(obj).objects.filter(parent=obj)
+        else:
+            children = children_map.get(obj.pk, [])
+        return type(self)(children, many=True, context=self.context).data